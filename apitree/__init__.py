@@ -1,9 +1,46 @@
 """ Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
 
+from .accounting import CPUAccounting
+from .admission import (
+    ConcurrencyLimiter,
+    AdaptiveConcurrencyLimiter,
+    )
 from .api_documentation import APIDocumentationMaker
+from .authentication import (
+    Authenticator,
+    CachedAuthenticator,
+    get_principal,
+    )
+from .content import (
+    Codec,
+    MessagePackCodec,
+    CBORCodec,
+    )
+from .lazy import LazySubtree
+from .memory import MemoryProfiler
+from .preload import preload
+from .profiling import RouteProfiler
+from .resources import (
+    ResourceRegistry,
+    default_resource_registry,
+    get_resource,
+    )
+from .route_order import RouteHitCounter
+from .router import (
+    RadixRouter,
+    mount_api_tree,
+    )
+from .slow_requests import SlowRequestLog
+from .snapshot import scan_snapshot
+from .startup import StartupProfiler
+from .tracing import (
+    RecordingTracer,
+    OpenTelemetryTracer,
+    )
 from .tree_scan import (
     scan_api_tree,
     add_catchall,
+    set_view_options,
     RequestMethod,
     GET,
     POST,
@@ -11,6 +48,7 @@ from .tree_scan import (
     DELETE,
     HEAD,
     )
+from .verification import VerificationPolicy
 from .view_callable import (
     BaseViewCallable,
     SimpleViewCallable,
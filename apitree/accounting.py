@@ -0,0 +1,92 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import threading
+import time
+
+from .util import (
+    add_admin_view,
+    get_route_pattern,
+    )
+
+class CPURecording(object):
+    """ Wall time and thread CPU time of one call. """
+    
+    def __init__(self, accounting, request):
+        self.accounting = accounting
+        self.request = request
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+    
+    def phase(self, name, context):
+        return context
+    
+    def finish(self):
+        cpu = time.thread_time() - self.cpu_start
+        wall = time.perf_counter() - self.wall_start
+        self.accounting.add(get_route_pattern(self.request), wall, cpu)
+
+class CPUAccounting(object):
+    """ Accumulates wall time and CPU time of every call, per route. Use as the
+        'cpu_accounting' view option.
+        
+        A route whose CPU time is close to its wall time is CPU-bound (a
+        candidate for a process pool); a low ratio means the time is spent
+        waiting, e.g. on I/O (a candidate for async execution). CPU time is
+        measured for the thread which calls the view callable, so work done in
+        an 'executor' thread is not included. """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Route -> [calls, wall seconds, CPU seconds].
+        self.totals = {}
+    
+    def start(self, request):
+        return CPURecording(self, request)
+    
+    def add(self, route, wall, cpu):
+        with self.lock:
+            totals = self.totals.get(route)
+            if totals is None:
+                totals = self.totals[route] = [0, 0.0, 0.0]
+            totals[0] += 1
+            totals[1] += wall
+            totals[2] += cpu
+    
+    def get_stats(self):
+        """ Return a list of statistics per route, with the routes which used
+            the most CPU time first. """
+        with self.lock:
+            totals = {
+                route: list(ivalue) for route, ivalue in self.totals.items()
+                }
+        
+        result = []
+        for route, (calls, wall, cpu) in totals.items():
+            result.append({
+                'route': route,
+                'calls': calls,
+                'wall_seconds': wall,
+                'cpu_seconds': cpu,
+                'cpu_ratio': cpu / wall if wall else None,
+                })
+        
+        result.sort(key=lambda item: item['cpu_seconds'], reverse=True)
+        return result
+    
+    def clear(self):
+        with self.lock:
+            self.totals = {}
+    
+    def add_views(
+        self,
+        configurator,
+        path='/_apitree/cpu',
+        **view_kwargs
+        ):
+        """ Add a JSON endpoint which returns 'get_stats'. Restrict access to
+            it, e.g. with a 'permission' view argument. """
+        add_admin_view(
+            configurator,
+            path,
+            lambda: {'cpu': self.get_stats()},
+            **view_kwargs
+            )
@@ -0,0 +1,136 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import threading
+import time
+from contextlib import contextmanager
+
+from .exc import AdmissionRejectedError
+
+class ConcurrencyLimiter(object):
+    """ Limits the number of requests in flight through the view callables which
+        share this limiter.
+        
+        When 'max_in_flight' requests are running, up to 'max_queue' further
+        requests wait (for at most 'queue_timeout' seconds, or indefinitely if
+        None) for a slot. Other requests are rejected immediately, with
+        'retry_after' seconds suggested to the client. """
+    
+    def __init__(
+        self,
+        max_in_flight,
+        max_queue=0,
+        queue_timeout=None,
+        retry_after=1,
+        ):
+        self.limit = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.condition = threading.Condition()
+    
+    def reject(self):
+        self.rejected += 1
+        raise AdmissionRejectedError(
+            "Concurrency limit of {} requests reached.".format(self.limit),
+            retry_after=self.retry_after,
+            )
+    
+    def acquire(self, timeout=None):
+        """ Take a slot, waiting in the queue if necessary. 'timeout'
+            (seconds) bounds the wait further than 'queue_timeout', e.g. by
+            the remaining time of the request's deadline. Raises
+            'AdmissionRejectedError'. """
+        with self.condition:
+            if self.in_flight < self.limit:
+                self.in_flight += 1
+                return
+            
+            if self.waiting >= self.max_queue:
+                self.reject()
+            
+            timeouts = [
+                item for item in [self.queue_timeout, timeout]
+                if item is not None
+                ]
+            if timeouts:
+                deadline = time.monotonic() + min(timeouts)
+            else:
+                deadline = None
+            
+            self.waiting += 1
+            try:
+                while self.in_flight >= self.limit:
+                    if deadline is None:
+                        self.condition.wait()
+                        continue
+                    
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.reject()
+                    self.condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            
+            self.in_flight += 1
+    
+    def release(self, latency):
+        with self.condition:
+            self.in_flight -= 1
+            self.observe(latency)
+            self.condition.notify()
+    
+    def observe(self, latency):
+        """ Called with the wall time of each completed request, while the
+            condition lock is held. """
+    
+    @contextmanager
+    def admit(self):
+        """ Context manager for one request. Raises 'AdmissionRejectedError'
+            when the request is shed. """
+        self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+class AdaptiveConcurrencyLimiter(ConcurrencyLimiter):
+    """ A concurrency limiter whose limit adapts to observed latency.
+        
+        Requests slower than 'target_latency' (seconds) multiply the limit by
+        'backoff' (never below 'min_in_flight'). Otherwise the limit grows by
+        one after as many fast requests as the current limit (never above
+        'max_in_flight'). """
+    
+    def __init__(
+        self,
+        max_in_flight,
+        target_latency,
+        min_in_flight=1,
+        backoff=0.9,
+        **kwargs
+        ):
+        super().__init__(max_in_flight, **kwargs)
+        self.max_in_flight = max_in_flight
+        self.min_in_flight = min_in_flight
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.fast_count = 0
+    
+    def observe(self, latency):
+        if latency > self.target_latency:
+            self.fast_count = 0
+            self.limit = max(
+                self.min_in_flight,
+                int(self.limit * self.backoff),
+                )
+            return
+        
+        self.fast_count += 1
+        if self.fast_count >= self.limit and self.limit < self.max_in_flight:
+            self.fast_count = 0
+            self.limit += 1
+            self.condition.notify()
@@ -1,7 +1,7 @@
 <!-- Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> -->
 <%
     sorted_paths = sorted(documentation_dict.keys())
-    endpoint_order = ('description', 'required', 'optional', 'unlimited', 'returns')
+    endpoint_order = ('description', 'content_types', 'required', 'optional', 'unlimited', 'returns')
 %>
 <!doctype html>
 <html lang="en">
@@ -62,7 +62,7 @@
                         <td>
                         	<div class="collapsible">
 	                            % for name, value in [(ikey, endpoint_dict[ikey]) for ikey in endpoint_order if ikey in endpoint_dict]:
-	                                <% caption = name.capitalize() + ':' %>
+	                                <% caption = name.replace('_', ' ').capitalize() + ':' %>
 	                                <p><b>${caption}</b></p>
 	                                % if name == 'description':
 		                                <p>${value}</p>
@@ -15,7 +15,8 @@ from . import tree_scan
 from .view_callable import SimpleViewCallable
 from .tree_scan import (
     ALL_REQUEST_METHOD_STRINGS,
-    get_endpoints,
+    is_mount,
+    iter_endpoints,
     )
 from .util import is_container
 
@@ -97,9 +98,16 @@ class APIDocumentationMaker(object):
         
         return joiner.join([start, wrapped, end])
     
+    def prepare_content_types(self, codecs):
+        return ', '.join([codec.media_type for codec in codecs])
+    
     def get_keys_to_skip(self, view_callable):
+        injected_keys = []
+        if hasattr(view_callable, 'injected_kwarg_names'):
+            injected_keys = view_callable.injected_kwarg_names()
+        
         if not hasattr(view_callable, 'special_kwargs'):
-            return []
+            return injected_keys
         
         try:
             special_kwargs_dict = view_callable.special_kwargs()
@@ -111,68 +119,105 @@ class APIDocumentationMaker(object):
             exc.args = (error_msg, ) + exc.args
             raise
         
-        return special_kwargs_dict.keys()
+        return list(special_kwargs_dict.keys()) + injected_keys
     
-    def create_documentation(self, api_tree):
-        endpoints = get_endpoints(api_tree)
-        
+    def create_endpoint_model(self, api_tree):
+        """ Return the unprepared model of 'api_tree' which
+            'create_documentation' renders, like this:
+            {
+                'complete/route': {
+                    'GET, POST': {
+                        'view': view_callable,
+                        'request_methods': ['GET', 'POST'],
+                        'description': 'Docstring of the wrapped callable.',
+                        'codecs': (),
+                        'required': {'name': iospec, ...},
+                        'optional': {...},
+                        'returns': iospec,
+                        'unlimited': False,
+                        },
+                    },
+                }
+            
+            The iospec items are only present for view callables with a
+            'manager' (an 'iomanager.IOManager'), and do not include special
+            or injected keyword arguments. """
         types_to_skip = getattr(self, 'types_to_skip', [])
         
         result = {}
-        for path, endpoint_list in endpoints.items():
-            path_methods = {}
-            for item in endpoint_list:
-                request_methods = item.get(
-                    'request_method',
-                    ALL_REQUEST_METHOD_STRINGS,
-                    )
-                method_key = ', '.join(request_methods)
-                
-                view_callable = item['view']
-                if type(view_callable) in types_to_skip:
-                    continue
-                
-                keys_to_skip = self.get_keys_to_skip(view_callable)
-                
-                method_dict = {}
+        for path, item in iter_endpoints(api_tree):
+            request_methods = item.get(
+                'request_method',
+                ALL_REQUEST_METHOD_STRINGS,
+                )
+            method_key = ', '.join(request_methods)
+            
+            view_callable = item['view']
+            if type(view_callable) in types_to_skip or is_mount(view_callable):
+                continue
+            
+            keys_to_skip = self.get_keys_to_skip(view_callable)
+            
+            method_dict = {
+                'view': view_callable,
+                'request_methods': list(request_methods),
+                'description': (
+                    view_callable.wrapped.__doc__ or
+                    'No description provided.'
+                    ),
+                'codecs': getattr(view_callable, 'codecs', ()),
+                }
+            
+            if hasattr(view_callable, 'manager'):
+                manager = view_callable.manager
                 
-                method_dict['description'] = (
-                    view_callable.wrapped.__doc__ or 'No description provided.'
-                    )
+                raw_iospecs = {
+                    'required': manager.input_processor.required.copy(),
+                    'optional': manager.input_processor.optional.copy(),
+                    'returns': manager.output_processor.required,
+                    }
                 
-                if hasattr(view_callable, 'manager'):
-                    manager = view_callable.manager
-                    
-                    raw_iospecs = {
-                        'required': manager.input_processor.required.copy(),
-                        'optional': manager.input_processor.optional.copy(),
-                        'returns': manager.output_processor.required,
-                        }
-                    
-                    for ikey_a in keys_to_skip:
-                        for ikey_b in ['required', 'optional']:
-                            raw_iospecs[ikey_b].pop(ikey_a, None)
-                    
-                    prepared_iospecs = {
-                        ikey: self.prepare(ivalue)
-                        for ikey, ivalue in raw_iospecs.items()
-                        if ivalue is not NotProvided and ivalue != {}
-                        }
-                    
-                    if manager.input_processor.unlimited:
-                        prepared_iospecs['unlimited'] = (
-                            manager.input_processor.unlimited
-                            )
-                    
-                    method_dict.update(prepared_iospecs)
+                for ikey_a in keys_to_skip:
+                    for ikey_b in ['required', 'optional']:
+                        raw_iospecs[ikey_b].pop(ikey_a, None)
                 
-                path_methods[method_key] = method_dict
+                method_dict.update(raw_iospecs)
+                method_dict['unlimited'] = manager.input_processor.unlimited
             
-            if path_methods:
-                result[path] = path_methods
+            result.setdefault(path, {})[method_key] = method_dict
         
         return result
     
+    def create_documentation(self, api_tree):
+        model = self.create_endpoint_model(api_tree)
+        
+        return {
+            path: {
+                method_key: self.prepare_endpoint(endpoint)
+                for method_key, endpoint in path_methods.items()
+                }
+            for path, path_methods in model.items()
+            }
+    
+    def prepare_endpoint(self, endpoint):
+        """ Prepare one endpoint of 'create_endpoint_model' for rendering. """
+        method_dict = {'description': endpoint['description']}
+        
+        if endpoint['codecs']:
+            method_dict['content_types'] = (
+                self.prepare_content_types(endpoint['codecs'])
+                )
+        
+        for ikey in ['required', 'optional', 'returns']:
+            ivalue = endpoint.get(ikey, NotProvided)
+            if ivalue is not NotProvided and ivalue != {}:
+                method_dict[ikey] = self.prepare(ivalue)
+        
+        if endpoint.get('unlimited'):
+            method_dict['unlimited'] = endpoint['unlimited']
+        
+        return method_dict
+    
     @classmethod
     def add_documentation_views(
         cls,
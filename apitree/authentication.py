@@ -0,0 +1,100 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import hashlib
+
+from .exc import AuthenticationError
+from .util import TTLCache
+
+# Attribute of the request which holds the principal authenticated by its
+# view callable (see 'BaseViewCallable.authenticator').
+PRINCIPAL_ATTRIBUTE = 'apitree_principal'
+
+def get_principal(request):
+    """ Return the principal authenticated for 'request', or None. """
+    return getattr(request, PRINCIPAL_ATTRIBUTE, None)
+
+class Authenticator(object):
+    """ Authenticates requests for view callables (see
+        'BaseViewCallable.authenticator').
+        
+        Subclasses implement 'verify', and may override 'get_credentials'. """
+    
+    def get_credentials(self, request):
+        """ Return the credentials presented by 'request', or None. By default,
+            the 'Authorization' header. """
+        return request.headers.get('Authorization')
+    
+    def verify(self, credentials):
+        """ Return the principal identified by 'credentials'. Raise
+            'AuthenticationError' if they are invalid. """
+        raise NotImplementedError
+    
+    def anonymous(self, request):
+        """ Return the principal for a request without credentials. """
+        return None
+    
+    def authenticate(self, request):
+        credentials = self.get_credentials(request)
+        if credentials is None:
+            return self.anonymous(request)
+        return self.verify(credentials)
+
+class CachedAuthenticator(Authenticator):
+    """ Caches the results of another authenticator's 'verify' method.
+        
+        Entries are keyed by a SHA-256 digest of the credentials, so raw tokens
+        are not kept in memory. Verified principals are cached for 'ttl'
+        seconds; invalid credentials are cached for 'negative_ttl' seconds
+        (0 disables negative caching). At most 'max_size' entries are kept. """
+    
+    def __init__(self, authenticator, max_size=1024, ttl=60, negative_ttl=5):
+        self.authenticator = authenticator
+        self.negative_ttl = negative_ttl
+        self.cache = TTLCache(max_size, ttl)
+    
+    @staticmethod
+    def digest(credentials):
+        if isinstance(credentials, str):
+            credentials = credentials.encode('utf-8')
+        return hashlib.sha256(credentials).digest()
+    
+    def get_credentials(self, request):
+        return self.authenticator.get_credentials(request)
+    
+    def anonymous(self, request):
+        return self.authenticator.anonymous(request)
+    
+    def verify(self, credentials):
+        key = self.digest(credentials)
+        
+        entry = self.cache.get(key)
+        if entry is not None:
+            principal, error_msg = entry
+            if error_msg is not None:
+                raise AuthenticationError(error_msg)
+            return principal
+        
+        try:
+            principal = self.authenticator.verify(credentials)
+        except AuthenticationError as exc:
+            if self.negative_ttl > 0:
+                self.cache.set(key, (None, str(exc)), self.negative_ttl)
+            raise
+        
+        self.cache.set(key, (principal, None))
+        return principal
+    
+    # ------------------------- Invalidation hooks -------------------------
+    
+    def invalidate(self, credentials):
+        """ Forget the cached result for 'credentials', e.g. on logout. """
+        self.cache.pop(self.digest(credentials))
+    
+    def invalidate_principal(self, predicate):
+        """ Forget cached principals for which 'predicate(principal)' is true,
+            e.g. when a user is disabled. """
+        self.cache.discard_where(
+            lambda entry: entry[1] is None and predicate(entry[0])
+            )
+    
+    def clear(self):
+        self.cache.clear()
@@ -0,0 +1,356 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import json
+import re
+import zlib
+from collections.abc import Mapping
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+from webob import Request
+
+from .exc import (
+    DecodingError,
+    MissingDependencyError,
+    PayloadShapeError,
+    PayloadTooLargeError,
+    )
+
+def parse_media_type(header_value):
+    """ Return the lowercase media type from a 'Content-Type' or 'Accept'
+        header item, without any parameters ('; charset=utf-8', 'q=0.5'). """
+    return header_value.split(';', 1)[0].strip().lower()
+
+# WSGI environ key holding the maximum decompressed body size, in bytes.
+MAX_BODY_BYTES_ENVIRON_KEY = 'apitree.max_body_bytes'
+
+# Maximum decompressed body size, in bytes, when the view callable has no
+# 'max_body_bytes' limit (see 'apitree.limits.PayloadLimits').
+DEFAULT_MAX_DECOMPRESSED_BYTES = 10 * 1024 * 1024
+
+# WSGI environ key holding the maximum container nesting depth of the body.
+MAX_DEPTH_ENVIRON_KEY = 'apitree.max_depth'
+
+# Brackets, and strings (which may contain brackets), of a JSON document.
+JSON_DEPTH_TOKEN_RE = re.compile(
+    rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]',
+    re.DOTALL,
+    )
+
+# 'wbits' values for 'zlib.decompressobj', by 'Content-Encoding'.
+ZLIB_WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'x-gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+    }
+
+def decompress(body, encoding, max_bytes=None):
+    """ Decompress 'body'. Decompression stops as soon as the output exceeds
+        'max_bytes', so compressed bodies cannot expand without limit. """
+    try:
+        decompressor = zlib.decompressobj(ZLIB_WBITS[encoding])
+    except KeyError:
+        raise DecodingError(
+            "Unsupported 'Content-Encoding': {}".format(encoding)
+            )
+    
+    try:
+        if max_bytes is None:
+            result = decompressor.decompress(body) + decompressor.flush()
+        else:
+            result = decompressor.decompress(body, max_bytes + 1)
+    except zlib.error as exc:
+        raise DecodingError(
+            "Request body could not be decompressed as '{}': {}"
+            .format(encoding, exc)
+            )
+    
+    if max_bytes is not None and len(result) > max_bytes:
+        raise PayloadTooLargeError(
+            "Decompressed request body exceeds {} bytes.".format(max_bytes)
+            )
+    
+    if not decompressor.eof:
+        raise DecodingError(
+            "Request body is truncated ('{}').".format(encoding)
+            )
+    
+    return result
+
+def read_body(request):
+    """ Return the request body, decompressed according to the
+        'Content-Encoding' header. The decompressed body may be at most
+        'max_body_bytes' of the view callable, or by default
+        'DEFAULT_MAX_DECOMPRESSED_BYTES'; larger bodies raise
+        'PayloadTooLargeError'. """
+    encoding = request.headers.get('content-encoding', '').strip().lower()
+    body = request.body
+    
+    if encoding in ('', 'identity'):
+        return body
+    
+    environ = getattr(request, 'environ', {})
+    max_bytes = environ.get(
+        MAX_BODY_BYTES_ENVIRON_KEY,
+        DEFAULT_MAX_DECOMPRESSED_BYTES,
+        )
+    
+    return decompress(body, encoding, max_bytes)
+
+def check_json_depth(body, max_depth):
+    """ Raise 'PayloadShapeError' if the containers of the JSON document
+        'body' (bytes) nest deeper than 'max_depth'. This is checked before
+        parsing, since parsing a deeply nested document exhausts the stack. """
+    if max_depth is None:
+        return
+    if body.count(b'[') + body.count(b'{') <= max_depth:
+        return
+    
+    depth = 0
+    for match in JSON_DEPTH_TOKEN_RE.finditer(body):
+        token = match.group()
+        if token in (b'[', b'{'):
+            depth += 1
+            if depth > max_depth:
+                raise PayloadShapeError(
+                    "Nesting depth exceeds {}.".format(max_depth)
+                    )
+        elif token in (b']', b'}'):
+            depth -= 1
+
+def get_max_depth(request):
+    environ = getattr(request, 'environ', {})
+    return environ.get(MAX_DEPTH_ENVIRON_KEY)
+
+def is_encoded(request):
+    encoding = request.headers.get('content-encoding', '').strip().lower()
+    return encoding not in ('', 'identity')
+
+def require_mapping(value):
+    if not isinstance(value, Mapping):
+        raise DecodingError(
+            "Request body must decode to a mapping of keyword arguments. "
+            "Got: {}".format(type(value).__name__)
+            )
+    return value
+
+def parse_accept(header_value):
+    """ Return the media types in an 'Accept' header, highest quality first.
+        Media types with equal quality keep the order given by the client. """
+    weighted = []
+    for position, item in enumerate(header_value.split(',')):
+        media_type = parse_media_type(item)
+        if not media_type:
+            continue
+        
+        quality = 1.0
+        for param in item.split(';')[1:]:
+            name, _, value = param.partition('=')
+            if name.strip().lower() != 'q':
+                continue
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        
+        if quality > 0:
+            weighted.append((-quality, position, media_type))
+    
+    return [media_type for _, _, media_type in sorted(weighted)]
+
+class Codec(object):
+    """ Decodes request bodies and encodes response bodies for one or more
+        media types.
+        
+        Subclasses provide 'media_types' (the first is used as the response
+        'Content-Type'), 'loads' and 'dumps'. 'dependency' is the optional
+        third-party module the codec relies on, if any ('None' when that
+        module is not installed). """
+    media_types = ()
+    dependency = None
+    dependency_name = None
+    
+    @property
+    def media_type(self):
+        return self.media_types[0]
+    
+    def is_available(self):
+        return self.dependency_name is None or self.dependency is not None
+    
+    def require_dependency(self):
+        if not self.is_available():
+            raise MissingDependencyError(
+                "The '{}' package is required to use '{}'."
+                .format(self.dependency_name, type(self).__name__)
+                )
+    
+    def matches(self, media_type):
+        return media_type in self.media_types
+    
+    def decode(self, body):
+        """ Decode 'body' (bytes) into a dictionary of keyword arguments. """
+        self.require_dependency()
+        
+        try:
+            result = self.loads(body)
+        except Exception as exc:
+            raise DecodingError(
+                "Request body could not be decoded as '{}': {}"
+                .format(self.media_type, exc)
+                )
+        
+        return require_mapping(result)
+    
+    def decode_request(self, request):
+        """ Decode the body of 'request'. Codecs can be used as body
+            decoders. """
+        return self.decode(read_body(request))
+    
+    def encode(self, value):
+        """ Encode 'value' (a view callable's return value) as bytes. """
+        self.require_dependency()
+        return self.dumps(value)
+    
+    def loads(self, body):
+        raise NotImplementedError
+    
+    def dumps(self, value):
+        raise NotImplementedError
+
+class MessagePackCodec(Codec):
+    media_types = ('application/msgpack', 'application/x-msgpack')
+    dependency = msgpack
+    dependency_name = 'msgpack'
+    
+    def loads(self, body):
+        return self.dependency.unpackb(body, raw=False)
+    
+    def dumps(self, value):
+        return self.dependency.packb(value, use_bin_type=True)
+
+class CBORCodec(Codec):
+    media_types = ('application/cbor', )
+    dependency = cbor2
+    dependency_name = 'cbor2'
+    
+    def loads(self, body):
+        return self.dependency.loads(body)
+    
+    def dumps(self, value):
+        return self.dependency.dumps(value)
+
+def find_codec(codecs, media_type):
+    """ Return the first available codec in 'codecs' which handles
+        'media_type', or None. """
+    for codec in codecs:
+        if codec.matches(media_type) and codec.is_available():
+            return codec
+    return None
+
+def negotiate_codec(codecs, accept_header):
+    """ Return the codec which best satisfies an 'Accept' header, or None.
+        
+        Only the client's most preferred media type is considered. If no codec
+        handles it (e.g. 'application/json' or '*/*'), the response is left
+        to the view's renderer, even if a less preferred media type has a
+        codec. """
+    for media_type in parse_accept(accept_header):
+        return find_codec(codecs, media_type)
+    return None
+
+# ---------------------------- Body decoders ---------------------------
+
+# Keyword argument which receives the records of a newline-delimited JSON body.
+NDJSON_RECORDS_KEY = 'records'
+
+def decode_json(request):
+    max_depth = get_max_depth(request)
+    
+    try:
+        if is_encoded(request) or max_depth is not None:
+            body = read_body(request)
+            check_json_depth(body, max_depth)
+            result = json.loads(body.decode('utf-8'))
+        else:
+            result = request.json_body
+    except (ValueError, RecursionError) as exc:
+        raise DecodingError(
+            "Request body could not be decoded as JSON: {}".format(exc)
+            )
+    
+    return require_mapping(result)
+
+def decode_form(request):
+    """ URL-encoded and multipart form bodies, parsed by the request object.
+        Compressed bodies are decompressed and parsed the same way. """
+    if not is_encoded(request):
+        return request.POST
+    
+    form_request = Request.blank(
+        '/',
+        method='POST',
+        body=read_body(request),
+        headers={'Content-Type': request.headers.get('content-type', '')},
+        )
+    return form_request.POST
+
+def decode_ndjson(request):
+    """ Newline-delimited JSON. Each line is one record; the list of records is
+        passed as a single keyword argument, 'NDJSON_RECORDS_KEY'. """
+    body = read_body(request)
+    
+    # Records are nested in the list of records, in the keyword arguments.
+    max_depth = get_max_depth(request)
+    if max_depth is not None:
+        check_json_depth(body, max(max_depth - 2, 0))
+    
+    try:
+        lines = body.decode('utf-8').splitlines()
+        records = [json.loads(line) for line in lines if line.strip()]
+    except (ValueError, RecursionError) as exc:
+        raise DecodingError(
+            "Request body could not be decoded as NDJSON: {}".format(exc)
+            )
+    
+    return {NDJSON_RECORDS_KEY: records}
+
+class BodyDecoderRegistry(object):
+    """ Maps request media types to body decoders.
+        
+        A body decoder is a callable which takes the request and returns a
+        mapping of keyword arguments, raising 'DecodingError' when the body is
+        invalid. 'default' is used for unregistered media types. """
+    
+    def __init__(self, decoders={}, default=None):
+        self.decoders = {}
+        self.default = default
+        for media_type, decoder in decoders.items():
+            self.register(media_type, decoder)
+    
+    def register(self, media_type, decoder):
+        self.decoders[parse_media_type(media_type)] = decoder
+    
+    def copy(self):
+        return type(self)(self.decoders, self.default)
+    
+    def get(self, content_type):
+        """ 'content_type' is a 'Content-Type' header value. """
+        return self.decoders.get(parse_media_type(content_type), self.default)
+
+default_body_decoders = BodyDecoderRegistry(
+    {
+        'application/json': decode_json,
+        'application/x-www-form-urlencoded': decode_form,
+        'multipart/form-data': decode_form,
+        'application/x-ndjson': decode_ndjson,
+        'application/ndjson': decode_ndjson,
+        },
+    default=decode_form,
+    )
@@ -0,0 +1,86 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import asyncio
+import concurrent.futures
+import inspect
+import math
+import time
+
+from .exc import DeadlineExceededError
+
+class Deadline(object):
+    """ The time by which a request must be finished. Wrapped callables can
+        receive the deadline of the current request as a keyword argument (see
+        'FunctionViewCallable.deadline_kwarg') and check 'remaining' before
+        starting expensive work. """
+    
+    def __init__(self, timeout):
+        """ 'timeout' is in seconds from now. """
+        self.time = time.monotonic() + timeout
+    
+    def remaining(self):
+        return max(0.0, self.time - time.monotonic())
+    
+    def expired(self):
+        return time.monotonic() >= self.time
+    
+    def check(self):
+        if self.expired():
+            raise DeadlineExceededError('Request deadline expired.')
+
+def parse_timeout(value):
+    """ Parse a timeout header value (seconds, may be fractional). Returns None
+        if the value is missing or invalid. """
+    if value is None:
+        return None
+    
+    try:
+        result = float(value)
+    except ValueError:
+        return None
+    
+    if result < 0 or not math.isfinite(result):
+        return None
+    return result
+
+def run_with_deadline(func, kwargs, deadline=None, executor=None):
+    """ Call 'func' with 'kwargs', enforcing 'deadline'.
+        
+        Coroutine functions are run to completion in a new event loop, and
+        cancelled when the deadline passes. Other callables are run in
+        'executor' if one is given; the call is abandoned (left to finish in the
+        background) when the deadline passes, and its future is the 'future'
+        attribute of the error. Without an executor, they are
+        called directly and cannot be interrupted: the deadline is checked
+        before the call, and again after it, so that the result of a call
+        which finished too late is discarded.
+        
+        Raises 'DeadlineExceededError'. """
+    if deadline is not None:
+        deadline.check()
+    
+    if inspect.iscoroutinefunction(func):
+        if deadline is None:
+            return asyncio.run(func(**kwargs))
+        
+        try:
+            return asyncio.run(
+                asyncio.wait_for(func(**kwargs), deadline.remaining())
+                )
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError('Request deadline expired.')
+    
+    if deadline is None:
+        return func(**kwargs)
+    
+    if executor is None:
+        result = func(**kwargs)
+        deadline.check()
+        return result
+    
+    future = executor.submit(func, **kwargs)
+    try:
+        return future.result(timeout=deadline.remaining())
+    except concurrent.futures.TimeoutError:
+        if future.cancel():
+            future = None
+        raise DeadlineExceededError('Request deadline expired.', future=future)
@@ -0,0 +1,148 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+from pyramid.exceptions import PredicateMismatch
+from pyramid.renderers import render_to_response
+from pyramid.response import Response
+
+from .exc import APITreeError
+from .util import (
+    make_uppercase_tuple,
+    preload_view,
+    )
+
+# View arguments which 'MethodDispatcher' evaluates itself. Other view
+# arguments (e.g. 'permission') need Pyramid's view lookup, so they are
+# rejected.
+SUPPORTED_VIEW_KWARGS = {
+    'view',
+    'request_method',
+    'renderer',
+    'custom_predicates',
+    }
+
+# Key of the Pyramid registry holding the dispatchers registered by
+# 'scan_api_tree', by route name.
+DISPATCHERS_REGISTRY_KEY = 'apitree.dispatchers'
+
+def make_catchall_predicate():
+    """ Return a custom predicate which is always true, for a catchall without
+        a 'catchall_custom_predicate'. Each catchall gets its own, so that
+        Pyramid does not consider catchalls of the same route to conflict.
+        'MethodDispatcher' does not call these predicates. """
+    def catchall_custom_predicate(context, request):
+        return True
+    
+    catchall_custom_predicate.always_true = True
+    return catchall_custom_predicate
+
+def get_dispatchers(configurator):
+    """ Return the dispatchers registered with 'configurator' by route name,
+        or None if 'configurator' has no registry. """
+    registry = getattr(configurator, 'registry', None)
+    if registry is None:
+        return None
+    return registry.setdefault(DISPATCHERS_REGISTRY_KEY, {})
+
+class MethodDispatcher(object):
+    """ A Pyramid view callable which selects one of the views of a route by
+        request method, from a table computed when views are added.
+        
+        Views are in Pyramid's order of precedence: views with custom
+        predicates (e.g. catchalls) first, in the order they were added; then
+        views with a request method; then views for any request method. Only
+        custom predicates other than those of 'make_catchall_predicate' are
+        called per request. """
+    
+    def __init__(self, route=None):
+        self.route = route
+        # (predicates, request methods or None, view_dict).
+        self.candidates = []
+        # Request method -> ((predicates, view_dict), ...).
+        self.table = {}
+        # Entries for request methods which are not in 'table'.
+        self.default = ()
+    
+    def add_view(self, view_dict):
+        for ikey in view_dict:
+            if ikey not in SUPPORTED_VIEW_KWARGS:
+                raise APITreeError(
+                    "View argument '{}' of route '{}' is not supported by "
+                    "'MethodDispatcher'.".format(ikey, self.route)
+                    )
+        
+        request_method = view_dict.get('request_method')
+        if request_method is not None:
+            request_method = set(make_uppercase_tuple(request_method))
+            # Like Pyramid's 'request_method' predicate, 'GET' views also
+            # handle 'HEAD' requests.
+            if 'GET' in request_method:
+                request_method.add('HEAD')
+            request_method = frozenset(request_method)
+        predicates = tuple(view_dict.get('custom_predicates', ()))
+        
+        self.candidates.append((predicates, request_method, view_dict))
+        self.candidates.sort(
+            key=lambda item: (-len(item[0]), item[1] is None)
+            )
+        
+        self.build_table()
+    
+    def build_table(self):
+        methods = set()
+        for predicates, request_method, view_dict in self.candidates:
+            if request_method is not None:
+                methods.update(request_method)
+        
+        self.table = {method: self.get_entries(method) for method in methods}
+        self.default = self.get_entries(None)
+    
+    def get_entries(self, method):
+        """ Return the '(predicates, view_dict)' entries for 'method' (None for
+            other request methods), up to the first which has no predicates to
+            call. """
+        result = []
+        for predicates, request_method, view_dict in self.candidates:
+            if request_method is not None and method not in request_method:
+                continue
+            
+            predicates = tuple(
+                item for item in predicates
+                if not getattr(item, 'always_true', False)
+                )
+            result.append((predicates, view_dict))
+            if not predicates:
+                break
+        
+        return tuple(result)
+    
+    def preload(self):
+        for predicates, request_method, view_dict in self.candidates:
+            preload_view(view_dict['view'])
+    
+    def select_view(self, request):
+        """ Return the view dictionary for 'request', or None. """
+        entries = self.table.get(request.method, self.default)
+        context = getattr(request, 'context', None)
+        
+        for predicates, view_dict in entries:
+            if not predicates or all(
+                predicate(context, request) for predicate in predicates
+                ):
+                return view_dict
+        
+        return None
+    
+    def __call__(self, request):
+        view_dict = self.select_view(request)
+        if view_dict is None:
+            raise PredicateMismatch(
+                "No view matches the request for route '{}'."
+                .format(self.route)
+                )
+        
+        response = view_dict['view'](request)
+        
+        renderer = view_dict.get('renderer')
+        if renderer is not None and not isinstance(response, Response):
+            response = render_to_response(renderer, response, request)
+        
+        return response
@@ -8,4 +8,43 @@ class APITreeError(Error):
 
 class APITreeStructureError(APITreeError):
     """ API tree could not be traversed. An API tree must be either a dictionary
-        or a list of 2-length tuples. """
\ No newline at end of file
+        or a list of 2-length tuples. """
+
+class MissingDependencyError(Error):
+    """ An optional third-party package is required for this feature, but is
+        not installed. """
+
+class ContentError(Error):
+    """ Request or response content could not be processed. """
+
+class DecodingError(ContentError):
+    """ A request body could not be decoded into keyword arguments. """
+
+class PayloadTooLargeError(ContentError):
+    """ A request body exceeds the maximum allowed size. """
+
+class PayloadShapeError(ContentError):
+    """ Decoded request content exceeds the allowed nesting depth or list
+        length. """
+
+class AdmissionRejectedError(Error):
+    """ A request was shed by a concurrency limiter. """
+    def __init__(self, *pargs, **kwargs):
+        self.retry_after = kwargs.pop('retry_after', None)
+        super().__init__(*pargs, **kwargs)
+
+class DeadlineExceededError(Error):
+    """ A request was not finished before its deadline. 'future' is the
+        abandoned call, if it was left running in an executor. """
+    def __init__(self, *pargs, **kwargs):
+        self.future = kwargs.pop('future', None)
+        super().__init__(*pargs, **kwargs)
+
+class AuthenticationError(Error):
+    """ Request credentials are invalid. """
+
+class ResourceError(Error):
+    """ A resource could not be provided to a view callable. """
+
+class ResourceUnavailableError(ResourceError):
+    """ A pooled resource was not available in time. """
@@ -0,0 +1,96 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import threading
+
+from pyramid.path import DottedNameResolver
+
+from .router import (
+    MOUNT_REMAINDER,
+    RadixRouter,
+    dispatch,
+    )
+from .util import get_route_pattern
+
+# Appended to the prefix of a 'LazySubtree' for the route of the paths below
+# it.
+MOUNT_SUFFIX = '/*' + MOUNT_REMAINDER
+
+class LazySubtree(object):
+    """ A subtree of an API tree which is loaded, scanned and compiled into a
+        'RadixRouter' on the first request under its prefix, e.g.:
+            
+            api_tree = {
+                '/reports': LazySubtree('myapp.reports:api_tree'),
+                ...
+                }
+        
+        'loader' is a dotted name ('package.module:name' or
+        'package.module.name') of the subtree, imported when it is loaded; or
+        a callable which returns the subtree.
+        
+        'scan_api_tree' and 'RadixRouter' mount it as a route for the prefix
+        and a route for the paths below it, with this object as the view
+        callable. Loading happens once, under a lock; concurrent first
+        requests wait for it. As with 'mount_api_tree', view callables of the
+        subtree may only use the view arguments in
+        'apitree.dispatch.SUPPORTED_VIEW_KWARGS', and view options (see
+        'set_view_options') must be set by the loader. 'add_catchall' and
+        the documentation skip lazy subtrees. """
+    
+    def __init__(self, loader, router_class=RadixRouter):
+        self.loader = loader
+        self.router_class = router_class
+        self.lock = threading.Lock()
+        self.router = None
+    
+    @property
+    def loaded(self):
+        return self.router is not None
+    
+    def load_subtree(self):
+        if isinstance(self.loader, str):
+            return DottedNameResolver().resolve(self.loader)
+        return self.loader()
+    
+    def get_router(self):
+        """ Return the router of the subtree, loading it if needed. """
+        router = self.router
+        if router is not None:
+            return router
+        
+        with self.lock:
+            if self.router is None:
+                self.router = self.router_class.from_api_tree(
+                    self.load_subtree()
+                    )
+            return self.router
+    
+    def preload(self):
+        """ Load the subtree now, e.g. before worker processes fork. """
+        self.get_router().preload()
+    
+    def get_mount_patterns(self, prefix):
+        return [prefix, prefix + MOUNT_SUFFIX]
+    
+    def mount(self, configurator, prefix):
+        """ Add the Pyramid routes of 'get_mount_patterns'. """
+        for pattern in self.get_mount_patterns(prefix):
+            configurator.add_route(name=pattern, pattern=pattern)
+            configurator.add_view(route_name=pattern, view=self)
+    
+    def __call__(self, request):
+        router = self.get_router()
+        
+        prefix = get_route_pattern(request)
+        if prefix.endswith(MOUNT_SUFFIX):
+            prefix = prefix[:-len(MOUNT_SUFFIX)]
+        
+        matchdict = dict(request.matchdict or {})
+        remainder = matchdict.pop(MOUNT_REMAINDER, ())
+        
+        return dispatch(
+            router,
+            request,
+            '/' + '/'.join(remainder),
+            prefix,
+            matchdict,
+            )
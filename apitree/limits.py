@@ -0,0 +1,151 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+from collections.abc import (
+    Sequence,
+    Mapping,
+    )
+from iomanager import ListOf
+from iomanager.iomanager import NotProvided
+
+from .content import (
+    MAX_BODY_BYTES_ENVIRON_KEY,
+    MAX_DEPTH_ENVIRON_KEY,
+    )
+from .exc import (
+    PayloadTooLargeError,
+    PayloadShapeError,
+    )
+from .util import is_container
+
+# Iospec types whose values are always JSON scalars. Other types may be coerced
+# from containers, so their nesting depth cannot be derived.
+SCALAR_TYPES = (bool, int, float, str, type(None))
+
+def iospec_depth(iospec):
+    """ Return the maximum container nesting depth of values allowed by
+        'iospec', or None if it cannot be determined. A scalar has depth 0. """
+    if isinstance(iospec, ListOf):
+        return container_depth([iospec.iospec_obj])
+    if isinstance(iospec, Mapping):
+        return container_depth(iospec.values())
+    if is_container(iospec, Sequence):
+        return container_depth(iospec)
+    if isinstance(iospec, type) and issubclass(iospec, SCALAR_TYPES):
+        return 0
+    return None
+
+def container_depth(iospecs):
+    depth = 0
+    for item in iospecs:
+        item_depth = iospec_depth(item)
+        if item_depth is None:
+            return None
+        depth = max(depth, item_depth)
+    return depth + 1
+
+def input_depth(input_processor):
+    """ Return the maximum nesting depth of a request body which can satisfy
+        'input_processor' (the body itself is depth 1), or None. """
+    if input_processor.unlimited:
+        return None
+    
+    iospecs = []
+    for iospec in [input_processor.required, input_processor.optional]:
+        if iospec is NotProvided:
+            continue
+        if not isinstance(iospec, Mapping):
+            return None
+        iospecs.extend(iospec.values())
+    
+    return container_depth(iospecs)
+
+class PayloadLimits(object):
+    """ Limits on request content, checked before iospec coercion and
+        verification so that oversized or deeply nested payloads are rejected
+        cheaply.
+        
+        'max_body_bytes' applies to the request body before and after
+        decompression. 'max_list_length' applies to every list in the decoded
+        body. 'max_depth' is the maximum container nesting depth; the body
+        itself has depth 1. """
+    
+    def __init__(
+        self,
+        max_body_bytes=None,
+        max_list_length=None,
+        max_depth=None,
+        ):
+        self.max_body_bytes = max_body_bytes
+        self.max_list_length = max_list_length
+        self.max_depth = max_depth
+    
+    def is_empty(self):
+        return (
+            self.max_body_bytes is None and
+            self.max_list_length is None and
+            self.max_depth is None
+            )
+    
+    def prepare_request(self, request):
+        """ Check the body size, and record 'max_depth' for the body decoders,
+            which check it before parsing (see
+            'apitree.content.check_json_depth'). """
+        self.check_body_size(request)
+        
+        environ = getattr(request, 'environ', None)
+        if environ is not None and self.max_depth is not None:
+            environ[MAX_DEPTH_ENVIRON_KEY] = self.max_depth
+    
+    def check_body_size(self, request):
+        """ Check the body size using 'Content-Length' when present, so that
+            the body does not need to be read. Otherwise no more of the body
+            is read than is needed to tell that it is too large. """
+        if self.max_body_bytes is None:
+            return
+        
+        try:
+            length = int(request.headers['content-length'])
+        except (KeyError, ValueError):
+            body = request.body_file.read(self.max_body_bytes + 1)
+            length = len(body)
+            if length <= self.max_body_bytes:
+                request.body = body
+        
+        if length > self.max_body_bytes:
+            raise PayloadTooLargeError(
+                "Request body exceeds {} bytes.".format(self.max_body_bytes)
+                )
+        
+        environ = getattr(request, 'environ', None)
+        if environ is not None:
+            environ[MAX_BODY_BYTES_ENVIRON_KEY] = self.max_body_bytes
+    
+    def check_shape(self, value):
+        """ Check nesting depth and list lengths of decoded content, without
+            recursion. """
+        if self.max_depth is None and self.max_list_length is None:
+            return
+        
+        stack = [(value, 1)]
+        while stack:
+            item, depth = stack.pop()
+            
+            if isinstance(item, Mapping):
+                children = item.values()
+            elif is_container(item, Sequence):
+                if (
+                    self.max_list_length is not None and
+                    len(item) > self.max_list_length
+                    ):
+                    raise PayloadShapeError(
+                        "List length exceeds {}.".format(self.max_list_length)
+                        )
+                children = item
+            else:
+                continue
+            
+            if self.max_depth is not None and depth > self.max_depth:
+                raise PayloadShapeError(
+                    "Nesting depth exceeds {}.".format(self.max_depth)
+                    )
+            
+            stack.extend([(child, depth + 1) for child in children])
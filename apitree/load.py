@@ -0,0 +1,270 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import json
+import math
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from iomanager.iomanager import NotProvided
+from webob import Request
+
+from .api_documentation import APIDocumentationMaker
+from .payloads import (
+    PayloadGenerator,
+    PayloadSizes,
+    )
+
+# Placeholders of a Pyramid route pattern, e.g. '{id}' or '{id:\d+}'.
+PLACEHOLDER_RE = re.compile(r'\{(\w+)(?::[^}]*)?\}')
+
+class LoadTarget(object):
+    """ One endpoint of the API tree, requested with its first request
+        method. """
+    
+    def __init__(self, path, endpoint):
+        self.path = path
+        self.endpoint = endpoint
+        self.method = endpoint['request_methods'][0]
+        self.name = '{} {}'.format(self.method, path)
+    
+    def check(self):
+        """ Raise 'TypeError' if values cannot be generated for the
+            parameters of the endpoint (e.g. for a user-defined type). """
+        generator = PayloadGenerator(
+            PayloadSizes(list_length=1, optional_rate=1),
+            random.Random(0),
+            )
+        generator.kwargs(
+            self.endpoint.get('required', NotProvided),
+            self.endpoint.get('optional', NotProvided),
+            )
+    
+    def make_kwargs(self, rng, sizes=None):
+        """ Values for all required and some optional parameters. """
+        generator = PayloadGenerator(sizes, rng)
+        return generator.kwargs(
+            self.endpoint.get('required', NotProvided),
+            self.endpoint.get('optional', NotProvided),
+            )
+    
+    def make_request(self, rng, sizes=None):
+        kwargs = self.make_kwargs(rng, sizes)
+        
+        def replace(match):
+            value = kwargs.pop(match.group(1), 'x')
+            return str(value)
+        
+        path = PLACEHOLDER_RE.sub(replace, self.path)
+        request = Request.blank(path, method=self.method)
+        
+        if kwargs:
+            request.content_type = 'application/json'
+            request.body = json.dumps(kwargs).encode('utf-8')
+        
+        return request
+
+class RouteResult(object):
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+    
+    def add(self, latency, status):
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+def percentile(sorted_values, fraction):
+    """ Nearest-rank percentile of a non-empty sorted list. """
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+class LoadReport(object):
+    """ Throughput and latency (seconds) per target, from 'LoadGenerator.run'.
+        """
+    
+    percentiles = [('p50', 0.5), ('p90', 0.9), ('p99', 0.99)]
+    
+    def __init__(self, results, elapsed, skipped=None):
+        self.results = results
+        self.elapsed = elapsed
+        # Target name -> reason it was not requested.
+        self.skipped = skipped or {}
+    
+    def as_dict(self):
+        routes = {}
+        total = 0
+        for name, result in sorted(self.results.items()):
+            latencies = sorted(result.latencies)
+            if not latencies:
+                continue
+            total += len(latencies)
+            
+            route_dict = {
+                'requests': len(latencies),
+                'throughput': len(latencies) / self.elapsed,
+                'errors': sum(
+                    count for status, count in result.statuses.items()
+                    if status >= 400
+                    ),
+                'statuses': dict(result.statuses),
+                'max': latencies[-1],
+                }
+            for key, fraction in self.percentiles:
+                route_dict[key] = percentile(latencies, fraction)
+            routes[name] = route_dict
+        
+        return {
+            'elapsed': self.elapsed,
+            'requests': total,
+            'throughput': total / self.elapsed if self.elapsed else None,
+            'routes': routes,
+            'skipped': dict(self.skipped),
+            }
+    
+    def format_table(self):
+        """ Return the report as a text table, with latencies in
+            milliseconds. """
+        report = self.as_dict()
+        columns = ['requests', 'errors', 'throughput'] + [
+            key for key, fraction in self.percentiles
+            ] + ['max']
+        
+        rows = [['route'] + columns]
+        for name, route_dict in report['routes'].items():
+            row = [
+                name,
+                str(route_dict['requests']),
+                str(route_dict['errors']),
+                '{:.1f}/s'.format(route_dict['throughput']),
+                ]
+            row.extend(
+                '{:.2f}ms'.format(route_dict[key] * 1000)
+                for key in columns[3:]
+                )
+            rows.append(row)
+        
+        widths = [max(map(len, column)) for column in zip(*rows)]
+        lines = [
+            '  '.join(
+                item.ljust(width) if i == 0 else item.rjust(width)
+                for i, (item, width) in enumerate(zip(row, widths))
+                )
+            for row in rows
+            ]
+        lines.append('{} requests in {:.2f}s ({:.1f}/s)'.format(
+            report['requests'],
+            report['elapsed'],
+            report['throughput'] or 0,
+            ))
+        for name, reason in sorted(report['skipped'].items()):
+            lines.append('Skipped {}: {}'.format(name, reason))
+        return '\n'.join(lines)
+
+class LoadGenerator(object):
+    """ Drives a WSGI application in-process with synthetic requests for the
+        endpoints of an API tree, from the model of
+        'APIDocumentationMaker.create_endpoint_model'.
+        
+        'mix' maps target names ('<METHOD> <path>') to relative weights; only
+        those targets are requested. Without it, every endpoint is requested
+        equally often. Payloads are generated from the input iospecs,
+        deterministically from 'seed', with sizes from 'sizes' (an
+        'apitree.payloads.PayloadSizes'). Endpoints for which payloads cannot
+        be generated (e.g. with iospecs of user-defined types) are not
+        requested; they are listed in 'skipped' and in the report. """
+    
+    documentation_maker_class = APIDocumentationMaker
+    
+    def __init__(self, app, api_tree, mix=None, seed=0, sizes=None):
+        self.app = app
+        self.seed = seed
+        self.sizes = sizes
+        
+        model = self.documentation_maker_class().create_endpoint_model(
+            api_tree
+            )
+        targets = [
+            LoadTarget(path, endpoint)
+            for path, path_methods in sorted(model.items())
+            for method_key, endpoint in sorted(path_methods.items())
+            ]
+        
+        if mix is None:
+            mix = {target.name: 1 for target in targets}
+        else:
+            known = {target.name for target in targets}
+            unknown = set(mix) - known
+            if unknown:
+                raise ValueError(
+                    "Unknown targets: {}".format(', '.join(sorted(unknown)))
+                    )
+        
+        self.targets = []
+        self.weights = []
+        self.skipped = {}
+        for target in targets:
+            if target.name not in mix:
+                continue
+            try:
+                target.check()
+            except TypeError as exc:
+                self.skipped[target.name] = str(exc)
+                continue
+            self.targets.append(target)
+            self.weights.append(mix[target.name])
+    
+    def run(self, requests=1000, concurrency=4, duration=None):
+        """ Send 'requests' requests (or as many as possible in 'duration'
+            seconds, if given) from 'concurrency' threads. Returns a
+            'LoadReport'. """
+        results = {target.name: RouteResult() for target in self.targets}
+        lock = threading.Lock()
+        counter = [0]
+        
+        start = time.perf_counter()
+        if duration is not None:
+            end = start + duration
+        else:
+            end = None
+        
+        def take():
+            if end is not None:
+                return time.perf_counter() < end
+            with lock:
+                if counter[0] >= requests:
+                    return False
+                counter[0] += 1
+                return True
+        
+        def worker(index):
+            rng = random.Random(self.seed * 1000003 + index)
+            while take():
+                (target,) = rng.choices(self.targets, self.weights)
+                request = target.make_request(rng, self.sizes)
+                
+                request_start = time.perf_counter()
+                try:
+                    status = request.get_response(self.app).status_int
+                except Exception:
+                    # Unhandled by the application (no exception view).
+                    status = 500
+                latency = time.perf_counter() - request_start
+                
+                with lock:
+                    results[target.name].add(latency, status)
+        
+        if self.targets:
+            with ThreadPoolExecutor(concurrency) as executor:
+                futures = [
+                    executor.submit(worker, index)
+                    for index in range(concurrency)
+                    ]
+                for future in futures:
+                    future.result()
+        
+        return LoadReport(
+            results,
+            time.perf_counter() - start,
+            self.skipped,
+            )
@@ -0,0 +1,147 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import random
+import threading
+import tracemalloc
+from contextlib import (
+    contextmanager,
+    nullcontext,
+    )
+
+from .util import (
+    add_admin_view,
+    get_route_pattern,
+    )
+
+class MemoryRecording(object):
+    """ Memory allocated in each phase of one sampled request.
+        
+        'tracemalloc' peaks are process-wide, so each phase resets the peak
+        when it starts; the peaks of nested phases are carried up to the
+        enclosing phase. """
+    
+    def __init__(self, profiler, request):
+        self.profiler = profiler
+        self.request = request
+        # Per phase: [bytes allocated (net), peak bytes above the start].
+        self.phases = {}
+        # Per open phase: [traced bytes at the start, peak so far].
+        self.stack = []
+    
+    @contextmanager
+    def phase(self, name, context=nullcontext()):
+        self.enter()
+        try:
+            with context:
+                yield
+        finally:
+            self.exit(name)
+    
+    def enter(self):
+        current, peak = tracemalloc.get_traced_memory()
+        if self.stack:
+            parent = self.stack[-1]
+            parent[1] = max(parent[1], peak)
+        tracemalloc.reset_peak()
+        self.stack.append([current, current])
+    
+    def exit(self, name):
+        current, peak = tracemalloc.get_traced_memory()
+        start, phase_peak = self.stack.pop()
+        phase_peak = max(phase_peak, peak)
+        if self.stack:
+            parent = self.stack[-1]
+            parent[1] = max(parent[1], phase_peak)
+        
+        totals = self.phases.setdefault(name, [0, 0])
+        totals[0] += current - start
+        totals[1] = max(totals[1], phase_peak - start)
+    
+    def finish(self):
+        self.profiler.finish(self)
+
+class MemoryProfiler(object):
+    """ Measures memory allocated by each phase of request handling, per route,
+        using 'tracemalloc'. Use as the 'memory_profiler' view option.
+        
+        A 'sample_rate' fraction of requests is measured, one at a time.
+        Allocations by other threads during a sampled request are included, so
+        figures are most accurate under light concurrency.
+        
+        'tracemalloc' is started by the first sampled request if it is not
+        already tracing, and slows down every allocation in the process until
+        'stop' is called. """
+    
+    def __init__(self, sample_rate=0.01):
+        self.sample_rate = sample_rate
+        self.started_tracing = False
+        self.sampling = threading.Lock()
+        self.lock = threading.Lock()
+        self.stats = {}
+    
+    def start(self, request):
+        """ Return a 'MemoryRecording' if 'request' is sampled, or None. """
+        if random.random() >= self.sample_rate:
+            return None
+        if not self.sampling.acquire(blocking=False):
+            return None
+        
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        
+        return MemoryRecording(self, request)
+    
+    def finish(self, recording):
+        self.sampling.release()
+        
+        route = get_route_pattern(recording.request)
+        with self.lock:
+            for name, (allocated, peak) in recording.phases.items():
+                stats = self.stats.setdefault(
+                    (route, name),
+                    {'calls': 0, 'allocated_bytes': 0, 'peak_bytes': 0},
+                    )
+                stats['calls'] += 1
+                stats['allocated_bytes'] += allocated
+                stats['peak_bytes'] = max(stats['peak_bytes'], peak)
+    
+    def stop(self):
+        """ Stop 'tracemalloc' if this profiler started it. """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+    
+    def get_stats(self):
+        """ Return a list of statistics per route and phase, with the routes
+            and phases which allocated the most memory first.
+            'allocated_bytes' is the net total over all sampled calls;
+            'peak_bytes' is the largest peak of a single call. """
+        with self.lock:
+            result = [
+                dict(stats, route=route, phase=name)
+                for (route, name), stats in self.stats.items()
+                ]
+        result.sort(
+            key=lambda item: (item['allocated_bytes'], item['peak_bytes']),
+            reverse=True,
+            )
+        return result
+    
+    def clear(self):
+        with self.lock:
+            self.stats = {}
+    
+    def add_views(
+        self,
+        configurator,
+        path='/_apitree/memory',
+        **view_kwargs
+        ):
+        """ Add a JSON endpoint which returns 'get_stats'. Restrict access to
+            it, e.g. with a 'permission' view argument. """
+        add_admin_view(
+            configurator,
+            path,
+            lambda: {'memory': self.get_stats()},
+            **view_kwargs
+            )
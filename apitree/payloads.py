@@ -0,0 +1,216 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import datetime
+import decimal
+import random
+import string
+import uuid
+from collections.abc import (
+    Sequence,
+    Mapping,
+    )
+
+from iomanager import (
+    AnyType,
+    ListOf,
+    )
+from iomanager.iomanager import NotProvided
+
+from .util import is_container
+
+class PayloadSizes(object):
+    """ Sizes of generated payloads. Each size is an integer, or a
+        '(minimum, maximum)' tuple to choose from at random.
+        
+        'list_length': items of each 'ListOf' list.
+        'string_length': characters of each string.
+        'any_depth': container nesting depth of values for 'AnyType' and
+            'object' iospecs (0 for scalars). Values for 'list' and 'dict'
+            iospecs have at least one level.
+        'optional_rate': fraction of optional parameters included. """
+    
+    def __init__(
+        self,
+        list_length=3,
+        string_length=8,
+        any_depth=0,
+        optional_rate=0.5,
+        ):
+        self.list_length = list_length
+        self.string_length = string_length
+        self.any_depth = any_depth
+        self.optional_rate = optional_rate
+
+class PayloadGenerator(object):
+    """ Generates values which satisfy iospecs. With 'json_compatible', types
+        which JSON cannot represent (e.g. 'uuid.UUID') are generated as the
+        strings which 'iomanager.web_tools' coerces from. """
+    
+    def __init__(self, sizes=None, rng=None, json_compatible=True):
+        if sizes is None:
+            sizes = PayloadSizes()
+        if rng is None:
+            rng = random.Random()
+        self.sizes = sizes
+        self.rng = rng
+        self.json_compatible = json_compatible
+        
+        self.generators = {
+            bool: self.make_bool,
+            int: self.make_int,
+            float: self.make_float,
+            str: self.make_str,
+            type(None): self.make_none,
+            decimal.Decimal: self.make_decimal,
+            uuid.UUID: self.make_uuid,
+            datetime.datetime: self.make_datetime,
+            list: self.make_list,
+            dict: self.make_dict,
+            AnyType: self.make_any,
+            object: self.make_any,
+            }
+    
+    def size(self, value):
+        if isinstance(value, tuple):
+            return self.rng.randint(*value)
+        return value
+    
+    def kwargs(self, required=NotProvided, optional=NotProvided):
+        """ Return keyword arguments for an input processor: all 'required'
+            parameters and some 'optional' ones. """
+        result = {}
+        
+        if isinstance(required, Mapping):
+            result.update(self.value(required))
+        
+        if isinstance(optional, Mapping):
+            for ikey, ivalue in optional.items():
+                if self.rng.random() < self.sizes.optional_rate:
+                    result[ikey] = self.value(ivalue)
+        
+        return result
+    
+    def value(self, iospec):
+        """ Return a value which satisfies 'iospec'. """
+        if isinstance(iospec, ListOf):
+            length = self.size(self.sizes.list_length)
+            return [self.value(iospec.iospec_obj) for i in range(length)]
+        if isinstance(iospec, Mapping):
+            return {
+                ikey: self.value(ivalue) for ikey, ivalue in iospec.items()
+                }
+        if is_container(iospec, Sequence):
+            return [self.value(item) for item in iospec]
+        
+        try:
+            generator = self.generators[iospec]
+        except (KeyError, TypeError):
+            raise TypeError(
+                "Cannot generate a value for iospec: {!r}".format(iospec)
+                )
+        return generator()
+    
+    def make_bool(self):
+        return self.rng.random() < 0.5
+    
+    def make_int(self):
+        return self.rng.randint(-1000, 1000)
+    
+    def make_float(self):
+        return self.rng.uniform(-1000, 1000)
+    
+    def make_str(self):
+        length = self.size(self.sizes.string_length)
+        return ''.join(
+            self.rng.choice(string.ascii_letters) for i in range(length)
+            )
+    
+    def make_none(self):
+        return None
+    
+    def make_decimal(self):
+        result = decimal.Decimal(self.rng.randint(-100000, 100000)) / 100
+        if self.json_compatible:
+            return str(result)
+        return result
+    
+    def make_uuid(self):
+        result = uuid.UUID(int=self.rng.getrandbits(128), version=4)
+        if self.json_compatible:
+            return str(result)
+        return result
+    
+    def make_datetime(self):
+        result = datetime.datetime(2000, 1, 1) + datetime.timedelta(
+            seconds=self.rng.randint(0, 30 * 365 * 86400)
+            )
+        if self.json_compatible:
+            return result.isoformat()
+        return result
+    
+    def make_list(self, depth=None):
+        """ A list of 'make_any' values, nested 'depth' levels (by default
+            'any_depth', at least 1). """
+        if depth is None:
+            depth = max(self.size(self.sizes.any_depth), 1)
+        length = self.size(self.sizes.list_length)
+        return [self.make_any(depth - 1) for i in range(length)]
+    
+    def make_dict(self, depth=None):
+        """ Like 'make_list', with keys 'k0', 'k1', ... """
+        if depth is None:
+            depth = max(self.size(self.sizes.any_depth), 1)
+        length = self.size(self.sizes.list_length)
+        return {
+            'k{}'.format(i): self.make_any(depth - 1) for i in range(length)
+            }
+    
+    def make_any(self, depth=None):
+        """ A JSON value with 'any_depth' levels of containers. """
+        if depth is None:
+            depth = self.size(self.sizes.any_depth)
+        
+        if depth <= 0:
+            make_scalar = self.rng.choice([
+                self.make_bool,
+                self.make_int,
+                self.make_float,
+                self.make_str,
+                ])
+            return make_scalar()
+        
+        if self.rng.random() < 0.5:
+            return self.make_list(depth)
+        return self.make_dict(depth)
+
+def get_input_processor(obj):
+    """ Return the input processor of a view callable, an 'IOManager' or an
+        'IOProcessor'. """
+    obj = getattr(obj, 'manager', obj)
+    return getattr(obj, 'input_processor', obj)
+
+def generate_payload(
+    iospecs,
+    seed=0,
+    sizes=None,
+    json_compatible=True,
+    ):
+    """ Return valid input generated deterministically from 'seed'.
+        
+        'iospecs' is an 'APIViewCallable', an 'IOManager' or an 'IOProcessor',
+        for which keyword arguments are returned; or a single iospec (e.g.
+        'ListOf({"a": int})'), for which one value is returned. 'sizes' is a
+        'PayloadSizes'. """
+    generator = PayloadGenerator(
+        sizes,
+        random.Random(seed),
+        json_compatible,
+        )
+    
+    input_processor = get_input_processor(iospecs)
+    if hasattr(input_processor, 'required'):
+        return generator.kwargs(
+            input_processor.required,
+            input_processor.optional,
+            )
+    
+    return generator.value(iospecs)
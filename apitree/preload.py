@@ -0,0 +1,40 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import gc
+
+from .util import preload_view
+
+def get_views(registry):
+    """ Yield the view callables registered with Pyramid. """
+    for view_entry in registry.introspector.get_category('views'):
+        yield view_entry['introspectable']['callable']
+
+def preload(app, freeze=True):
+    """ Do the work which apitree defers to the first request, in the master
+        process of a pre-forking server (e.g. gunicorn's 'preload_app'):
+        import the view callables of snapshots ('apitree.snapshot'), which
+        sets up the 'IOManager' of each 'APIViewCallable', and load and
+        compile lazy subtrees into their routers. API trees are scanned and
+        documentation is rendered when they are added to the configurator.
+        
+        'app' is the WSGI application of 'Configurator.make_wsgi_app'.
+        
+        Then, with 'freeze', garbage is collected ('gc.collect') and all
+        remaining objects tracked by the garbage collector are moved to a
+        permanent generation ('gc.freeze'). Garbage collections in worker
+        processes do not touch them, so the memory pages holding apitree's
+        read-only structures stay shared copy-on-write between workers
+        instead of being copied into each. Collecting first keeps garbage out
+        of the permanent generation, where it would never be freed.
+        
+        Call 'preload' last, just before workers fork. As the 'gc' module
+        documentation recommends, also disable the garbage collector early
+        in the master process ('gc.disable()', before importing the
+        application), so that automatic collections do not leave freed holes
+        in the memory pages to be shared, and enable it again early in each
+        worker ('gc.enable()', e.g. in gunicorn's 'post_fork' hook). """
+    for view in get_views(app.registry):
+        preload_view(view)
+    
+    if freeze:
+        gc.collect()
+        gc.freeze()
@@ -0,0 +1,254 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import cProfile
+import io
+import os.path
+import pstats
+import sys
+import threading
+import time
+
+from pyramid.httpexceptions import HTTPBadRequest
+from pyramid.response import Response
+
+from .util import get_route_pattern
+from .view_callable import SimpleViewCallable
+
+PSTATS = 'pstats'
+COLLAPSED = 'collapsed'
+OUTPUT_FORMATS = [PSTATS, COLLAPSED]
+
+class StackCollector(object):
+    """ Records the time spent in each distinct call stack of the current
+        thread, using 'sys.setprofile'. 'collapsed' returns the result in the
+        collapsed-stack format used by flame graph tools. """
+    
+    def __init__(self):
+        self.stack = []
+        # Collapsed stack -> seconds spent in its innermost function.
+        self.times = {}
+    
+    def enable(self):
+        sys.setprofile(self.callback)
+    
+    def disable(self):
+        sys.setprofile(None)
+        self.stack = []
+    
+    @staticmethod
+    def get_label(frame, event, arg):
+        if event == 'c_call':
+            module = getattr(arg, '__module__', None) or 'builtins'
+            return '{}.{}'.format(module, getattr(arg, '__qualname__', arg))
+        
+        code = frame.f_code
+        return '{} ({}:{})'.format(
+            code.co_name,
+            os.path.basename(code.co_filename),
+            code.co_firstlineno,
+            )
+    
+    def callback(self, frame, event, arg):
+        now = time.perf_counter()
+        stack = self.stack
+        
+        if event in ('call', 'c_call'):
+            if stack:
+                path = stack[-1][0] + ';'
+            else:
+                path = ''
+            label = self.get_label(frame, event, arg).replace(';', ',')
+            stack.append([path + label, now, 0.0])
+            return
+        
+        # Returns from calls made before 'enable' are ignored.
+        if not stack:
+            return
+        
+        path, start, children = stack.pop()
+        elapsed = now - start
+        self.times[path] = self.times.get(path, 0.0) + elapsed - children
+        if stack:
+            stack[-1][2] += elapsed
+    
+    def collapsed(self):
+        """ One line per stack: frames separated by ';', then the time spent
+            in microseconds. """
+        return ''.join(
+            '{} {}\n'.format(path, int(seconds * 1000000))
+            for path, seconds in sorted(self.times.items())
+            )
+
+class ProfileRecording(object):
+    """ One profiled call. """
+    
+    def __init__(self, profiler, profile):
+        self.profiler = profiler
+        self.profile = profile
+        profile.enable()
+    
+    def phase(self, name, context):
+        return context
+    
+    def finish(self):
+        self.profile.disable()
+        self.profiler.finish(self)
+
+class RouteProfiler(object):
+    """ Profiles the next calls to one route, when armed. Use as the
+        'route_profiler' view option, e.g. for a whole API tree with
+        'set_view_options'.
+        
+        'arm' chooses the route pattern, the number of calls and the output:
+        'pstats' (aggregated 'cProfile' statistics) or 'collapsed' (stacks
+        for flame graphs). Calls are profiled one at a time. Do not combine
+        with the 'profile_rate' of a 'SlowRequestLog', since only one
+        profiler can be active in a thread. """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profiling = threading.Lock()
+        self.route = None
+        self.remaining = 0
+        self.output_format = PSTATS
+        self.profiles = []
+    
+    def arm(self, route, calls=1, output_format=PSTATS):
+        """ Profile the next 'calls' calls to 'route' (a route pattern),
+            discarding previous results. """
+        if calls < 1:
+            raise ValueError(
+                "The number of calls must be at least 1: {}".format(calls)
+                )
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(
+                "Unknown output format: '{}'".format(output_format)
+                )
+        
+        with self.lock:
+            self.route = route
+            self.remaining = calls
+            self.output_format = output_format
+            self.profiles = []
+    
+    def disarm(self):
+        with self.lock:
+            self.remaining = 0
+    
+    def start(self, request):
+        """ Return a 'ProfileRecording' if 'request' should be profiled, or
+            None. """
+        if not self.remaining:
+            return None
+        if get_route_pattern(request) != self.route:
+            return None
+        if not self.profiling.acquire(blocking=False):
+            return None
+        
+        with self.lock:
+            if not self.remaining:
+                self.profiling.release()
+                return None
+            
+            if self.output_format == COLLAPSED:
+                profile = StackCollector()
+            else:
+                profile = cProfile.Profile()
+            
+            try:
+                recording = ProfileRecording(self, profile)
+            except ValueError:
+                # Another profiler is active in this thread.
+                self.profiling.release()
+                return None
+            self.remaining -= 1
+        
+        return recording
+    
+    def finish(self, recording):
+        with self.lock:
+            self.profiles.append(recording.profile)
+        self.profiling.release()
+    
+    def get_status(self):
+        with self.lock:
+            return {
+                'route': self.route,
+                'remaining': self.remaining,
+                'profiled': len(self.profiles),
+                'format': self.output_format,
+                }
+    
+    def get_output(self, sort='cumulative'):
+        """ Return the profile of the calls profiled since 'arm' as text. """
+        with self.lock:
+            profiles = list(self.profiles)
+        
+        if not profiles:
+            return ''
+        
+        if isinstance(profiles[0], StackCollector):
+            times = {}
+            for item in profiles:
+                for path, seconds in item.times.items():
+                    times[path] = times.get(path, 0.0) + seconds
+            collector = StackCollector()
+            collector.times = times
+            return collector.collapsed()
+        
+        stream = io.StringIO()
+        stats = pstats.Stats(*profiles, stream=stream)
+        stats.sort_stats(sort).print_stats()
+        return stream.getvalue()
+    
+    def add_views(
+        self,
+        configurator,
+        path='/_apitree/profile',
+        **view_kwargs
+        ):
+        """ Add admin endpoints. POST (parameters 'route', 'calls' and
+            'format') arms the profiler and returns its status as JSON. GET
+            returns the output as text. Restrict access to them, e.g. with a
+            'permission' view argument. """
+        view_class = SimpleViewCallable
+        
+        arm_view_kwargs = {
+            'request_method': 'POST',
+            'renderer': 'json',
+            }
+        arm_view_kwargs.update(view_kwargs)
+        
+        output_view_kwargs = {
+            'request_method': 'GET',
+            }
+        output_view_kwargs.update(view_kwargs)
+        
+        @view_class(**arm_view_kwargs)
+        def arm_view(request):
+            params = request.params
+            try:
+                self.arm(
+                    route=params['route'],
+                    calls=int(params.get('calls', 1)),
+                    output_format=params.get('format', PSTATS),
+                    )
+            except (KeyError, ValueError) as exc:
+                raise HTTPBadRequest(str(exc))
+            return self.get_status()
+        
+        @view_class(**output_view_kwargs)
+        def output_view(request):
+            return Response(
+                body=self.get_output().encode('utf-8'),
+                content_type='text/plain',
+                charset='utf-8',
+                )
+        
+        configurator.add_route(name=path, pattern=path)
+        
+        for iview in [arm_view, output_view]:
+            configurator.add_view(
+                route_name=path,
+                view=iview,
+                **iview.view_kwargs
+                )
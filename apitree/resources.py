@@ -0,0 +1,244 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import os
+import queue
+import threading
+
+from .exc import (
+    ResourceError,
+    ResourceUnavailableError,
+    )
+
+# WSGI environ key holding the 'ResourceScope' of a request.
+RESOURCE_SCOPE_ENVIRON_KEY = 'apitree.resources'
+
+class Provider(object):
+    """ Provides values of one named resource. 'acquire' is called at most once
+        per request; 'release' is called with the value when the request
+        finishes. """
+    
+    def acquire(self):
+        raise NotImplementedError
+    
+    def release(self, value):
+        pass
+    
+    def close(self):
+        """ Close all values held by the provider, e.g. at shutdown. """
+
+class ProcessLocal(object):
+    """ Mixin for providers whose state must not be shared with forked worker
+        processes. 'check_process' discards inherited state (without closing
+        it, since the parent process still owns it). """
+    
+    def check_process(self):
+        pid = os.getpid()
+        if getattr(self, 'pid', pid) != pid:
+            self.reset()
+        self.pid = pid
+    
+    def reset(self):
+        raise NotImplementedError
+
+class SingletonProvider(Provider, ProcessLocal):
+    """ One value per process, created on first use. Suitable for thread-safe
+        objects such as HTTP client sessions and caches. """
+    
+    def __init__(self, factory, close=None):
+        self.factory = factory
+        self.close_value = close
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        self.value = None
+        self.created = False
+    
+    def acquire(self):
+        with self.lock:
+            self.check_process()
+            if not self.created:
+                self.value = self.factory()
+                self.created = True
+            return self.value
+    
+    def close(self):
+        with self.lock:
+            if self.created and self.close_value is not None:
+                self.close_value(self.value)
+            self.reset()
+
+class PoolProvider(Provider, ProcessLocal):
+    """ A per-process pool of at most 'max_size' values, such as database
+        connections. Each request checks out one value and returns it when the
+        request finishes. When the pool is exhausted, requests wait up to
+        'timeout' seconds (indefinitely if None) before
+        'ResourceUnavailableError' is raised. """
+    
+    def __init__(self, factory, max_size, close=None, timeout=None):
+        self.factory = factory
+        self.max_size = max_size
+        self.close_value = close
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        self.idle = queue.LifoQueue()
+        self.size = 0
+    
+    def acquire(self):
+        with self.lock:
+            self.check_process()
+            idle = self.idle
+            try:
+                return idle.get_nowait()
+            except queue.Empty:
+                pass
+            
+            if self.size < self.max_size:
+                self.size += 1
+                create = True
+            else:
+                create = False
+        
+        if create:
+            try:
+                return self.factory()
+            except BaseException:
+                with self.lock:
+                    self.size -= 1
+                raise
+        
+        try:
+            return idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise ResourceUnavailableError(
+                "No pooled value available within {} seconds."
+                .format(self.timeout)
+                )
+    
+    def release(self, value):
+        with self.lock:
+            self.check_process()
+            self.idle.put(value)
+    
+    def close(self):
+        with self.lock:
+            while True:
+                try:
+                    value = self.idle.get_nowait()
+                except queue.Empty:
+                    break
+                self.size -= 1
+                if self.close_value is not None:
+                    self.close_value(value)
+
+class RequestProvider(Provider):
+    """ A new value for every request, closed when the request finishes. """
+    
+    def __init__(self, factory, close=None):
+        self.factory = factory
+        self.close_value = close
+    
+    def acquire(self):
+        return self.factory()
+    
+    def release(self, value):
+        if self.close_value is not None:
+            self.close_value(value)
+
+class ResourceRegistry(object):
+    """ Named resources which view callables can request (see the 'resources'
+        view option of 'FunctionViewCallable'). """
+    
+    def __init__(self):
+        self.providers = {}
+    
+    def register(self, name, provider):
+        self.providers[name] = provider
+    
+    def add_singleton(self, name, factory, close=None):
+        self.register(name, SingletonProvider(factory, close))
+    
+    def add_pool(self, name, factory, max_size, close=None, timeout=None):
+        self.register(name, PoolProvider(factory, max_size, close, timeout))
+    
+    def add_per_request(self, name, factory, close=None):
+        self.register(name, RequestProvider(factory, close))
+    
+    def get_provider(self, name):
+        try:
+            return self.providers[name]
+        except KeyError:
+            raise ResourceError("Unknown resource: '{}'".format(name))
+    
+    def close(self):
+        for provider in self.providers.values():
+            provider.close()
+
+default_resource_registry = ResourceRegistry()
+
+class ResourceScope(object):
+    """ The resources acquired during one request. Each resource is acquired
+        at most once, and all are released by 'close'. """
+    
+    def __init__(self):
+        self.values = {}
+        self.acquired = []
+    
+    def get(self, registry, name):
+        key = (id(registry), name)
+        try:
+            return self.values[key]
+        except KeyError:
+            pass
+        
+        provider = registry.get_provider(name)
+        value = provider.acquire()
+        self.values[key] = value
+        self.acquired.append((provider, value))
+        return value
+    
+    def close(self):
+        acquired, self.acquired = self.acquired, []
+        self.values.clear()
+        for provider, value in reversed(acquired):
+            provider.release(value)
+    
+    def close_after(self, future):
+        """ Release the resources acquired so far when 'future' is done,
+            instead of at 'close'; e.g. when a call using them was abandoned
+            but is still running. """
+        detached = ResourceScope()
+        detached.acquired, self.acquired = self.acquired, []
+        self.values.clear()
+        future.add_done_callback(lambda future: detached.close())
+
+def get_request_scope(request):
+    """ Return '(scope, owned)' for 'request'. The scope is shared by everything
+        handling the request (catchall predicates, view callables). If 'owned'
+        is true, the request cannot release the scope itself, and the caller
+        must call 'scope.close()'. """
+    environ = getattr(request, 'environ', None)
+    if environ is None or not hasattr(request, 'add_finished_callback'):
+        return ResourceScope(), True
+    
+    scope = environ.get(RESOURCE_SCOPE_ENVIRON_KEY)
+    if scope is None:
+        scope = ResourceScope()
+        environ[RESOURCE_SCOPE_ENVIRON_KEY] = scope
+        request.add_finished_callback(lambda request: scope.close())
+    
+    return scope, False
+
+def get_resource(request, name, registry=default_resource_registry):
+    """ Return the value of resource 'name' for 'request', e.g. from a catchall
+        custom predicate. Requires a Pyramid request, so that the value can be
+        released when the request finishes. """
+    scope, owned = get_request_scope(request)
+    if owned:
+        raise ResourceError(
+            "Resources can only be shared by requests which support "
+            "'add_finished_callback'."
+            )
+    return scope.get(registry, name)
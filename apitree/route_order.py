@@ -0,0 +1,197 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import heapq
+import json
+import threading
+
+from .util import (
+    add_admin_view,
+    get_route_pattern,
+    )
+
+def load_route_hits(path):
+    """ Return the route hit counts saved by 'RouteHitCounter.save'. """
+    with open(path) as file:
+        return json.load(file)['routes']
+
+class RouteHitCounter(object):
+    """ Counts calls per route. Use as the 'route_hits' view option, and pass
+        the counts ('get_profile', or a file saved with 'save') to
+        'scan_api_tree' as 'route_hits' to register the most frequently hit
+        routes first.
+        
+        Counts of several processes can be combined with 'merge'. """
+    
+    def __init__(self, profile=None):
+        self.lock = threading.Lock()
+        self.counts = {}
+        if profile is not None:
+            self.merge(profile)
+    
+    def start(self, request):
+        route = get_route_pattern(request)
+        with self.lock:
+            self.counts[route] = self.counts.get(route, 0) + 1
+        # Nothing is recorded per phase.
+        return None
+    
+    def merge(self, profile):
+        """ Add the counts of 'profile', a dictionary of route hit counts. """
+        with self.lock:
+            for route, hits in profile.items():
+                self.counts[route] = self.counts.get(route, 0) + hits
+    
+    def get_profile(self):
+        """ Return a dictionary of hit counts by route pattern. """
+        with self.lock:
+            return {
+                route: hits for route, hits in self.counts.items()
+                if route is not None
+                }
+    
+    def clear(self):
+        with self.lock:
+            self.counts = {}
+    
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump({'routes': self.get_profile()}, file, sort_keys=True)
+    
+    def add_views(
+        self,
+        configurator,
+        path='/_apitree/route_hits',
+        **view_kwargs
+        ):
+        """ Add a JSON endpoint which returns the profile in the format of
+            'save', to export it from a running application. Restrict access
+            to it, e.g. with a 'permission' view argument. """
+        add_admin_view(
+            configurator,
+            path,
+            lambda: {'routes': self.get_profile()},
+            **view_kwargs
+            )
+
+def get_route_shape(route):
+    """ Return '(segments, remainder)': the segments of a route pattern, with
+        None for segments containing placeholders, and whether the pattern
+        ends with a '*remainder'. """
+    segments = route.strip('/').split('/') if route.strip('/') else []
+    
+    remainder = bool(segments) and segments[-1].startswith('*')
+    if remainder:
+        segments = segments[:-1]
+    
+    return (
+        tuple(None if '{' in item else item for item in segments),
+        remainder,
+        )
+
+def shapes_may_overlap(shape_a, shape_b):
+    """ Whether two route shapes may match the same path. Placeholders are
+        assumed to match any segment. """
+    (segments_a, remainder_a), (segments_b, remainder_b) = shape_a, shape_b
+    
+    if not remainder_a and not remainder_b:
+        if len(segments_a) != len(segments_b):
+            return False
+    elif not remainder_a:
+        if len(segments_a) < len(segments_b):
+            return False
+    elif not remainder_b:
+        if len(segments_b) < len(segments_a):
+            return False
+    
+    for item_a, item_b in zip(segments_a, segments_b):
+        if item_a is not None and item_b is not None and item_a != item_b:
+            return False
+    return True
+
+def iter_overlapping(root, shape):
+    """ Yield the indexes of the routes in the route trie 'root' (see
+        'order_routes') which may overlap a route of 'shape', i.e. those for
+        which 'shapes_may_overlap' is true. Only the
+        branches whose segments are compatible with the route are walked. """
+    segments, remainder = shape
+    stack = [(root, 0)]
+    while stack:
+        (children, ends, remainder_ends), depth = stack.pop()
+        
+        # A remainder matches any longer path with this prefix.
+        yield from remainder_ends
+        
+        if depth < len(segments):
+            segment = segments[depth]
+            if segment is None:
+                stack.extend((child, depth + 1) for child in children.values())
+            else:
+                for key in (segment, None):
+                    if key in children:
+                        stack.append((children[key], depth + 1))
+            continue
+        
+        yield from ends
+        if remainder:
+            # Every longer route starting with this prefix.
+            subtree = list(children.values())
+            while subtree:
+                children, ends, remainder_ends = subtree.pop()
+                yield from ends
+                yield from remainder_ends
+                subtree.extend(children.values())
+
+def order_routes(routes, route_hits):
+    """ Return 'routes' ordered by descending 'route_hits', except that routes
+        which may match the same path (e.g. '/items/new' and '/items/{id}')
+        keep their relative order, since Pyramid uses the first route which
+        matches. Routes with equal hits keep their order. """
+    routes = list(routes)
+    
+    # Index -> number of earlier overlapping routes not yet placed.
+    blockers = [0] * len(routes)
+    successors = [[] for item in routes]
+    
+    # The earlier routes, in a trie of their segments: each node is
+    # '(children, ends, remainder_ends)', where 'children' maps a segment (None
+    # for placeholders) to a node, and 'ends' and 'remainder_ends' are the
+    # indexes of the routes ending at the node, without and with a remainder.
+    # Each route is only compared with the routes whose static segments do
+    # not conflict with its own.
+    root = ({}, [], [])
+    for index, route in enumerate(routes):
+        shape = get_route_shape(route)
+        
+        for earlier_index in iter_overlapping(root, shape):
+            blockers[index] += 1
+            successors[earlier_index].append(index)
+        
+        segments, remainder = shape
+        node = root
+        for segment in segments:
+            node = node[0].setdefault(segment, ({}, [], []))
+        node[2 if remainder else 1].append(index)
+    
+    # A route is placed as early as the most frequently hit route which has
+    # to follow it.
+    priorities = [route_hits.get(item, 0) for item in routes]
+    for index in reversed(range(len(routes))):
+        for successor in successors[index]:
+            priorities[index] = max(priorities[index], priorities[successor])
+    
+    heap = [
+        (-priorities[index], index)
+        for index in range(len(routes))
+        if not blockers[index]
+        ]
+    heapq.heapify(heap)
+    
+    result = []
+    while heap:
+        priority, index = heapq.heappop(heap)
+        result.append(routes[index])
+        for successor in successors[index]:
+            blockers[successor] -= 1
+            if not blockers[successor]:
+                heapq.heappush(heap, (-priorities[successor], successor))
+    
+    return result
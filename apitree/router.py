@@ -0,0 +1,245 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import re
+
+from pyramid.httpexceptions import HTTPNotFound
+
+from .dispatch import MethodDispatcher
+from .exc import APITreeError
+from .tree_scan import (
+    is_mount,
+    iter_endpoints,
+    )
+from .util import ROUTE_PATTERN_ENVIRON_KEY
+
+# Placeholders of a route pattern: '{name}' or '{name:regex}', allowing one
+# level of braces in the regex (as 'pyramid.urldispatch' does).
+PLACEHOLDER_RE = re.compile(
+    r'\{([_a-zA-Z]\w*)(?::([^{}]*(?:\{[^{}]*\}[^{}]*)*))?\}'
+    )
+
+# Name of the remainder placeholder of the route which mounts a router.
+MOUNT_REMAINDER = 'apitree_path'
+
+def split_path(path):
+    path = path.lstrip('/')
+    if not path:
+        return []
+    return path.split('/')
+
+class PlaceholderEdge(object):
+    """ Matches one path segment containing placeholders. A segment which is
+        a single '{name}' matches any non-empty segment without a regex. """
+    
+    def __init__(self, segment):
+        self.segment = segment
+        self.node = RouterNode()
+        
+        match = PLACEHOLDER_RE.fullmatch(segment)
+        if match is not None and match.group(2) is None:
+            self.name = match.group(1)
+            self.regex = None
+            return
+        
+        self.name = None
+        parts = []
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(segment):
+            parts.append(re.escape(segment[position:match.start()]))
+            parts.append('(?P<{}>{})'.format(
+                match.group(1),
+                match.group(2) or '[^/]+',
+                ))
+            position = match.end()
+        parts.append(re.escape(segment[position:]))
+        self.regex = re.compile(''.join(parts))
+    
+    def match(self, segment):
+        """ Return the placeholder values, or None. """
+        if self.regex is None:
+            if segment:
+                return {self.name: segment}
+            return None
+        
+        match = self.regex.fullmatch(segment)
+        if match is None:
+            return None
+        return match.groupdict()
+
+class RouterNode(object):
+    def __init__(self):
+        self.static = {}
+        self.placeholders = []
+        # (name, node) for a trailing '*name' segment.
+        self.remainder = None
+        # 'MethodDispatcher' of the route ending at this node.
+        self.dispatcher = None
+    
+    def get_placeholder_edge(self, segment):
+        for edge in self.placeholders:
+            if edge.segment == segment:
+                return edge
+        edge = PlaceholderEdge(segment)
+        self.placeholders.append(edge)
+        return edge
+
+class RadixRouter(object):
+    """ A prefix tree of route patterns. Static path segments are matched by
+        dictionary lookup, so match time depends on the depth of the path
+        rather than on the number of routes.
+        
+        Placeholders must not match across '/'. A static segment takes
+        priority over placeholders, and placeholders over a trailing
+        '*remainder', regardless of the order in which routes are added.
+        Route patterns use Pyramid's syntax. """
+    
+    def __init__(self):
+        self.root = RouterNode()
+    
+    def add_route(self, pattern):
+        """ Return the node of 'pattern', creating it if needed. """
+        node = self.root
+        segments = split_path(pattern)
+        
+        for index, segment in enumerate(segments):
+            if segment.startswith('*'):
+                if index != len(segments) - 1:
+                    raise APITreeError(
+                        "'*' is only allowed in the last segment of a route "
+                        "pattern. Got: {}".format(pattern)
+                        )
+                if node.remainder is None:
+                    node.remainder = (segment[1:], RouterNode())
+                node = node.remainder[1]
+            elif PLACEHOLDER_RE.search(segment):
+                node = node.get_placeholder_edge(segment).node
+            else:
+                node = node.static.setdefault(segment, RouterNode())
+        
+        if node.dispatcher is None:
+            node.dispatcher = MethodDispatcher(pattern)
+        return node
+    
+    def add_views(self, pattern, view_dicts_list):
+        dispatcher = self.add_route(pattern).dispatcher
+        for view_dict in view_dicts_list:
+            dispatcher.add_view(view_dict)
+    
+    @classmethod
+    def from_api_tree(cls, api_tree, root_path=''):
+        router = cls()
+        for complete_route, view_dict in iter_endpoints(api_tree, root_path):
+            view = view_dict['view']
+            
+            # E.g. 'apitree.lazy.LazySubtree', which dispatches itself.
+            if is_mount(view):
+                for pattern in view.get_mount_patterns(complete_route):
+                    router.add_views(pattern, [{'view': view}])
+                continue
+            
+            router.add_views(complete_route, [view_dict])
+        return router
+    
+    def preload(self):
+        """ Preload the views of every route. """
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.dispatcher is not None:
+                node.dispatcher.preload()
+            stack.extend(node.static.values())
+            stack.extend(edge.node for edge in node.placeholders)
+            if node.remainder is not None:
+                stack.append(node.remainder[1])
+    
+    def match(self, path):
+        """ Return '(node, matchdict)' for 'path', or None. """
+        segments = split_path(path)
+        length = len(segments)
+        
+        # Depth-first search with an explicit stack, so that a dead end in a
+        # static branch falls back to placeholders.
+        stack = [(self.root, 0, {})]
+        while stack:
+            node, index, matchdict = stack.pop()
+            
+            if index == length:
+                if node.dispatcher is not None:
+                    return node, matchdict
+                if node.remainder is not None:
+                    name, child = node.remainder
+                    if child.dispatcher is not None:
+                        return child, dict(matchdict, **{name: ()})
+                continue
+            
+            # Pushed in reverse order of priority.
+            if node.remainder is not None:
+                name, child = node.remainder
+                remainder = {name: tuple(segments[index:])}
+                stack.append((child, length, dict(matchdict, **remainder)))
+            
+            segment = segments[index]
+            for edge in reversed(node.placeholders):
+                values = edge.match(segment)
+                if values is not None:
+                    values.update(matchdict)
+                    stack.append((edge.node, index + 1, values))
+            
+            child = node.static.get(segment)
+            if child is not None:
+                stack.append((child, index + 1, matchdict))
+        
+        return None
+
+def dispatch(router, request, path, prefix='', matchdict=None):
+    """ Call the view of 'router' which matches 'path' and 'request'.
+        
+        'prefix' is the pattern of a route under which 'router' is mounted,
+        and 'matchdict' holds the values of its placeholders. """
+    result = router.match(path)
+    if result is None:
+        raise HTTPNotFound()
+    
+    node, values = result
+    if matchdict:
+        values = dict(matchdict, **values)
+    request.matchdict = values
+    request.environ[ROUTE_PATTERN_ENVIRON_KEY] = prefix + node.dispatcher.route
+    
+    return node.dispatcher(request)
+
+class RouterView(object):
+    """ A Pyramid view callable which dispatches to the views of a
+        'RadixRouter'. The matched pattern is available to instrumentation
+        through 'apitree.util.get_route_pattern'. """
+    
+    def __init__(self, router):
+        self.router = router
+    
+    def __call__(self, request):
+        return dispatch(self.router, request, request.path_info or '/')
+    
+    def preload(self):
+        self.router.preload()
+
+def mount_api_tree(
+    configurator,
+    api_tree,
+    root_path='',
+    route_name='apitree',
+    router_class=RadixRouter,
+    ):
+    """ An alternative to 'scan_api_tree' for large API trees: registers a
+        single Pyramid route matching 'root_path' and everything below it, and
+        one view which dispatches with a 'RadixRouter'. Returns the router.
+        
+        View callables may only use the view arguments in
+        'apitree.dispatch.SUPPORTED_VIEW_KWARGS'. """
+    router = router_class.from_api_tree(api_tree, root_path)
+    
+    configurator.add_route(
+        name=route_name,
+        pattern=root_path + '*' + MOUNT_REMAINDER,
+        )
+    configurator.add_view(route_name=route_name, view=RouterView(router))
+    
+    return router
@@ -0,0 +1,180 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import cProfile
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from contextlib import (
+    contextmanager,
+    nullcontext,
+    )
+
+from .util import (
+    add_admin_view,
+    get_route_pattern,
+    )
+
+logger = logging.getLogger(__name__)
+
+class PhaseTimer(object):
+    """ Wall time (seconds) spent in each phase of one request (see
+        'BaseViewCallable.phase'). Nested phases are included in the time of
+        the enclosing phase. """
+    
+    def __init__(self):
+        self.phases = {}
+    
+    @contextmanager
+    def phase(self, name, context=nullcontext()):
+        """ Time phase 'name', running it inside 'context' (e.g. a tracing
+            span). """
+        start = time.perf_counter()
+        try:
+            with context:
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+class SlowRequestRecording(PhaseTimer):
+    """ Timing of one request handled by a view callable with a
+        'slow_request_log'. """
+    
+    def __init__(self, log, request, threshold, profile=False):
+        super().__init__()
+        self.log = log
+        self.request = request
+        self.threshold = threshold
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.profile = None
+        
+        if profile:
+            profile_obj = cProfile.Profile()
+            try:
+                profile_obj.enable()
+            except ValueError:
+                # Another profiler is active in this thread.
+                pass
+            else:
+                self.profile = profile_obj
+    
+    def stop(self):
+        self.duration = time.perf_counter() - self.start
+        if self.profile is not None:
+            self.profile.disable()
+    
+    def is_slow(self):
+        return self.duration >= self.threshold
+    
+    def finish(self):
+        self.log.finish(self)
+
+class SlowRequestLog(object):
+    """ Records requests slower than a threshold in a ring buffer of the
+        'max_entries' most recent ones.
+        
+        Use as the 'slow_request_log' view option. The 'slow_request_threshold'
+        view option overrides 'threshold' (seconds) for some view callables.
+        A 'profile_rate' fraction of requests run under 'cProfile'; the stats
+        (the 'profile_limit' functions with the highest cumulative time) are
+        kept for those which turn out to be slow. """
+    
+    def __init__(
+        self,
+        threshold,
+        max_entries=100,
+        profile_rate=0.0,
+        profile_limit=25,
+        ):
+        self.threshold = threshold
+        self.profile_rate = profile_rate
+        self.profile_limit = profile_limit
+        self.entries = deque(maxlen=max_entries)
+        self.lock = threading.Lock()
+    
+    def start(self, request, threshold=None):
+        if threshold is None:
+            threshold = self.threshold
+        profile = (
+            self.profile_rate > 0 and
+            random.random() < self.profile_rate
+            )
+        return SlowRequestRecording(self, request, threshold, profile)
+    
+    def finish(self, recording):
+        recording.stop()
+        if not recording.is_slow():
+            return
+        
+        entry = self.create_entry(recording)
+        with self.lock:
+            self.entries.append(entry)
+        
+        logger.warning(
+            "Slow request: %s %s took %.3f seconds.",
+            entry['method'],
+            entry['route'],
+            entry['duration'],
+            )
+    
+    def create_entry(self, recording):
+        request = recording.request
+        return {
+            'time': recording.start_time,
+            'route': get_route_pattern(request),
+            'method': getattr(request, 'method', None),
+            'path': getattr(request, 'path', None),
+            'payload_bytes': self.get_payload_size(request),
+            'duration': recording.duration,
+            'threshold': recording.threshold,
+            'phases': dict(recording.phases),
+            'profile': self.format_profile(recording.profile),
+            }
+    
+    @staticmethod
+    def get_payload_size(request):
+        """ Size of the request body from 'Content-Length', so that the body
+            does not need to be read. """
+        headers = getattr(request, 'headers', {})
+        try:
+            return int(headers['content-length'])
+        except (KeyError, ValueError):
+            return None
+    
+    def format_profile(self, profile):
+        if profile is None:
+            return None
+        
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats('cumulative').print_stats(self.profile_limit)
+        return stream.getvalue()
+    
+    def get_entries(self):
+        """ Return recorded requests, oldest first. """
+        with self.lock:
+            return list(self.entries)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+    
+    def add_views(
+        self,
+        configurator,
+        path='/_apitree/slow_requests',
+        **view_kwargs
+        ):
+        """ Add a JSON endpoint which returns the recorded requests. Restrict
+            access to it, e.g. with a 'permission' view argument. """
+        add_admin_view(
+            configurator,
+            path,
+            lambda: {'slow_requests': self.get_entries()},
+            **view_kwargs
+            )
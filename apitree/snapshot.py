@@ -0,0 +1,294 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+import threading
+from collections.abc import (
+    Mapping,
+    Sequence,
+    )
+
+from pyramid.path import DottedNameResolver
+
+from .exc import APITreeError
+from .lazy import LazySubtree
+from .tree_scan import (
+    Endpoint,
+    add_endpoints,
+    is_mount,
+    iter_endpoints,
+    )
+from .util import (
+    is_container,
+    preload_view,
+    )
+
+logger = logging.getLogger(__name__)
+
+# Incremented when the snapshot format changes; snapshots of other versions
+# are ignored.
+SNAPSHOT_VERSION = 1
+
+class LazyView(object):
+    """ A view callable which imports the view callable at 'import_path' (a
+        dotted name) on its first call. 'view_kwargs' are the view arguments
+        saved with it. The view callable must take only the request, as
+        apitree view callables do. """
+    
+    def __init__(self, import_path, view_kwargs=None):
+        self.import_path = import_path
+        self.view_kwargs = view_kwargs or {}
+        self.lock = threading.Lock()
+        self.view = None
+    
+    def resolve(self):
+        view = self.view
+        if view is not None:
+            return view
+        
+        with self.lock:
+            if self.view is None:
+                self.view = DottedNameResolver().resolve(self.import_path)
+            return self.view
+    
+    def preload(self):
+        preload_view(self.resolve())
+    
+    def __call__(self, request):
+        return self.resolve()(request)
+
+def get_import_path(view):
+    """ Return a dotted name which imports 'view', from the module and name
+        of the callable it wraps. Raises 'APITreeError' if there is none. """
+    obj = getattr(view, 'wrapped', view)
+    module = getattr(obj, '__module__', None)
+    name = getattr(obj, '__qualname__', None)
+    
+    if module is not None and name is not None:
+        import_path = module + ':' + name
+        try:
+            if DottedNameResolver().resolve(import_path) is view:
+                return import_path
+        except (ImportError, AttributeError, ValueError):
+            pass
+    
+    raise APITreeError(
+        "View callable {!r} cannot be imported by name, so it cannot be "
+        "saved in a snapshot. Define it at module level.".format(view)
+        )
+
+def get_module_digest(module_names):
+    """ Return a hash of the sources of 'module_names', or None if a source
+        file is missing. Modules are found without being imported (except for
+        their parent packages). """
+    digest = hashlib.sha256()
+    
+    for name in sorted(module_names):
+        try:
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            return None
+        if spec is None or not spec.has_location:
+            return None
+        
+        try:
+            with open(spec.origin, 'rb') as file:
+                source = file.read()
+        except OSError:
+            return None
+        
+        digest.update(name.encode('utf-8') + b'\0')
+        digest.update(hashlib.sha256(source).digest())
+    
+    return digest.hexdigest()
+
+def get_module_name(import_path):
+    return import_path.split(':', 1)[0]
+
+def get_containers(api_tree):
+    """ Return the non-empty dictionaries and sequences of 'api_tree' (the
+        tree itself, its subtrees, pairs and sequences of view callables),
+        by id(). """
+    result = {}
+    stack = [api_tree]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in result:
+            continue
+        result[id(obj)] = obj
+        
+        if isinstance(obj, Mapping):
+            items = obj.values()
+        else:
+            items = obj
+        stack.extend(
+            item for item in items
+            if (isinstance(item, Mapping) or is_container(item, Sequence))
+            and item
+            )
+    return result
+
+def get_holding_module_names(objects):
+    """ Return the names of the source modules which have one of 'objects'
+        (by id(), as returned by 'get_containers') as a global, e.g. a subtree
+        defined in one module and imported into another. """
+    result = set()
+    for name, module in list(sys.modules.items()):
+        spec = getattr(module, '__spec__', None)
+        if name == '__main__' or spec is None or not spec.has_location:
+            continue
+        
+        for value in list(vars(module).values()):
+            if id(value) in objects and objects[id(value)] is value:
+                result.add(name)
+                break
+    return result
+
+def make_entry(complete_route, endpoint):
+    view = endpoint.view
+    
+    if is_mount(view):
+        if not isinstance(view, LazySubtree) or not isinstance(
+            view.loader,
+            str,
+            ):
+            raise APITreeError(
+                "Only lazy subtrees with a dotted name loader can be saved in "
+                "a snapshot. Route: {}".format(complete_route)
+                )
+        return {'route': complete_route, 'lazy_subtree': view.loader}
+    
+    view_kwargs = dict(endpoint.view_kwargs)
+    view_kwargs.pop('request_method', None)
+    request_method = endpoint.get('request_method')
+    if request_method is not None:
+        request_method = list(request_method)
+    
+    return {
+        'route': complete_route,
+        'view': get_import_path(view),
+        'request_method': request_method,
+        'view_kwargs': view_kwargs,
+        }
+
+def save_snapshot(path, api_tree_name, root_path=''):
+    """ Save the endpoints of the API tree at 'api_tree_name' (a dotted name,
+        e.g. 'myapp.api:api_tree') to the file 'path', with a hash of the
+        sources of its module, of the modules of its view callables, and of
+        the modules which hold its subtrees (and the other containers of the
+        API tree) as globals.
+        
+        Views are saved by import path and view arguments, which must be
+        JSON-serializable (e.g. not 'custom_predicates'). """
+    api_tree = DottedNameResolver().resolve(api_tree_name)
+    
+    entries = [
+        make_entry(complete_route, endpoint)
+        for complete_route, endpoint in iter_endpoints(api_tree, root_path)
+        ]
+    
+    module_names = {get_module_name(api_tree_name)}
+    module_names.update(get_holding_module_names(get_containers(api_tree)))
+    for entry in entries:
+        module_names.add(get_module_name(
+            entry.get('view') or entry['lazy_subtree']
+            ))
+    
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'api_tree': api_tree_name,
+        'root_path': root_path,
+        'modules': sorted(module_names),
+        'digest': get_module_digest(module_names),
+        'endpoints': entries,
+        }
+    
+    try:
+        content = json.dumps(snapshot, sort_keys=True)
+    except TypeError as exc:
+        raise APITreeError(
+            "View arguments of '{}' cannot be saved in a snapshot: {}"
+            .format(api_tree_name, exc)
+            )
+    
+    # Written to a temporary file first, so that a worker never reads a
+    # partial snapshot.
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'w') as file:
+        file.write(content)
+    os.replace(temporary_path, path)
+
+def load_snapshot(path, api_tree_name, root_path=''):
+    """ Return the '(complete_route, endpoint)' pairs saved by
+        'save_snapshot', with 'LazyView' view callables; or None if there is
+        no snapshot for 'api_tree_name' and 'root_path', or if it is stale
+        (the source of one of its modules changed). """
+    try:
+        with open(path) as file:
+            snapshot = json.load(file)
+    except (OSError, ValueError):
+        return None
+    
+    if (
+        snapshot.get('version') != SNAPSHOT_VERSION or
+        snapshot.get('api_tree') != api_tree_name or
+        snapshot.get('root_path') != root_path
+        ):
+        return None
+    
+    digest = get_module_digest(snapshot['modules'])
+    if digest is None or digest != snapshot['digest']:
+        return None
+    
+    result = []
+    for entry in snapshot['endpoints']:
+        if 'lazy_subtree' in entry:
+            view = LazySubtree(entry['lazy_subtree'])
+            result.append((entry['route'], Endpoint(view)))
+            continue
+        
+        view_kwargs = {
+            ikey: tuple(ivalue) if isinstance(ivalue, list) else ivalue
+            for ikey, ivalue in entry['view_kwargs'].items()
+            }
+        request_method = entry['request_method']
+        if request_method is not None:
+            request_method = tuple(request_method)
+        
+        view = LazyView(entry['view'], view_kwargs)
+        result.append((entry['route'], Endpoint(view, request_method)))
+    
+    return result
+
+def scan_snapshot(
+    configurator,
+    path,
+    api_tree_name,
+    root_path='',
+    dispatch=False,
+    ):
+    """ Like 'scan_api_tree' for the API tree at 'api_tree_name', but from
+        the snapshot at 'path' if it is current, in which case neither the
+        API tree nor its view callables are imported until they are called.
+        Otherwise the API tree is scanned, and the snapshot is saved; if it
+        cannot be saved (e.g. an unwritable path, or view arguments which are
+        not JSON-serializable), the failure is logged and the scan is used
+        without a snapshot.
+        
+        Returns True if the snapshot was used. """
+    endpoint_pairs = load_snapshot(path, api_tree_name, root_path)
+    if endpoint_pairs is not None:
+        add_endpoints(configurator, endpoint_pairs, dispatch)
+        return True
+    
+    try:
+        save_snapshot(path, api_tree_name, root_path)
+    except (OSError, APITreeError):
+        logger.exception("Could not save API tree snapshot to %s", path)
+    
+    api_tree = DottedNameResolver().resolve(api_tree_name)
+    add_endpoints(configurator, iter_endpoints(api_tree, root_path), dispatch)
+    return False
@@ -0,0 +1,173 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import contextlib
+import json
+import time
+import tracemalloc
+
+# Kinds of startup work measured by 'StartupProfiler'.
+SUBTREE = 'subtree'
+DECORATE = 'decorate'
+INTROSPECT = 'introspect'
+ADD_ROUTE = 'add_route'
+ADD_VIEW = 'add_view'
+MOUNT = 'mount'
+
+# The 'StartupProfiler' in use, if any.
+active_profiler = None
+
+NO_MEASUREMENT = contextlib.nullcontext()
+
+def get_callable_name(obj):
+    return '{}:{}'.format(
+        getattr(obj, '__module__', None),
+        getattr(obj, '__qualname__', repr(obj)),
+        )
+
+def get_route_prefixes(route):
+    """ '/a/{id}/b' -> ['/a', '/a/{id}', '/a/{id}/b']. """
+    segments = route.strip('/').split('/')
+    return [
+        '/' + '/'.join(segments[:index + 1])
+        for index in range(len(segments))
+        ]
+
+def measure(kind, name, route=None):
+    """ Return a context manager which measures the startup work 'name' of
+        'kind' if a 'StartupProfiler' is in use. The work is also charged to
+        each subtree which contains 'route'.
+        
+        'name' may be a function which returns the name, so that it is only
+        built while a profiler is in use. """
+    profiler = active_profiler
+    if profiler is None:
+        return NO_MEASUREMENT
+    if callable(name):
+        name = name()
+    return profiler.measure(kind, name, route)
+
+def use_profiler(profiler):
+    """ Return 'profiler' as a context manager which puts it in use, or a
+        context manager which does nothing if it is None. """
+    if profiler is None:
+        return NO_MEASUREMENT
+    return profiler
+
+class StartupProfiler(object):
+    """ Measures the time and memory spent at startup per subtree of an API
+        tree, per view callable decoration (with the introspection of
+        'APIViewCallable.setup'), and per 'Configurator.add_route' and
+        'Configurator.add_view' call of 'scan_api_tree' and 'add_catchall'.
+        Use it around the imports of the view callables as well:
+            
+            profiler = StartupProfiler()
+            with profiler:
+                from myapp.api import api_tree
+                scan_api_tree(configurator, api_tree)
+            print(profiler.format_table())
+        
+        or pass it to 'scan_api_tree' and 'add_catchall' as
+        'startup_profiler'.
+        
+        Memory is the net size of allocations which are still alive after
+        each step, traced with 'tracemalloc' (which slows startup down) unless
+        'trace_memory' is false. Subtree entries are cumulative, so nested
+        subtrees are counted in their parents. Pyramid defers most of the
+        registration of a view to 'Configurator.commit'; with
+        'Configurator(autocommit=True)' it is included in 'add_view'. """
+    
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        # (kind, name) -> [calls, seconds, bytes].
+        self.totals = {}
+        self.previous_profilers = []
+        self.started_tracing = []
+    
+    def __enter__(self):
+        global active_profiler
+        self.previous_profilers.append(active_profiler)
+        active_profiler = self
+        
+        started = self.trace_memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        self.started_tracing.append(started)
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        global active_profiler
+        active_profiler = self.previous_profilers.pop()
+        if self.started_tracing.pop():
+            tracemalloc.stop()
+    
+    def get_memory(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[0]
+        return 0
+    
+    @contextlib.contextmanager
+    def measure(self, kind, name, route=None):
+        memory = self.get_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            size = self.get_memory() - memory
+            
+            keys = [(kind, name)]
+            if route is not None:
+                keys.extend(
+                    (SUBTREE, prefix) for prefix in get_route_prefixes(route)
+                    )
+            for key in keys:
+                total = self.totals.setdefault(key, [0, 0.0, 0])
+                total[0] += 1
+                total[1] += seconds
+                total[2] += size
+    
+    def clear(self):
+        self.totals = {}
+    
+    def get_report(self, kind=None):
+        """ Return the measurements (of 'kind', or all), slowest first. """
+        report = [
+            {
+                'kind': ikind,
+                'name': iname,
+                'calls': calls,
+                'seconds': seconds,
+                'bytes': size,
+                }
+            for (ikind, iname), (calls, seconds, size) in self.totals.items()
+            if kind is None or ikind == kind
+            ]
+        report.sort(key=lambda entry: (-entry['seconds'], entry['name']))
+        return report
+    
+    def format_table(self, kind=None, limit=None):
+        """ Return 'get_report' as a text table of at most 'limit' rows. """
+        rows = [('kind', 'name', 'calls', 'ms', 'KiB')]
+        for entry in self.get_report(kind)[:limit]:
+            rows.append((
+                entry['kind'],
+                entry['name'],
+                str(entry['calls']),
+                '{:.3f}'.format(entry['seconds'] * 1000),
+                '{:.1f}'.format(entry['bytes'] / 1024),
+                ))
+        
+        widths = [max(len(cell) for cell in column) for column in zip(*rows)]
+        lines = []
+        for row in rows:
+            # Kind and name left-aligned, numbers right-aligned.
+            cells = [
+                cell.ljust(width) if index < 2 else cell.rjust(width)
+                for index, (cell, width) in enumerate(zip(row, widths))
+                ]
+            lines.append('  '.join(cells) + '\n')
+        return ''.join(lines)
+    
+    def save(self, path):
+        """ Save 'get_report' as JSON. """
+        with open(path, 'w') as file:
+            json.dump({'startup': self.get_report()}, file, indent=2)
@@ -0,0 +1,191 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import trace as opentelemetry_trace
+except ImportError:
+    opentelemetry_trace = None
+
+from pyramid.path import DottedNameResolver
+
+from .exc import MissingDependencyError
+
+# WSGI environ key holding the open routing span (see 'tracing_tween_factory').
+ROUTING_SPAN_ENVIRON_KEY = 'apitree.routing_span'
+
+# Pyramid setting naming the tracer used by 'tracing_tween_factory': a tracer
+# object or a dotted name.
+TRACER_SETTING = 'apitree.tracer'
+
+class Tracer(object):
+    """ Instrumentation interface used by view callables (see
+        'BaseViewCallable.tracer').
+        
+        'start_span' returns a context manager which times one phase of request
+        handling. Span names are 'apitree.<phase>'; attributes include the
+        matched route pattern ('apitree.route') and the request method. """
+    
+    def start_span(self, name, attributes):
+        raise NotImplementedError
+
+class Span(object):
+    __slots__ = (
+        'name',
+        'attributes',
+        'trace_id',
+        'span_id',
+        'parent_id',
+        'start',
+        'end',
+        )
+    
+    def __init__(self, name, attributes, trace_id, parent_id):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = trace_id
+        self.span_id = '{:016x}'.format(random.getrandbits(64))
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end = None
+    
+    @property
+    def duration(self):
+        if self.end is None:
+            return None
+        return self.end - self.start
+    
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'attributes': self.attributes,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'end': self.end,
+            'duration': self.duration,
+            }
+
+class RecordingTracer(Tracer):
+    """ An in-process tracer for local testing. Finished spans are passed to
+        'exporter'. Spans started while another span is open in the same
+        thread are its children. """
+    
+    def __init__(self, exporter):
+        self.exporter = exporter
+        self.local = threading.local()
+    
+    def get_stack(self):
+        try:
+            return self.local.stack
+        except AttributeError:
+            self.local.stack = []
+            return self.local.stack
+    
+    @contextmanager
+    def start_span(self, name, attributes):
+        stack = self.get_stack()
+        if stack:
+            parent = stack[-1]
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id = '{:032x}'.format(random.getrandbits(128))
+            parent_id = None
+        
+        span = Span(name, dict(attributes), trace_id, parent_id)
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            span.end = time.time()
+            stack.remove(span)
+            self.exporter.export(span)
+
+class InMemoryExporter(object):
+    """ Keeps finished spans in 'spans'. """
+    
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+    
+    def export(self, span):
+        with self.lock:
+            self.spans.append(span)
+    
+    def clear(self):
+        with self.lock:
+            self.spans = []
+
+class FileExporter(object):
+    """ Appends finished spans to a file, one JSON object per line. """
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+    
+    def export(self, span):
+        line = json.dumps(span.as_dict(), default=str) + '\n'
+        with self.lock:
+            with open(self.path, 'a') as file_obj:
+                file_obj.write(line)
+
+class OpenTelemetryTracer(Tracer):
+    """ Emits spans through OpenTelemetry. Requires the 'opentelemetry-api'
+        package. """
+    
+    def __init__(self, tracer=None):
+        if opentelemetry_trace is None:
+            raise MissingDependencyError(
+                "The 'opentelemetry-api' package is required to use "
+                "'OpenTelemetryTracer'."
+                )
+        if tracer is None:
+            tracer = opentelemetry_trace.get_tracer('apitree')
+        self.tracer = tracer
+    
+    def start_span(self, name, attributes):
+        attributes = {
+            ikey: ivalue for ikey, ivalue in attributes.items()
+            if ivalue is not None
+            }
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+def end_routing_span(request):
+    """ End the routing span started by 'tracing_tween_factory', if any. """
+    environ = getattr(request, 'environ', None)
+    if not environ:
+        return
+    
+    span_manager = environ.pop(ROUTING_SPAN_ENVIRON_KEY, None)
+    if span_manager is not None:
+        span_manager.__exit__(None, None, None)
+
+def tracing_tween_factory(handler, registry):
+    """ A Pyramid tween which starts an 'apitree.routing' span for each
+        request. apitree view callables end it when they are called, so the
+        span covers route matching and view lookup.
+        
+        Use with 'Configurator.add_tween' and the 'apitree.tracer' setting. """
+    tracer = registry.settings.get(TRACER_SETTING)
+    if isinstance(tracer, str):
+        tracer = DottedNameResolver().maybe_resolve(tracer)
+    if tracer is None:
+        return handler
+    
+    def tracing_tween(request):
+        span_manager = tracer.start_span(
+            'apitree.routing',
+            {'http.method': request.method, 'http.target': request.path},
+            )
+        span_manager.__enter__()
+        request.environ[ROUTING_SPAN_ENVIRON_KEY] = span_manager
+        try:
+            return handler(request)
+        finally:
+            end_routing_span(request)
+    
+    return tracing_tween
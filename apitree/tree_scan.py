@@ -1,14 +1,34 @@
 """ Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
 
+import itertools
 from collections.abc import (
     Sequence,
     Mapping,
     )
+from types import MappingProxyType
 from .exc import (
     APITreeError,
     APITreeStructureError,
     )
-from .util import is_container
+from .dispatch import (
+    MethodDispatcher,
+    make_catchall_predicate,
+    get_dispatchers,
+    )
+from .route_order import order_routes
+from .startup import (
+    ADD_ROUTE,
+    ADD_VIEW,
+    MOUNT,
+    get_callable_name,
+    measure,
+    use_profiler,
+    )
+from .util import (
+    is_container,
+    make_uppercase_tuple,
+    )
+from .view_callable import BaseViewCallable
 
 class RequestMethod(object):
     """ Represents a request method predicate in an API tree. """
@@ -28,67 +48,232 @@ GET, POST, PUT, DELETE, HEAD = tuple(
     map(RequestMethod, ALL_REQUEST_METHOD_STRINGS)
     )
 
-def conglomerate_endpoints(endpoints_dicts_list):
-    result = {}
-    for endpoints_dict in endpoints_dicts_list:
-        for ikey, ivalue in endpoints_dict.items():
-            views_list = result.setdefault(ikey, list())
-            views_list.extend(ivalue)
-    return result
+def get_pairs(api_tree):
+    """ 'api_tree' must be either a dictionary or a list of 2-length tuples. """
+    try:
+        return api_tree.items()
+    except AttributeError:
+        pass
+    
+    try:
+        return [(a, b) for a, b in api_tree]
+    except (TypeError, ValueError):
+        raise APITreeStructureError(
+            "'api_tree' value was not traversable. 'api_tree' must be either a "
+            "dictionary or a sequence of 2-length tuples. Got: {}"
+            .format(api_tree)
+            )
+
+def iter_branches(api_tree, root_path):
+    """ Return an iterator of '(branch_location, branch_obj, root_path)' for
+        the pairs of 'api_tree'. Raises 'APITreeStructureError' immediately
+        if 'api_tree' is not traversable. """
+    return (
+        (branch_location, branch_obj, root_path)
+        for branch_location, branch_obj in get_pairs(api_tree)
+        )
 
-def parse_branch(branch_location, branch_obj, root_path):
-    """ Return value has the same format as 'get_endpoints'. """
+# Shared by endpoints whose view callable has no 'view_kwargs'.
+NO_VIEW_KWARGS = MappingProxyType({})
+
+# Request method tuple -> the same tuple, so that equal request methods of
+# different endpoints share one tuple.
+request_method_tuples = {}
+
+def intern_request_method(request_method):
+    return request_method_tuples.setdefault(request_method, request_method)
+
+class Endpoint(Mapping):
+    """ A view callable of an API tree, as yielded by 'iter_endpoints'. This
+        is a read-only mapping with the same items as a view dictionary
+        ('view', the view callable's 'view_kwargs', and 'request_method' from
+        the API tree), e.g. for 'configurator.add_view(**endpoint)'; 'as_dict'
+        returns a copy as a 'dict'.
+        
+        'view_kwargs' is shared with the view callable rather than copied. """
     
-    # ---------------------- Parse 'branch_location'. ----------------------
+    __slots__ = ('view', 'request_method', 'view_kwargs')
     
-    if is_container(branch_location, Sequence):
-        if all(
-            [isinstance(item, RequestMethod) for item in branch_location]
-            ):
-            # 'branch_location' is a sequence of request methods. Sum to a
-            # single request method.
-            branch_location = sum(branch_location, RequestMethod())
-            
+    def __init__(self, view, request_method=None):
+        object.__setattr__(self, 'view', view)
+        if request_method is not None:
+            request_method = intern_request_method(request_method)
+        object.__setattr__(self, 'request_method', request_method)
+        object.__setattr__(
+            self,
+            'view_kwargs',
+            getattr(view, 'view_kwargs', None) or NO_VIEW_KWARGS,
+            )
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("'Endpoint' objects are immutable.")
+    
+    def __getitem__(self, key):
+        if key == 'view':
+            return self.view
+        # Request method from API tree overrides request method provided by
+        # view callable 'view_kwargs'.
+        if key == 'request_method' and self.request_method is not None:
+            return self.request_method
+        return self.view_kwargs[key]
+    
+    def __iter__(self):
+        for ikey in self.view_kwargs:
+            if ikey == 'request_method' and self.request_method is not None:
+                continue
+            yield ikey
+        yield 'view'
+        if self.request_method is not None:
+            yield 'request_method'
+    
+    def __len__(self):
+        result = len(self.view_kwargs) + 1
+        if self.request_method is not None:
+            result += 'request_method' not in self.view_kwargs
+        return result
+    
+    def __repr__(self):
+        return 'Endpoint({!r})'.format(self.as_dict())
+    
+    def as_dict(self):
+        return dict(self.items())
+
+def count_locations(branch_location):
+    """ The number of routes 'branch_location' stands for: a sequence which
+        is not made of request methods stands for each of its items. """
+    if is_container(branch_location, Sequence) and not all(
+        [isinstance(item, RequestMethod) for item in branch_location]
+        ):
+        return sum(count_locations(item) for item in branch_location)
+    return 1
+
+def find_shared_subtrees(api_tree):
+    """ Return a dictionary of the subtree objects (dictionaries or sequences
+        of pairs) which appear more than once in 'api_tree', by id(). Only
+        the branch objects are looked at: dictionaries are read with
+        'values', and the subtrees of a repeated subtree are not looked at
+        again. """
+    # id() -> subtree, for the subtrees seen so far. Holding the subtrees
+    # keeps their ids unique.
+    seen = {}
+    shared = {}
+    
+    # '(branch_obj, appearances)', where 'branch_obj' is a subtree or a
+    # sequence of branch objects.
+    stack = [(api_tree, 1)]
+    while stack:
+        obj, appearances = stack.pop()
+        
+        if isinstance(obj, Mapping):
+            pairs = ((None, item) for item in obj.values())
         else:
-            result_list = [
-                parse_branch(item, branch_obj, root_path)
-                for item in branch_location
+            try:
+                pairs = [(a, b) for a, b in obj]
+            except (TypeError, ValueError):
+                pairs = None
+        
+        if pairs is None:
+            # A sequence of branch objects for the same location.
+            children = [(item, appearances) for item in obj]
+        else:
+            key = id(obj)
+            if key in seen or appearances > 1:
+                shared[key] = obj
+            if key in seen:
+                continue
+            seen[key] = obj
+            children = [
+                (branch_obj, count_locations(branch_location))
+                for branch_location, branch_obj in pairs
                 ]
-            return conglomerate_endpoints(result_list)
-    
-    if isinstance(branch_location, RequestMethod):
-        request_method = branch_location.request_method
-        branch_path = ''
-    else:
-        request_method = None
-        branch_path = branch_location
+        
+        stack.extend(
+            (branch_obj, count)
+            for branch_obj, count in reversed(children)
+            if isinstance(branch_obj, Mapping) or
+                is_container(branch_obj, Sequence)
+            )
     
+    return shared
+
+def iter_endpoints(api_tree, root_path=''):
+    """ Yield '(complete_route, endpoint)' for each view callable in
+        'api_tree', depth-first in the order of the API tree. 'endpoint' is
+        an 'Endpoint'.
+        
+        The API tree is walked with an explicit stack of iterators rather than
+        by recursion, so its depth is not limited by the recursion limit, and
+        nothing is built for a branch beyond its endpoints. Subtree objects
+        which appear more than once (see 'find_shared_subtrees') are
+        compiled once, where they first appear, and yield the same 'Endpoint'
+        records under each prefix. """
     try:
-        complete_route = root_path + branch_path
+        shared = find_shared_subtrees(api_tree)
     except TypeError:
-        raise APITreeError(
-            "Invalid branch route object. Must be one of: a string path "
-            "component ('/something'); a RequestMethod instance; or a "
-            "tuple of those. Got: {}"
-            .format(type(branch_path).__name__)
-            )
-    
-    # ----------------------- Parse 'branch_object'. -----------------------
+        # Not traversable; reported by 'iter_branches'.
+        shared = {}
+    yield from walk_api_tree(api_tree, root_path, shared, {})
+
+def walk_api_tree(api_tree, root_path, shared, compiled):
+    """ See 'iter_endpoints'. 'compiled' maps the id() of subtrees in
+        'shared' to their '(relative_route, endpoint)' pairs, once
+        compiled. """
+    stack = [iter_branches(api_tree, root_path)]
     
-    if is_container(branch_obj, Sequence):
+    while stack:
         try:
-            return get_endpoints(branch_obj, complete_route)
-        except APITreeStructureError:
-            pass
+            branch_location, branch_obj, root_path = next(stack[-1])
+        except StopIteration:
+            stack.pop()
+            continue
         
-        result_list = [
-            parse_branch(branch_location, item, root_path)
-            for item in branch_obj
-            ]
-        return conglomerate_endpoints(result_list)
-    
-    if isinstance(branch_obj, Mapping):
-        if request_method is not None:
+        # -------------------- Parse 'branch_location'. --------------------
+        
+        if is_container(branch_location, Sequence):
+            if all(
+                [isinstance(item, RequestMethod) for item in branch_location]
+                ):
+                # 'branch_location' is a sequence of request methods. Sum to
+                # a single request method.
+                branch_location = sum(branch_location, RequestMethod())
+            
+            else:
+                stack.append(zip(
+                    branch_location,
+                    itertools.repeat(branch_obj),
+                    itertools.repeat(root_path),
+                    ))
+                continue
+        
+        if isinstance(branch_location, RequestMethod):
+            request_method = branch_location.request_method
+            branch_path = ''
+        else:
+            request_method = None
+            branch_path = branch_location
+        
+        try:
+            complete_route = root_path + branch_path
+        except TypeError:
+            raise APITreeError(
+                "Invalid branch route object. Must be one of: a string path "
+                "component ('/something'); a RequestMethod instance; or a "
+                "tuple of those. Got: {}"
+                .format(type(branch_path).__name__)
+                )
+        
+        # --------------------- Parse 'branch_object'. ---------------------
+        
+        if not (
+            isinstance(branch_obj, Mapping) or
+            is_container(branch_obj, Sequence)
+            ):
+            # ---------- 'branch_object' is a single view callable. ----------
+            
+            yield complete_route, Endpoint(branch_obj, request_method)
+            continue
+        
+        if isinstance(branch_obj, Mapping) and request_method is not None:
             invalid_path = complete_route + '/' + str(request_method)
             raise APITreeError(
                 "RequestMethod-instance branch routes (GET, POST, etc.) "
@@ -96,41 +281,38 @@ def parse_branch(branch_location, branch_obj, root_path):
                 .format(invalid_path)
                 )
         
-        return get_endpoints(branch_obj, complete_route)
-    
-    # ------------- 'branch_object' is a single view callable. -------------
-    
-    view_dict = {}
-    
-    view_callable = branch_obj
-    
-    view_kwargs = getattr(view_callable, 'view_kwargs', dict())
-    view_dict.update(view_kwargs)
-    view_dict['view'] = view_callable
-    
-    # Request method from API tree overrides request method provided by
-    # view callable 'view_kwargs'.
-    if request_method is not None:
-        view_dict['request_method'] = request_method
-    
-    return {complete_route: [view_dict]}
+        # A subtree object which appears more than once (e.g. one version of
+        # an API mounted under several prefixes) is compiled once, and its
+        # endpoints are shared by all of its appearances.
+        key = id(branch_obj)
+        if key in shared:
+            records = compiled.get(key)
+            if records is None:
+                records = compiled[key] = tuple(
+                    walk_api_tree(branch_obj, '', shared, compiled)
+                    )
+            for relative_route, endpoint in records:
+                yield complete_route + relative_route, endpoint
+            continue
+        
+        try:
+            # A dictionary or sequence of '(branch_location, branch_obj)'
+            # pairs.
+            stack.append(iter_branches(branch_obj, complete_route))
+        except APITreeStructureError:
+            # A sequence of view callables (or branch objects) for the same
+            # 'branch_location'.
+            stack.append(zip(
+                itertools.repeat(branch_location),
+                branch_obj,
+                itertools.repeat(root_path),
+                ))
+
+def is_mount(view):
+    """ Whether 'view' is an object which mounts itself under a route prefix
+        (like 'apitree.lazy.LazySubtree') rather than a view callable. """
+    return hasattr(view, 'get_mount_patterns')
 
-def get_pairs(api_tree):
-    """ 'api_tree' must be either a dictionary or a list of 2-length tuples. """
-    try:
-        return api_tree.items()
-    except AttributeError:
-        pass
-    
-    try:
-        return [(a, b) for a, b in api_tree]
-    except (TypeError, ValueError):
-        raise APITreeStructureError(
-            "'api_tree' value was not traversable. 'api_tree' must be either a "
-            "dictionary or a sequence of 2-length tuples. Got: {}"
-            .format(api_tree)
-            )
-    
 def get_endpoints(api_tree, root_path=''):
     """ Returns a dictionary, like this:
         {
@@ -144,31 +326,166 @@ def get_endpoints(api_tree, root_path=''):
                 ]
             }
         
-        """
-    pairs = get_pairs(api_tree)
-    
-    result_list = [
-        parse_branch(branch_location, branch_object, root_path)
-        for branch_location, branch_object in pairs
-        ]
-    return conglomerate_endpoints(result_list)
-
-def scan_api_tree(configurator, api_tree, root_path=''):
-    endpoints = get_endpoints(api_tree, root_path=root_path)
+        Routes are in the order in which 'iter_endpoints' first yields
+        them. The view callable dictionaries are new, mutable copies of its
+        'Endpoint' records. """
+    return {
+        complete_route: [endpoint.as_dict() for endpoint in route_endpoints]
+        for complete_route, route_endpoints in group_endpoints(
+            iter_endpoints(api_tree, root_path)
+            ).items()
+        }
+
+def group_endpoints(endpoint_pairs):
+    """ Return a dictionary of the endpoints of '(complete_route, endpoint)'
+        pairs by route, in the order in which routes first appear. """
+    result = {}
+    for complete_route, endpoint in endpoint_pairs:
+        result.setdefault(complete_route, []).append(endpoint)
+    return result
+
+def scan_api_tree(
+    configurator,
+    api_tree,
+    root_path='',
+    dispatch=False,
+    route_hits=None,
+    startup_profiler=None,
+    ):
+    """ Add a Pyramid route for each endpoint of 'api_tree', and a view for
+        each view callable.
+        
+        With 'dispatch', each route gets a single 'MethodDispatcher' view
+        instead, which selects the view callable by request method without
+        Pyramid's predicate checks. 'add_catchall' adds catchalls to these
+        dispatchers. View callables may only use the view arguments in
+        'apitree.dispatch.SUPPORTED_VIEW_KWARGS'.
+        
+        Pyramid tries routes in the order they are added. 'route_hits' is a
+        dictionary of hit counts by route pattern (see
+        'apitree.route_order.RouteHitCounter'); with it, the most frequently
+        hit routes are added first.
+        
+        Lazy subtrees ('apitree.lazy.LazySubtree') add their own routes.
+        
+        With a 'startup_profiler' ('apitree.startup.StartupProfiler'), the
+        time and memory spent per subtree and per Pyramid route and view are
+        measured. """
+    with use_profiler(startup_profiler):
+        if route_hits is None:
+            endpoint_pairs = iter_endpoints(api_tree, root_path)
+        else:
+            endpoints = group_endpoints(iter_endpoints(api_tree, root_path))
+            endpoint_pairs = (
+                (complete_route, view_dict)
+                for complete_route in order_routes(endpoints, route_hits)
+                for view_dict in endpoints[complete_route]
+                )
+        
+        add_endpoints(configurator, endpoint_pairs, dispatch)
+
+def get_view_label(complete_route, view_dict):
+    """ E.g. '/items/{id} GET,POST myapp.views:get_item'. """
+    view = view_dict['view']
+    request_method = view_dict.get('request_method')
+    if request_method is None:
+        request_method = '*'
+    else:
+        request_method = ','.join(make_uppercase_tuple(request_method))
     
-    for complete_route, view_dicts_list in endpoints.items():
-        configurator.add_route(name=complete_route, pattern=complete_route)
+    return '{} {} {}'.format(
+        complete_route,
+        request_method,
+        get_callable_name(getattr(view, 'wrapped', view)),
+        )
+
+def add_endpoints(configurator, endpoint_pairs, dispatch=False):
+    """ Add the routes and views of '(complete_route, view_dict)' pairs, as
+        yielded by 'iter_endpoints'. See 'scan_api_tree'. """
+    # Route -> 'MethodDispatcher' (or None without 'dispatch').
+    routes = {}
+    
+    for complete_route, view_dict in endpoint_pairs:
+        if is_mount(view_dict['view']):
+            # E.g. 'apitree.lazy.LazySubtree', which adds its own routes.
+            with measure(MOUNT, complete_route, complete_route):
+                view_dict['view'].mount(configurator, complete_route)
+            continue
+        
+        if complete_route not in routes:
+            with measure(ADD_ROUTE, complete_route, complete_route):
+                configurator.add_route(
+                    name=complete_route,
+                    pattern=complete_route,
+                    )
+            
+            dispatcher = None
+            if dispatch:
+                dispatcher = MethodDispatcher(complete_route)
+                with measure(ADD_VIEW, complete_route, complete_route):
+                    configurator.add_view(
+                        route_name=complete_route,
+                        view=dispatcher,
+                        )
+                get_dispatchers(configurator)[complete_route] = dispatcher
+            routes[complete_route] = dispatcher
+        
+        if dispatch:
+            routes[complete_route].add_view(view_dict)
+            continue
         
-        for view_dict in view_dicts_list:
+        with measure(
+            ADD_VIEW,
+            lambda: get_view_label(complete_route, view_dict),
+            complete_route,
+            ):
             configurator.add_view(
                 route_name=complete_route,
                 **view_dict
                 )
 
-def make_uppercase_tuple(value):
-    if is_container(value, Sequence):
-        return tuple([item.upper() for item in value])
-    return tuple([value.upper()])
+def get_view_option_names():
+    """ Return the set of view options of all view callable classes. """
+    result = set()
+    classes = [BaseViewCallable]
+    while classes:
+        cls = classes.pop()
+        result.update(cls.view_options)
+        classes.extend(cls.__subclasses__())
+    return result
+
+def set_view_options(api_tree, **options):
+    """ Set view options (see 'BaseViewCallable.view_options') on every view
+        callable in 'api_tree'. The same option value is shared by all of them,
+        e.g. one 'limiter' for a whole subtree.
+        
+        Options which a view callable already has - from its decorator or from
+        an earlier call - are kept, so configure the most specific subtrees
+        first. View callables which do not support an option (e.g.
+        'verification' for a 'FunctionViewCallable') and objects which are
+        not apitree view callables are skipped. Raises 'TypeError', before
+        any view callable is changed, for an option which no view callable
+        class supports. """
+    known_options = get_view_option_names()
+    views = []
+    for complete_route, view_dict in iter_endpoints(api_tree):
+        view = view_dict['view']
+        view_options = getattr(view, 'view_options', None)
+        if view_options is None:
+            continue
+        known_options.update(view_options)
+        views.append((view, view_options))
+    
+    unknown = set(options) - known_options
+    if unknown:
+        raise TypeError(
+            "Unknown view options: {}".format(', '.join(sorted(unknown)))
+            )
+    
+    for view, view_options in views:
+        for ikey, ivalue in options.items():
+            if ikey in view_options and ikey not in vars(view):
+                setattr(view, ikey, ivalue)
 
 def get_catchall_kwargs(
     catchall,
@@ -209,14 +526,13 @@ def view_is_qualified(
     target_classinfo=None,
     strict=False,
     ):
-    view_dict = view_dict.copy()
-    view = view_dict.pop('view')
+    view = view_dict['view']
     
     if target_request_method is not None:
         target_rm_set = set(target_request_method)
         
         view_request_method = make_uppercase_tuple(
-            view_dict.pop('request_method', tuple())
+            view_dict.get('request_method', tuple())
             )
         
         view_rm_set = set(view_request_method)
@@ -225,10 +541,17 @@ def view_is_qualified(
             return False
     
     if target_view_kwargs is not None:
-        target_vk_set = set(target_view_kwargs.items())
-        view_vk_set = set(view_dict.items())
-        if not view_vk_set >= target_vk_set:
-            return False
+        # 'view' is not a view argument, and neither is 'request_method' when
+        # it is compared separately.
+        excluded_keys = {'view'}
+        if target_request_method is not None:
+            excluded_keys.add('request_method')
+        
+        for ikey, ivalue in target_view_kwargs.items():
+            if ikey in excluded_keys or ikey not in view_dict:
+                return False
+            if view_dict[ikey] != ivalue:
+                return False
     
     if target_classinfo is not None:
         if not isinstance(target_classinfo, tuple):
@@ -253,6 +576,7 @@ def add_catchall(
     target_request_method=None,
     target_classinfo=None,
     strict=False,
+    startup_profiler=None,
     ):
     """ Add a 'catchall' view callable to an API tree.
         
@@ -264,33 +588,62 @@ def add_catchall(
         present.
         
         'strict' indicates that 'target_classinfo' does not match
-        subclasses. """
-    
+        subclasses.
+        
+        On routes added by 'scan_api_tree' with 'dispatch', the catchall is
+        added to the route's 'MethodDispatcher'.
+        
+        'startup_profiler' is as for 'scan_api_tree'. """
+    with use_profiler(startup_profiler):
+        add_catchall_views(
+            configurator,
+            api_tree,
+            catchall,
+            view_kwargs,
+            additional_view_kwargs,
+            target_view_kwargs,
+            target_request_method,
+            target_classinfo,
+            strict,
+            )
+
+def add_catchall_views(
+    configurator,
+    api_tree,
+    catchall,
+    view_kwargs,
+    additional_view_kwargs,
+    target_view_kwargs,
+    target_request_method,
+    target_classinfo,
+    strict,
+    ):
     if target_request_method is not None:
         target_request_method = make_uppercase_tuple(target_request_method)
     
-    endpoints = get_endpoints(api_tree)
-    
     if not hasattr(catchall, 'catchall_custom_predicate'):
-        def catchall_custom_predicate(context, request):
-            return True
-        
-        catchall.catchall_custom_predicate = catchall_custom_predicate
+        catchall.catchall_custom_predicate = make_catchall_predicate()
     
-    for complete_route, view_dicts_list in endpoints.items():
-        qualified_views = [
-            item for item in view_dicts_list
-            if view_is_qualified(
-                item,
-                target_view_kwargs,
-                target_request_method,
-                target_classinfo,
-                strict,
-                )
-            ]
-        if not qualified_views:
+    # Routes added by 'scan_api_tree' with 'dispatch'.
+    dispatchers = get_dispatchers(configurator) or {}
+    
+    # Route -> qualified view dictionaries. Other routes are skipped.
+    qualified_endpoints = {}
+    for complete_route, view_dict in iter_endpoints(api_tree):
+        if is_mount(view_dict['view']):
             continue
-        
+        if view_is_qualified(
+            view_dict,
+            target_view_kwargs,
+            target_request_method,
+            target_classinfo,
+            strict,
+            ):
+            qualified_endpoints.setdefault(complete_route, []).append(
+                view_dict
+                )
+    
+    for complete_route, qualified_views in qualified_endpoints.items():
         catchall_kwargs = get_catchall_kwargs(
             catchall,
             qualified_views,
@@ -301,13 +654,25 @@ def add_catchall(
         
         catchall_kwargs.update(additional_view_kwargs)
         
-        configurator.add_view(
-            route_name=complete_route,
-            view=catchall,
-            **catchall_kwargs
-            )
-    
-    
+        dispatcher = dispatchers.get(complete_route)
+        if dispatcher is not None:
+            dispatcher.add_view(dict(catchall_kwargs, view=catchall))
+            continue
+        
+        def get_catchall_label():
+            return get_view_label(
+                complete_route,
+                dict(catchall_kwargs, view=catchall),
+                )
+        
+        with measure(ADD_VIEW, get_catchall_label, complete_route):
+            configurator.add_view(
+                route_name=complete_route,
+                view=catchall,
+                **catchall_kwargs
+                )
+
+
 
 
 
@@ -1,8 +1,121 @@
 """ Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
 
 def is_container(obj, classinfo):
     """ 'obj' is an instance of 'classinfo', but is not a 'str' or 'bytes'
         instance. """
     if isinstance(obj, classinfo) and not isinstance(obj, (str, bytes)):
         return True
-    return False
\ No newline at end of file
+    return False
+
+def make_uppercase_tuple(value):
+    if is_container(value, Sequence):
+        return tuple([item.upper() for item in value])
+    return tuple([value.upper()])
+
+# WSGI environ key holding the route pattern matched by a router (see
+# 'apitree.router'), which takes priority over the Pyramid route.
+ROUTE_PATTERN_ENVIRON_KEY = 'apitree.route_pattern'
+
+def get_route_pattern(request):
+    """ Return the pattern of the route matched by 'request', or None. """
+    environ = getattr(request, 'environ', None)
+    if environ:
+        pattern = environ.get(ROUTE_PATTERN_ENVIRON_KEY)
+        if pattern is not None:
+            return pattern
+    
+    route = getattr(request, 'matched_route', None)
+    return getattr(route, 'pattern', None)
+
+def preload_view(view):
+    """ Call the 'preload' method of 'view', if it has one. View callables
+        and routers which defer work to their first call (e.g.
+        'apitree.lazy.LazySubtree') do that work in 'preload'; see
+        'apitree.preload.preload'. """
+    method = getattr(view, 'preload', None)
+    if method is not None:
+        method()
+
+def add_admin_view(configurator, path, get_result, **view_kwargs):
+    """ Add a route at 'path' with a JSON view (GET by default) which returns
+        'get_result()'. Used by the 'add_views' methods of instruments (e.g.
+        'apitree.slow_requests.SlowRequestLog'); 'view_kwargs' are passed to
+        'Configurator.add_view'. """
+    # Imported here, because 'apitree.view_callable' imports this module.
+    from .view_callable import SimpleViewCallable
+    
+    view_kwargs.setdefault('request_method', 'GET')
+    view_kwargs.setdefault('renderer', 'json')
+    
+    @SimpleViewCallable(**view_kwargs)
+    def admin_view(request):
+        return get_result()
+    
+    configurator.add_route(name=path, pattern=path)
+    configurator.add_view(
+        route_name=path,
+        view=admin_view,
+        **admin_view.view_kwargs
+        )
+
+class TTLCache(object):
+    """ A thread-safe, size-bounded cache whose entries expire.
+        
+        When full, the least recently used entry is evicted. """
+    
+    def __init__(self, max_size, ttl, timer=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.timer = timer
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value, expires = self.entries[key]
+            except KeyError:
+                return default
+            
+            if expires <= self.timer():
+                del self.entries[key]
+                return default
+            
+            self.entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.ttl
+        
+        with self.lock:
+            self.entries[key] = (value, self.timer() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def pop(self, key, default=None):
+        with self.lock:
+            value, expires = self.entries.pop(key, (default, None))
+            return value
+    
+    def discard_where(self, predicate):
+        """ Remove entries whose value satisfies 'predicate'. """
+        with self.lock:
+            keys = [
+                ikey for ikey, (ivalue, expires) in self.entries.items()
+                if predicate(ivalue)
+                ]
+            for ikey in keys:
+                del self.entries[ikey]
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
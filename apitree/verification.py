@@ -0,0 +1,102 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import logging
+import random
+import threading
+
+from iomanager import VerificationFailureError
+
+from .util import get_route_pattern
+
+logger = logging.getLogger(__name__)
+
+INPUT = 'input'
+OUTPUT = 'output'
+
+class VerificationPolicy(object):
+    """ Decides whether 'APIViewCallable' verifies the input and output of a
+        call. Use as the 'verification' view option, e.g. for a whole subtree
+        with 'set_view_options'.
+        
+        'rate' is the fraction of calls verified (1 for always, 0 for never);
+        'input_rate' and 'output_rate' override it for one direction.
+        Violations are counted and logged. With 'enforce', they also raise
+        'iomanager.VerificationFailureError' as usual; otherwise the call
+        proceeds, which is only safe where the wrapped callable tolerates
+        invalid input. """
+    
+    def __init__(
+        self,
+        rate=1.0,
+        input_rate=None,
+        output_rate=None,
+        enforce=True,
+        ):
+        self.rates = {
+            INPUT: rate if input_rate is None else input_rate,
+            OUTPUT: rate if output_rate is None else output_rate,
+            }
+        self.enforce = enforce
+        self.lock = threading.Lock()
+        self.clear()
+    
+    def clear(self):
+        with self.lock:
+            self.counts = {
+                direction: {'verified': 0, 'skipped': 0, 'violations': 0}
+                for direction in [INPUT, OUTPUT]
+                }
+            # (route, direction) -> violations.
+            self.route_violations = {}
+    
+    def should_verify(self, direction):
+        rate = self.rates[direction]
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        return random.random() < rate
+    
+    def verify(self, direction, verify_method, iovalue, request):
+        """ Call 'verify_method' (e.g. 'IOManager.verify_input') if this call
+            is sampled. """
+        if not self.should_verify(direction):
+            with self.lock:
+                self.counts[direction]['skipped'] += 1
+            return
+        
+        try:
+            verify_method(iovalue=iovalue)
+        except VerificationFailureError as exc:
+            self.add_violation(direction, get_route_pattern(request), exc)
+            if self.enforce:
+                raise
+        else:
+            with self.lock:
+                self.counts[direction]['verified'] += 1
+    
+    def add_violation(self, direction, route, exc):
+        with self.lock:
+            self.counts[direction]['verified'] += 1
+            self.counts[direction]['violations'] += 1
+            key = (route, direction)
+            self.route_violations[key] = self.route_violations.get(key, 0) + 1
+        
+        logger.warning(
+            "%s verification failed for route %s: %s",
+            direction.capitalize(),
+            route,
+            exc,
+            )
+    
+    def get_stats(self):
+        with self.lock:
+            result = {
+                direction: dict(counts)
+                for direction, counts in self.counts.items()
+                }
+            result['routes'] = [
+                {'route': route, 'direction': direction, 'violations': count}
+                for (route, direction), count in
+                sorted(self.route_violations.items(), key=str)
+                ]
+        return result
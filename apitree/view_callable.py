@@ -1,13 +1,127 @@
 """ Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+import inspect
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import nullcontext
+
 import iomanager
 from iomanager import IOManager
+from iomanager.iomanager import NotProvided
+from pyramid.httpexceptions import (
+    HTTPBadRequest,
+    HTTPGatewayTimeout,
+    HTTPRequestEntityTooLarge,
+    HTTPServiceUnavailable,
+    HTTPUnauthorized,
+    )
+from pyramid.response import Response
+
+from .authentication import (
+    PRINCIPAL_ATTRIBUTE,
+    get_principal,
+    )
+from .content import (
+    default_body_decoders,
+    find_codec,
+    negotiate_codec,
+    parse_media_type,
+    )
+from .deadline import (
+    Deadline,
+    parse_timeout,
+    run_with_deadline,
+    )
+from .exc import (
+    AdmissionRejectedError,
+    AuthenticationError,
+    ContentError,
+    DeadlineExceededError,
+    ResourceUnavailableError,
+    PayloadTooLargeError,
+    )
+from .resources import (
+    default_resource_registry,
+    get_request_scope,
+    )
+from .limits import (
+    PayloadLimits,
+    input_depth,
+    )
+from .startup import (
+    DECORATE,
+    INTROSPECT,
+    get_callable_name,
+    measure,
+    )
+from .tracing import end_routing_span
+from .util import get_route_pattern
+
+# Returned by 'phase' when no instrumentation is configured.
+NO_PHASE = nullcontext()
+
+# Attributes of the request which hold its recordings (see
+# 'start_recordings') and its deadline. One view callable serves concurrent
+# requests, so per-request state is kept on the request.
+RECORDINGS_ATTRIBUTE = 'apitree_recordings'
+DEADLINE_ATTRIBUTE = 'apitree_deadline'
 
 class BaseViewCallable(object):
+    # Decorator keyword arguments which set attributes of the view callable
+    # instead of being passed to Pyramid as 'view_kwargs'. These can also be
+    # set for a whole API tree with 'apitree.tree_scan.set_view_options'.
+    view_options = [
+        'limiter',
+        'authenticator',
+        'tracer',
+        'slow_request_log',
+        'slow_request_threshold',
+        'memory_profiler',
+        'route_profiler',
+        'cpu_accounting',
+        'route_hits',
+        ]
+    
+    # 'apitree.admission.ConcurrencyLimiter' which admits requests.
+    limiter = None
+    
+    # 'apitree.authentication.Authenticator' used by 'authenticate'. The
+    # resulting principal is kept on the request, and is available as
+    # 'self.principal' or from 'apitree.authentication.get_principal'.
+    authenticator = None
+    
+    # 'apitree.tracing.Tracer' which receives a span for each phase.
+    tracer = None
+    
+    # 'apitree.slow_requests.SlowRequestLog' which records requests slower
+    # than 'slow_request_threshold' seconds (or the log's own threshold), with
+    # the time spent in each phase.
+    slow_request_log = None
+    slow_request_threshold = None
+    
+    # 'apitree.memory.MemoryProfiler' which measures memory allocated in each
+    # phase of sampled requests.
+    memory_profiler = None
+    
+    # 'apitree.profiling.RouteProfiler' which profiles calls when armed.
+    route_profiler = None
+    
+    # 'apitree.accounting.CPUAccounting' which sums wall and CPU time per
+    # route.
+    cpu_accounting = None
+    
+    # 'apitree.route_order.RouteHitCounter' which counts calls per route.
+    route_hits = None
+    
     def __init__(self, *pargs, **kwargs):
+        # Holds the request handled in each thread.
+        self.local = threading.local()
+        
         if pargs:
             # Decorator without keyword arguments.
             self.set_wrapped(pargs[0])
-            self.setup(kwargs)
+            with measure(DECORATE, lambda: get_callable_name(self.wrapped)):
+                self.setup(kwargs)
         else:
             # Decorator with keyword arguments.
             self._setup_kwargs = kwargs
@@ -16,16 +130,164 @@ class BaseViewCallable(object):
         if not hasattr(self, 'wrapped'):
             # Decorator with keyword arguments - after '__init__'.
             self.set_wrapped(obj)
-            self.setup(self.__dict__.pop('_setup_kwargs'))
+            with measure(DECORATE, lambda: get_callable_name(obj)):
+                self.setup(self.__dict__.pop('_setup_kwargs'))
             return self
         
+        previous_request = self.request
         self.request = obj
-        self.authenticate()
+        try:
+            return self.handle_call(obj)
+        finally:
+            self.request = previous_request
+    
+    @property
+    def request(self):
+        """ The request handled by this view callable in the current thread.
+            """
+        return getattr(self.local, 'request', None)
+    
+    @request.setter
+    def request(self, value):
+        self.local.request = value
+    
+    @property
+    def principal(self):
+        """ The principal of the current request (see 'authenticate'). """
+        return get_principal(self.request)
+    
+    @property
+    def recordings(self):
+        """ The recordings of the current request (see 'start_recordings').
+            """
+        return getattr(self.request, RECORDINGS_ATTRIBUTE, ())
+    
+    def handle_call(self, request):
+        end_routing_span(request)
+        
+        # The deadline starts before admission and authentication, so that
+        # the time spent waiting for them counts against it.
+        deadline = self.get_deadline()
+        if deadline is not None:
+            setattr(request, DEADLINE_ATTRIBUTE, deadline)
+        
+        recordings = self.start_recordings()
+        if not recordings:
+            with self.phase('request'):
+                return self.admitted_call()
+        
+        setattr(request, RECORDINGS_ATTRIBUTE, recordings)
+        try:
+            with self.phase('request'):
+                return self.admitted_call()
+        finally:
+            setattr(request, RECORDINGS_ATTRIBUTE, ())
+            for item in reversed(recordings):
+                item.finish()
+    
+    def get_deadline(self):
+        """ Return the 'apitree.deadline.Deadline' of the current request, or
+            None. """
+        return None
+    
+    @property
+    def deadline(self):
+        """ The 'apitree.deadline.Deadline' of the current request, or None.
+            """
+        return getattr(self.request, DEADLINE_ATTRIBUTE, None)
+    
+    def start_recordings(self):
+        """ Return per-request recordings of the configured instruments. Each
+            has 'phase(name, context)' and 'finish()' methods. """
+        result = []
+        
+        if self.slow_request_log is not None:
+            result.append(self.slow_request_log.start(
+                self.request,
+                self.slow_request_threshold,
+                ))
+        
+        for instrument in [
+            self.route_hits,
+            self.cpu_accounting,
+            self.memory_profiler,
+            self.route_profiler,
+            ]:
+            if instrument is None:
+                continue
+            recording = instrument.start(self.request)
+            if recording is not None:
+                result.append(recording)
+        
+        return result
+    
+    def phase(self, name):
+        """ Return a context manager around one phase of request handling,
+            e.g. 'authenticate' or 'handler'. """
+        tracer = self.tracer
+        recordings = self.recordings
+        
+        if tracer is None:
+            if not recordings:
+                return NO_PHASE
+            context = NO_PHASE
+        else:
+            context = tracer.start_span(
+                'apitree.' + name,
+                self.span_attributes(),
+                )
+        
+        # The first recording is innermost, so that it does not measure the
+        # others.
+        for item in recordings:
+            context = item.phase(name, context)
+        return context
+    
+    def span_attributes(self):
+        return {
+            'apitree.route': get_route_pattern(self.request),
+            'http.method': getattr(self.request, 'method', None),
+            }
+    
+    def admitted_call(self):
+        limiter = self.limiter
+        if limiter is None:
+            return self.handle_request()
+        
+        deadline = self.deadline
+        try:
+            with self.phase('admission'):
+                if deadline is None:
+                    limiter.acquire()
+                else:
+                    limiter.acquire(deadline.remaining())
+        except AdmissionRejectedError as exc:
+            if deadline is not None and deadline.expired():
+                raise HTTPGatewayTimeout('Request deadline expired.')
+            headers = {}
+            if exc.retry_after is not None:
+                headers['Retry-After'] = str(exc.retry_after)
+            raise HTTPServiceUnavailable(str(exc), headers=headers)
+        
+        start = time.monotonic()
+        try:
+            return self.handle_request()
+        finally:
+            limiter.release(time.monotonic() - start)
+    
+    def handle_request(self):
+        with self.phase('authenticate'):
+            self.authenticate()
         return self.view_call()
     
     def setup(self, kwargs_dict):
         view_kwargs = getattr(self, 'default_view_kwargs', {}).copy()
         view_kwargs.update(kwargs_dict)
+        
+        for ikey in self.view_options:
+            if ikey in view_kwargs:
+                setattr(self, ikey, view_kwargs.pop(ikey))
+        
         self.view_kwargs = view_kwargs
     
     def set_wrapped(self, wrapped):
@@ -34,36 +296,250 @@ class BaseViewCallable(object):
         self.wrapped = wrapped
     
     def authenticate(self):
-        pass
+        if self.authenticator is None:
+            return
+        
+        try:
+            principal = self.authenticator.authenticate(self.request)
+        except AuthenticationError as exc:
+            raise HTTPUnauthorized(str(exc))
+        setattr(self.request, PRINCIPAL_ATTRIBUTE, principal)
 
 class SimpleViewCallable(BaseViewCallable):
     def view_call(self):
         return self.wrapped(self.request)
 
 class FunctionViewCallable(BaseViewCallable):
+    # 'apitree.content.Codec' instances (a view option). Request bodies with a
+    # matching 'Content-Type' are decoded by the codec, and results are
+    # encoded by it when the 'Accept' header asks for one of its media types.
+    codecs = ()
+    
+    # 'apitree.content.BodyDecoderRegistry' used for other request bodies.
+    body_decoders = default_body_decoders
+    
+    # 'apitree.limits.PayloadLimits' checked while the body is decoded.
+    payload_limits = None
+    
+    view_options = BaseViewCallable.view_options + [
+        'codecs',
+        'timeout',
+        'executor',
+        'resources',
+        'resource_registry',
+        ]
+    
+    # Maximum seconds for a request, counted from the start of the call
+    # (including admission and authentication). Clients can ask for a shorter
+    # deadline with the 'timeout_header' header (seconds). Expired requests
+    # get a 504 response.
+    timeout = None
+    timeout_header = 'X-Request-Timeout'
+    
+    # 'concurrent.futures.Executor' in which synchronous wrapped callables run
+    # when a deadline applies, so that they can be abandoned at the deadline.
+    # Without one, a synchronous wrapped callable is not interrupted: the
+    # deadline only rejects requests which expired before the call, and
+    # discards the result of a call which finished after it.
+    executor = None
+    
+    # The 'apitree.deadline.Deadline' of the current request (or None) is
+    # passed as this keyword argument if the wrapped callable accepts it by
+    # name.
+    deadline_kwarg = 'deadline'
+    
+    # Names of resources in 'resource_registry' (an
+    # 'apitree.resources.ResourceRegistry') passed to the wrapped callable as
+    # keyword arguments of the same name. A dictionary maps keyword argument
+    # names to resource names.
+    resources = ()
+    resource_registry = default_resource_registry
+    
+    def setup(self, kwargs_dict):
+        super().setup(kwargs_dict)
+        self.accepted_kwargs = self.get_accepted_kwargs()
+    
+    def get_accepted_kwargs(self):
+        """ Return the set of keyword argument names accepted by the wrapped
+            callable, or None if it accepts arbitrary keyword arguments. """
+        try:
+            signature = inspect.signature(self.wrapped)
+        except (TypeError, ValueError):
+            return None
+        
+        names = set()
+        for parameter in signature.parameters.values():
+            if parameter.kind == parameter.VAR_KEYWORD:
+                return None
+            if parameter.kind in (
+                parameter.POSITIONAL_OR_KEYWORD,
+                parameter.KEYWORD_ONLY,
+                ):
+                names.add(parameter.name)
+        
+        return frozenset(names)
+    
     def view_call(self):
+        resource_scope, owned = self.get_resource_scope()
+        try:
+            return self._view_call(resource_scope)
+        except DeadlineExceededError as exc:
+            if exc.future is not None and resource_scope is not None:
+                resource_scope.close_after(exc.future)
+            raise HTTPGatewayTimeout(str(exc))
+        except ResourceUnavailableError as exc:
+            raise HTTPServiceUnavailable(str(exc))
+        finally:
+            # Requests which cannot release resources themselves.
+            if owned:
+                resource_scope.close()
+    
+    def _view_call(self, resource_scope):
+        if self.deadline is not None:
+            self.deadline.check()
+        
+        with self.phase('bind'):
+            kwargs_dict = self.bind_kwargs(resource_scope)
+        
+        result = self.wrapped_call(**kwargs_dict)
+        
+        with self.phase('encode'):
+            return self.encode_result(result)
+    
+    def bind_kwargs(self, resource_scope):
+        """ Collect keyword arguments for the wrapped callable from the
+            request. Resources come from 'resource_scope'. """
         request = self.request
         
         kwargs_url = dict(request.matchdict)
         kwargs_get = dict(request.GET)
         
-        content_type = request.headers.get('content-type', '').lower()
-        
-        if content_type == 'application/json':
-            kwargs_body = request.json_body
-        else:
-            kwargs_body = request.POST
-        
         kwargs_dict = {}
         special_kwargs = self.special_kwargs()
+        injected_kwargs = self.injected_kwargs(resource_scope)
         
         # Listed in reverse-priority order (last has highest priority).
-        kwargs_sources = [kwargs_body, kwargs_get, kwargs_url, special_kwargs]
+        kwargs_sources = [
+            kwargs_get,
+            kwargs_url,
+            special_kwargs,
+            injected_kwargs,
+            ]
+        
+        # The body has the lowest priority, so it is only decoded when some
+        # accepted keyword argument is not provided by the other sources.
+        if self.needs_body(kwargs_sources):
+            kwargs_sources.insert(0, self.get_body_kwargs())
         
         for item in kwargs_sources:
             kwargs_dict.update(item)
         
-        return self.wrapped_call(**kwargs_dict)
+        return kwargs_dict
+    
+    def get_deadline(self):
+        timeouts = [
+            item for item in [
+                self.timeout,
+                parse_timeout(self.request.headers.get(self.timeout_header)),
+                ]
+            if item is not None
+            ]
+        if not timeouts:
+            return None
+        return Deadline(min(timeouts))
+    
+    def injected_kwarg_names(self):
+        """ Names of keyword arguments which apitree itself provides to the
+            wrapped callable. Like 'special_kwargs', these are not documented.
+            """
+        accepted = getattr(self, 'accepted_kwargs', None) or ()
+        result = [
+            ikey for ikey in [self.deadline_kwarg]
+            if ikey in accepted
+            ]
+        result.extend(self.get_resource_kwargs().keys())
+        return result
+    
+    def injected_kwargs(self, resource_scope):
+        result = {}
+        
+        if self.deadline_kwarg in self.injected_kwarg_names():
+            result[self.deadline_kwarg] = self.deadline
+        
+        for ikey, name in self.get_resource_kwargs().items():
+            result[ikey] = resource_scope.get(self.resource_registry, name)
+        
+        return result
+    
+    def get_resource_kwargs(self):
+        """ Return a dictionary of keyword argument names to resource names. """
+        if isinstance(self.resources, Mapping):
+            return dict(self.resources)
+        return {name: name for name in self.resources}
+    
+    def get_resource_scope(self):
+        """ Return '(scope, owned)' for the current request, as
+            'apitree.resources.get_request_scope'; or '(None, False)' if the
+            view callable uses no resources. """
+        if not self.resources:
+            return None, False
+        return get_request_scope(self.request)
+    
+    def needs_body(self, kwargs_sources):
+        accepted = getattr(self, 'accepted_kwargs', None)
+        if accepted is None:
+            return True
+        
+        missing = set(accepted)
+        for item in kwargs_sources:
+            missing.difference_update(item.keys())
+        
+        return bool(missing)
+    
+    def get_body_decoder(self, content_type):
+        codec = find_codec(self.codecs, parse_media_type(content_type))
+        if codec is not None:
+            return codec.decode_request
+        return self.body_decoders.get(content_type)
+    
+    def get_body_kwargs(self):
+        request = self.request
+        content_type = request.headers.get('content-type', '')
+        decoder = self.get_body_decoder(content_type)
+        limits = self.payload_limits
+        
+        try:
+            if limits is not None:
+                limits.prepare_request(request)
+            
+            with self.phase('decode'):
+                result = decoder(request)
+            
+            if limits is not None:
+                limits.check_shape(result)
+        except PayloadTooLargeError as exc:
+            raise HTTPRequestEntityTooLarge(str(exc))
+        except ContentError as exc:
+            raise HTTPBadRequest(str(exc))
+        
+        return result
+    
+    def encode_result(self, result):
+        """ Encode 'result' with the codec requested by the 'Accept' header.
+            Without a matching codec, 'result' is returned unchanged for the
+            view's renderer to handle. """
+        if not self.codecs or isinstance(result, Response):
+            return result
+        
+        accept = self.request.headers.get('accept', '')
+        codec = negotiate_codec(self.codecs, accept)
+        if codec is None:
+            return result
+        
+        return Response(
+            body=codec.encode(result),
+            content_type=codec.media_type,
+            )
     
     def special_kwargs(self):
         return {}
@@ -81,11 +557,31 @@ class FunctionViewCallable(BaseViewCallable):
     def _call(self, *pargs, **kwargs):
         self._reject_pargs(pargs)
         
-        return self.wrapped(**kwargs)
+        return self.invoke(kwargs)
+    
+    def invoke(self, kwargs):
+        """ Call the wrapped callable, enforcing the deadline of the current
+            request (see 'apitree.deadline.run_with_deadline'). """
+        with self.phase('handler'):
+            return run_with_deadline(
+                self.wrapped,
+                kwargs,
+                self.deadline,
+                self.executor,
+                )
 
 class APIViewCallable(FunctionViewCallable):
     iomanager_class = IOManager
     
+    view_options = FunctionViewCallable.view_options + ['verification']
+    
+    # 'apitree.verification.VerificationPolicy' which decides whether each
+    # call's input and output are verified. By default, all of them are.
+    verification = None
+    
+    # Decorator keyword arguments used to create 'payload_limits'.
+    payload_limit_kwargs = ['max_body_bytes', 'max_list_length', 'max_depth']
+    
     def get_items_from_dict(self, dict_obj, keys, result_keys=None):
         if result_keys is None:
             result_keys = list(keys)
@@ -97,6 +593,20 @@ class APIViewCallable(FunctionViewCallable):
                 continue
         return result
     
+    def get_accepted_kwargs(self):
+        input_processor = self.manager.input_processor
+        if input_processor.unlimited:
+            return None
+        
+        names = set()
+        for iospec in [input_processor.required, input_processor.optional]:
+            if isinstance(iospec, Mapping):
+                names.update(iospec.keys())
+            elif iospec is not NotProvided:
+                return None
+        
+        return frozenset(names)
+    
     def setup(self, kwargs_dict):
         """ Set up view callable.
             
@@ -109,7 +619,10 @@ class APIViewCallable(FunctionViewCallable):
             )
         
         # Lower priority.
-        callable_input_kwargs = iomanager.iospecs_from_callable(self.wrapped)
+        with measure(INTROSPECT, lambda: get_callable_name(self.wrapped)):
+            callable_input_kwargs = iomanager.iospecs_from_callable(
+                self.wrapped
+                )
         
         input_kwargs = iomanager.combine_iospecs(
             decorator_input_kwargs,
@@ -127,30 +640,70 @@ class APIViewCallable(FunctionViewCallable):
             output_kwargs=output_kwargs
             )
         
+        self.payload_limits = self.make_payload_limits(kwargs_dict)
+        
+        special_keys = (
+            ['required', 'optional', 'unlimited', 'returns'] +
+            self.payload_limit_kwargs
+            )
         remaining_kwargs = {
             ikey: ivalue for ikey, ivalue in kwargs_dict.items()
-            if ikey not in ['required', 'optional', 'unlimited', 'returns']
+            if ikey not in special_keys
             }
         
         super().setup(remaining_kwargs)
     
+    def make_payload_limits(self, kwargs_dict):
+        """ Limits come from decorator keyword arguments. When 'max_depth' is
+            not given, it is derived from the input iospecs if they only allow
+            JSON scalars and containers of them. """
+        limit_kwargs = self.get_items_from_dict(
+            kwargs_dict,
+            self.payload_limit_kwargs,
+            )
+        
+        if 'max_depth' not in limit_kwargs:
+            input_processor = self.manager.input_processor
+            limit_kwargs['max_depth'] = input_depth(input_processor)
+        
+        limits = PayloadLimits(**limit_kwargs)
+        if limits.is_empty():
+            return None
+        return limits
+    
     def wrapped_call(self, **kwargs):
-        coerced_kwargs = self.manager.coerce_input(kwargs)
+        with self.phase('coerce_input'):
+            coerced_kwargs = self.manager.coerce_input(kwargs)
         
         result =  self._call(**coerced_kwargs)
         
-        return self.manager.coerce_output(result)
+        with self.phase('coerce_output'):
+            return self.manager.coerce_output(result)
     
     def _call(self, *pargs, **kwargs):
         self._reject_pargs(pargs)
         
-        self.manager.verify_input(iovalue=kwargs)
+        with self.phase('verify_input'):
+            self.verify('input', self.manager.verify_input, kwargs)
         
-        result = self.wrapped(*pargs, **kwargs)
+        result = self.invoke(kwargs)
         
-        self.manager.verify_output(iovalue=result)
+        with self.phase('verify_output'):
+            self.verify('output', self.manager.verify_output, result)
         
         return result
+    
+    def verify(self, direction, verify_method, iovalue):
+        if self.verification is None:
+            verify_method(iovalue=iovalue)
+            return
+        
+        self.verification.verify(
+            direction,
+            verify_method,
+            iovalue,
+            getattr(self, 'request', None),
+            )
 
 
 
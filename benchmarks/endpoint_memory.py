@@ -0,0 +1,86 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+# Compares the memory used by the 'Endpoint' records of
+# 'apitree.tree_scan.iter_endpoints' with the view dictionaries they replace,
+# for API trees of several sizes.
+#
+# Usage: python benchmarks/endpoint_memory.py [route counts...]
+import sys
+import tracemalloc
+
+from apitree import (
+    api_view,
+    GET,
+    POST,
+    PUT,
+    DELETE,
+    )
+from apitree.tree_scan import iter_endpoints
+
+DEFAULT_COUNTS = [1000, 10000, 40000]
+
+@api_view(renderer='json', permission='view')
+def collection_view():
+    pass
+
+@api_view(renderer='json', permission='edit')
+def item_view():
+    pass
+
+def make_api_tree(count):
+    """ Resources with a collection and an item route each, like
+        '/r12/items' and '/r12/items/{id}'. """
+    return {
+        '/r{}'.format(index): {
+            '/items': {
+                GET: collection_view,
+                POST: collection_view,
+                '/{id}': {
+                    GET: item_view,
+                    (PUT, POST): item_view,
+                    DELETE: item_view,
+                    },
+                },
+            }
+        for index in range(count // 2)
+        }
+
+def measure(make_endpoints):
+    """ Return '(bytes, endpoint count)' of the list of endpoints. """
+    tracemalloc.start()
+    try:
+        endpoints = make_endpoints()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return size, len(endpoints)
+
+def run(counts):
+    rows = [('routes', 'endpoints', 'Endpoint (KiB)', 'dict (KiB)', 'ratio')]
+    
+    for count in counts:
+        api_tree = make_api_tree(count)
+        
+        record_size, endpoint_count = measure(lambda: list(
+            iter_endpoints(api_tree)
+            ))
+        dict_size, endpoint_count = measure(lambda: [
+            (route, endpoint.as_dict())
+            for route, endpoint in iter_endpoints(api_tree)
+            ])
+        
+        rows.append((
+            str(count),
+            str(endpoint_count),
+            '{:.0f}'.format(record_size / 1024),
+            '{:.0f}'.format(dict_size / 1024),
+            '{:.2f}'.format(dict_size / record_size),
+            ))
+    
+    widths = [max(len(cell) for cell in column) for column in zip(*rows)]
+    for row in rows:
+        print('  '.join(
+            cell.rjust(width) for cell, width in zip(row, widths)
+            ))
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_COUNTS)
@@ -0,0 +1,76 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+# Compares the route matching time of 'apitree.router.RadixRouter' with
+# Pyramid's route mapper as the number of routes grows.
+#
+# Usage: python benchmarks/router_match.py [route counts...]
+import sys
+import timeit
+
+from pyramid.urldispatch import RoutesMapper
+
+from apitree.router import RadixRouter
+
+DEFAULT_COUNTS = [100, 1000, 4000]
+
+class PathRequest(object):
+    def __init__(self, path_info):
+        self.path_info = path_info
+
+def make_patterns(count):
+    """ Resources with a collection and an item route each, e.g.
+        '/r12/items' and '/r12/items/{id}'. """
+    patterns = []
+    for index in range(count // 2):
+        patterns.append('/r{}/items'.format(index))
+        patterns.append('/r{}/items/{{id}}'.format(index))
+    return patterns
+
+def make_radix_router(patterns):
+    router = RadixRouter()
+    for pattern in patterns:
+        router.add_views(pattern, [{'view': None}])
+    return router
+
+def make_routes_mapper(patterns):
+    mapper = RoutesMapper()
+    for index, pattern in enumerate(patterns):
+        mapper.connect('route{}'.format(index), pattern)
+    return mapper
+
+def time_per_call(function, number):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+def run(counts, number=200):
+    rows = [('routes', 'path', 'radix (us)', 'pyramid (us)')]
+    
+    for count in counts:
+        patterns = make_patterns(count)
+        router = make_radix_router(patterns)
+        mapper = make_routes_mapper(patterns)
+        
+        # The first and last route, so that the linear scan of the route
+        # mapper shows.
+        for path in ['/r0/items/5', '/r{}/items/5'.format(count // 2 - 1)]:
+            request = PathRequest(path)
+            assert router.match(path) is not None
+            assert mapper(request)['route'] is not None
+            
+            rows.append((
+                str(count),
+                path,
+                '{:.2f}'.format(
+                    time_per_call(lambda: router.match(path), number) * 1e6
+                    ),
+                '{:.2f}'.format(
+                    time_per_call(lambda: mapper(request), number) * 1e6
+                    ),
+                ))
+    
+    widths = [max(len(cell) for cell in column) for column in zip(*rows)]
+    for row in rows:
+        print('  '.join(
+            cell.rjust(width) for cell, width in zip(row, widths)
+            ))
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_COUNTS)
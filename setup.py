@@ -17,4 +17,8 @@ setup(
         'mako',
         'pyramid>=1.3.4',
         ],
+    extras_require={
+        'msgpack': ['msgpack'],
+        'cbor': ['cbor2'],
+        },
     )
\ No newline at end of file
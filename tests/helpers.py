@@ -0,0 +1,43 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+class MockRoute(object):
+    def __init__(self, pattern):
+        self.pattern = pattern
+
+class MockRequest(object):
+    def __init__(
+        self,
+        pattern='/items',
+        headers={},
+        params={},
+        method='GET',
+        path='/items/1',
+        ):
+        self.headers = headers.copy()
+        self.GET = {}
+        self.POST = {}
+        self.params = params.copy()
+        self.matchdict = {}
+        self.method = method
+        self.path = path
+        self.environ = {}
+        self.matched_route = MockRoute(pattern)
+
+class MockConfigurator(object):
+    """ Records routes in the order they are added, and views by route name
+        and request method. """
+    
+    def __init__(self):
+        self.views = {}
+        self.routes = []
+    
+    def add_view(self, view, route_name, request_method=None, **kwargs):
+        route_dict = self.views.setdefault(route_name, {})
+        route_dict[request_method] = dict(
+            kwargs,
+            request_method=request_method,
+            view_callable=view,
+            )
+    
+    def add_route(self, name, pattern):
+        self.routes.append(pattern)
@@ -0,0 +1,75 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import time
+import unittest
+
+from apitree import function_view
+from apitree.accounting import CPUAccounting
+from .helpers import (
+    MockConfigurator,
+    MockRequest,
+    )
+
+class TestCPUAccounting(unittest.TestCase):
+    def setUp(self):
+        self.accounting = CPUAccounting()
+        
+        @function_view(cpu_accounting=self.accounting)
+        def sleep_view():
+            time.sleep(0.05)
+            return {}
+        
+        @function_view(cpu_accounting=self.accounting)
+        def busy_view():
+            end = time.thread_time() + 0.05
+            while time.thread_time() < end:
+                pass
+            return {}
+        
+        self.sleep_view = sleep_view
+        self.busy_view = busy_view
+    
+    def get_stats(self):
+        return {
+            item['route']: item for item in self.accounting.get_stats()
+            }
+    
+    def test_io_bound(self):
+        self.sleep_view(MockRequest('/sleep'))
+        
+        stats = self.get_stats()['/sleep']
+        assert stats['calls'] == 1
+        assert stats['wall_seconds'] >= 0.05
+        assert stats['cpu_ratio'] < 0.5
+    
+    def test_cpu_bound(self):
+        self.busy_view(MockRequest('/busy'))
+        
+        stats = self.get_stats()['/busy']
+        assert stats['cpu_seconds'] >= 0.05
+        assert stats['cpu_ratio'] > 0.5
+    
+    def test_aggregated(self):
+        for i in range(2):
+            self.sleep_view(MockRequest('/sleep'))
+        self.busy_view(MockRequest('/busy'))
+        
+        stats = self.accounting.get_stats()
+        assert [item['route'] for item in stats] == ['/busy', '/sleep']
+        assert stats[1]['calls'] == 2
+    
+    def test_clear(self):
+        self.sleep_view(MockRequest('/sleep'))
+        self.accounting.clear()
+        assert self.accounting.get_stats() == []
+    
+    def test_add_views(self):
+        config = MockConfigurator()
+        self.accounting.add_views(config, '/cpu')
+        
+        self.sleep_view(MockRequest('/sleep'))
+        
+        view = config.views['/cpu']['GET']
+        assert view['renderer'] == 'json'
+        result = view['view_callable'](MockRequest('/cpu'))
+        assert result == {'cpu': self.accounting.get_stats()}
@@ -0,0 +1,192 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import threading
+import unittest
+import pytest
+from pyramid.httpexceptions import HTTPServiceUnavailable
+
+from apitree import (
+    simple_view,
+    set_view_options,
+    GET,
+    POST,
+    )
+from apitree.admission import (
+    ConcurrencyLimiter,
+    AdaptiveConcurrencyLimiter,
+    )
+from apitree.exc import AdmissionRejectedError
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    def test_admits_up_to_limit(self):
+        limiter = ConcurrencyLimiter(2)
+        limiter.acquire()
+        limiter.acquire()
+        
+        with pytest.raises(AdmissionRejectedError):
+            limiter.acquire()
+        
+        assert limiter.rejected == 1
+    
+    def test_release(self):
+        limiter = ConcurrencyLimiter(1)
+        with limiter.admit():
+            pass
+        with limiter.admit():
+            pass
+        
+        assert limiter.in_flight == 0
+    
+    def test_retry_after(self):
+        limiter = ConcurrencyLimiter(0, retry_after=5)
+        with pytest.raises(AdmissionRejectedError) as excinfo:
+            limiter.acquire()
+        
+        assert excinfo.value.retry_after == 5
+    
+    def test_queue_timeout(self):
+        limiter = ConcurrencyLimiter(1, max_queue=1, queue_timeout=0.01)
+        limiter.acquire()
+        
+        with pytest.raises(AdmissionRejectedError):
+            limiter.acquire()
+        
+        assert limiter.waiting == 0
+    
+    def test_acquire_timeout(self):
+        """ The 'timeout' argument bounds the wait when 'queue_timeout' is
+            not set. """
+        limiter = ConcurrencyLimiter(1, max_queue=1)
+        limiter.acquire()
+        
+        with pytest.raises(AdmissionRejectedError):
+            limiter.acquire(timeout=0.01)
+        
+        assert limiter.waiting == 0
+    
+    def test_queued_request_admitted(self):
+        """ A queued request is admitted when a running request finishes. """
+        limiter = ConcurrencyLimiter(1, max_queue=1, queue_timeout=5)
+        limiter.acquire()
+        
+        admitted = threading.Event()
+        
+        def queued():
+            limiter.acquire()
+            admitted.set()
+        
+        thread = threading.Thread(target=queued)
+        thread.start()
+        
+        limiter.release(0)
+        thread.join(5)
+        
+        assert admitted.is_set()
+        assert limiter.in_flight == 1
+
+class TestAdaptiveConcurrencyLimiter(unittest.TestCase):
+    def test_slow_requests_decrease_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(10, target_latency=0.1)
+        for i in range(3):
+            limiter.acquire()
+            limiter.release(1.0)
+        
+        assert limiter.limit == 7
+    
+    def test_minimum(self):
+        limiter = AdaptiveConcurrencyLimiter(
+            2,
+            target_latency=0.1,
+            min_in_flight=2,
+            )
+        limiter.acquire()
+        limiter.release(1.0)
+        
+        assert limiter.limit == 2
+    
+    def test_fast_requests_increase_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(10, target_latency=0.1)
+        limiter.limit = 2
+        for i in range(2):
+            limiter.acquire()
+            limiter.release(0.0)
+        
+        assert limiter.limit == 3
+
+class TestViewCallableLimiter(unittest.TestCase):
+    def test_decorator_option(self):
+        """ 'limiter' is a view option, not a Pyramid view keyword argument. """
+        limiter = ConcurrencyLimiter(1)
+        
+        @simple_view(limiter=limiter, predicate='xxx')
+        def view_callable(request):
+            pass
+        
+        assert view_callable.limiter is limiter
+        assert view_callable.view_kwargs == {'predicate': 'xxx'}
+    
+    def test_rejected_request(self):
+        @simple_view(limiter=ConcurrencyLimiter(0, retry_after=3))
+        def view_callable(request):
+            pass
+        
+        with pytest.raises(HTTPServiceUnavailable) as excinfo:
+            view_callable(object())
+        
+        assert excinfo.value.headers['Retry-After'] == '3'
+    
+    def test_in_flight_during_call(self):
+        limiter = ConcurrencyLimiter(1)
+        
+        @simple_view(limiter=limiter)
+        def view_callable(request):
+            return limiter.in_flight
+        
+        assert view_callable(object()) == 1
+        assert limiter.in_flight == 0
+
+class TestSetViewOptions(unittest.TestCase):
+    def make_view_callable(self, **kwargs):
+        @simple_view(**kwargs)
+        def view_callable(request):
+            pass
+        
+        return view_callable
+    
+    def test_subtree_shares_limiter(self):
+        view_a = self.make_view_callable()
+        view_b = self.make_view_callable()
+        limiter = ConcurrencyLimiter(1)
+        
+        set_view_options({'/a': {GET: view_a, POST: view_b}}, limiter=limiter)
+        
+        assert view_a.limiter is limiter
+        assert view_b.limiter is limiter
+    
+    def test_view_option_kept(self):
+        expected = ConcurrencyLimiter(1)
+        view_callable = self.make_view_callable(limiter=expected)
+        
+        set_view_options({'/a': view_callable}, limiter=ConcurrencyLimiter(1))
+        
+        assert view_callable.limiter is expected
+    
+    def test_unknown_option_raises(self):
+        """ Nothing is set if an option is unknown. """
+        view_callable = self.make_view_callable()
+        with pytest.raises(TypeError):
+            set_view_options(
+                {'/a': view_callable},
+                limiter=ConcurrencyLimiter(1),
+                xxx=None,
+                )
+        
+        assert 'limiter' not in vars(view_callable)
+    
+    def test_plain_callable_skipped(self):
+        def view_callable(request):
+            pass
+        
+        set_view_options({'/a': view_callable}, limiter=ConcurrencyLimiter(1))
+        
+        assert not hasattr(view_callable, 'limiter')
@@ -13,6 +13,10 @@ from apitree import (
     GET,
     POST,
     )
+from apitree.content import (
+    MessagePackCodec,
+    CBORCodec,
+    )
 from apitree.api_documentation import (
     APIDocumentationMaker,
     PreparationFailureError,
@@ -133,6 +137,55 @@ class TestCreateDocumentationViewAttributes(unittest.TestCase):
     def test_all(self):
         self.view_test('required', 'optional', 'unlimited', 'returns')
 
+class TestCreateDocumentationContentTypes(unittest.TestCase):
+    """ Media types supported by a view callable's codecs are listed under
+        'content_types'. """
+    
+    def documentation_test(self, codecs):
+        class CustomViewCallable(APIViewCallable):
+            pass
+        
+        CustomViewCallable.codecs = codecs
+        
+        @CustomViewCallable
+        def view_callable():
+            pass
+        
+        api_tree = {'/': {GET: view_callable}}
+        
+        documentation = APIDocumentationMaker().create_documentation(api_tree)
+        
+        return documentation['/']['GET']
+    
+    def test_content_types(self):
+        view_dict = self.documentation_test((MessagePackCodec(), CBORCodec()))
+        expected = 'application/msgpack, application/cbor'
+        assert view_dict['content_types'] == expected
+    
+    def test_no_codecs(self):
+        view_dict = self.documentation_test(())
+        assert 'content_types' not in view_dict
+
+class TestCreateEndpointModel(unittest.TestCase):
+    """ 'create_endpoint_model' returns unprepared iospecs. """
+    
+    def test_raw_iospecs(self):
+        @APIViewCallable(required={'a': int}, optional={'b': [str]})
+        def view_callable(a, b=None):
+            """ Description. """
+        
+        api_tree = {'/': {GET: view_callable}}
+        
+        model = APIDocumentationMaker().create_endpoint_model(api_tree)
+        
+        endpoint = model['/']['GET']
+        assert endpoint['view'] is view_callable
+        assert endpoint['request_methods'] == ['GET']
+        assert endpoint['description'] == ' Description. '
+        assert endpoint['required'] == {'a': int}
+        assert endpoint['optional'] == {'b': [str]}
+        assert endpoint['unlimited'] is False
+
 class TestCreateDocumentationSkipSpecialKeys(unittest.TestCase):
     """ 'create_documentation' filters out 'special_kwargs' keys from 'required'
         and 'optional'.
@@ -164,6 +217,17 @@ class TestCreateDocumentationSkipSpecialKeys(unittest.TestCase):
         
         assert view_dict == {}
     
+    def test_skip_deadline(self):
+        @api_view
+        def view_callable(deadline):
+            pass
+        
+        api_tree = {'/': {GET: view_callable}}
+        
+        documentation = APIDocumentationMaker().create_documentation(api_tree)
+        
+        assert 'required' not in documentation['/']['GET']
+    
     def test_skip_keys_required(self):
         self.skip_keys_test('required')
     
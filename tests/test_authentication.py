@@ -0,0 +1,180 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import threading
+import unittest
+import pytest
+from pyramid.httpexceptions import HTTPUnauthorized
+
+from apitree import (
+    simple_view,
+    Authenticator,
+    CachedAuthenticator,
+    get_principal,
+    )
+from apitree.exc import AuthenticationError
+from apitree.util import TTLCache
+
+class MockRequest(object):
+    def __init__(self, token=None):
+        self.headers = {}
+        if token is not None:
+            self.headers['Authorization'] = token
+
+class CountingAuthenticator(Authenticator):
+    """ Accepts tokens starting with 'valid-'; the principal is the rest of
+        the token. """
+    def __init__(self):
+        self.verify_count = 0
+    
+    def verify(self, credentials):
+        self.verify_count += 1
+        if not credentials.startswith('valid-'):
+            raise AuthenticationError('Invalid token.')
+        return credentials[len('valid-'):]
+
+class MockTimer(object):
+    def __init__(self):
+        self.now = 0
+    
+    def __call__(self):
+        return self.now
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.timer = MockTimer()
+        self.cache = TTLCache(2, 10, timer=self.timer)
+    
+    def test_expiry(self):
+        self.cache.set('a', 1)
+        self.timer.now = 9
+        assert self.cache.get('a') == 1
+        self.timer.now = 10
+        assert self.cache.get('a') is None
+    
+    def test_bounded(self):
+        """ The least recently used entry is evicted. """
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        
+        assert len(self.cache) == 2
+        assert self.cache.get('b') is None
+        assert self.cache.get('a') == 1
+
+class TestCachedAuthenticator(unittest.TestCase):
+    def setUp(self):
+        self.inner = CountingAuthenticator()
+        self.authenticator = CachedAuthenticator(self.inner)
+        self.timer = MockTimer()
+        self.authenticator.cache.timer = self.timer
+    
+    def authenticate(self, token):
+        return self.authenticator.authenticate(MockRequest(token))
+    
+    def test_cached(self):
+        assert self.authenticate('valid-a') == 'a'
+        assert self.authenticate('valid-a') == 'a'
+        assert self.inner.verify_count == 1
+    
+    def test_ttl(self):
+        self.authenticate('valid-a')
+        self.timer.now = 60
+        self.authenticate('valid-a')
+        assert self.inner.verify_count == 2
+    
+    def test_negative_cache(self):
+        for i in range(2):
+            with pytest.raises(AuthenticationError):
+                self.authenticate('bad')
+        assert self.inner.verify_count == 1
+        
+        self.timer.now = 5
+        with pytest.raises(AuthenticationError):
+            self.authenticate('bad')
+        assert self.inner.verify_count == 2
+    
+    def test_no_negative_cache(self):
+        self.authenticator.negative_ttl = 0
+        for i in range(2):
+            with pytest.raises(AuthenticationError):
+                self.authenticate('bad')
+        assert self.inner.verify_count == 2
+    
+    def test_token_not_stored(self):
+        self.authenticate('valid-a')
+        assert 'valid-a' not in self.authenticator.cache.entries
+    
+    def test_anonymous(self):
+        assert self.authenticate(None) is None
+        assert self.inner.verify_count == 0
+    
+    def test_invalidate(self):
+        self.authenticate('valid-a')
+        self.authenticator.invalidate('valid-a')
+        self.authenticate('valid-a')
+        assert self.inner.verify_count == 2
+    
+    def test_invalidate_principal(self):
+        self.authenticate('valid-a')
+        self.authenticate('valid-b')
+        self.authenticator.invalidate_principal(lambda item: item == 'a')
+        self.authenticate('valid-a')
+        self.authenticate('valid-b')
+        assert self.inner.verify_count == 3
+
+class TestViewCallableAuthenticator(unittest.TestCase):
+    def make_view_callable(self):
+        @simple_view(authenticator=CachedAuthenticator(CountingAuthenticator()))
+        def view_callable(request):
+            return view_callable.principal
+        
+        return view_callable
+    
+    def test_principal(self):
+        view_callable = self.make_view_callable()
+        assert view_callable(MockRequest('valid-a')) == 'a'
+    
+    def test_principal_on_request(self):
+        view_callable = self.make_view_callable()
+        request = MockRequest('valid-a')
+        view_callable(request)
+        
+        assert get_principal(request) == 'a'
+    
+    def test_concurrent_requests(self):
+        """ A request does not see the principal of a concurrent request to
+            the same view callable. """
+        alice_authenticated = threading.Event()
+        bob_authenticated = threading.Event()
+        
+        @simple_view(authenticator=CountingAuthenticator())
+        def view_callable(request):
+            if view_callable.principal == 'alice':
+                alice_authenticated.set()
+                bob_authenticated.wait(5)
+            else:
+                bob_authenticated.set()
+            return view_callable.principal
+        
+        results = {}
+        
+        def call(name):
+            results[name] = view_callable(MockRequest('valid-' + name))
+        
+        alice = threading.Thread(target=call, args=['alice'])
+        alice.start()
+        alice_authenticated.wait(5)
+        call('bob')
+        alice.join()
+        
+        assert results == {'alice': 'alice', 'bob': 'bob'}
+    
+    def test_invalid_credentials(self):
+        view_callable = self.make_view_callable()
+        with pytest.raises(HTTPUnauthorized):
+            view_callable(MockRequest('bad'))
+    
+    def test_option_not_in_view_kwargs(self):
+        view_callable = self.make_view_callable()
+        assert view_callable.view_kwargs == {}
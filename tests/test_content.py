@@ -0,0 +1,295 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import gzip
+import unittest
+import pytest
+
+from apitree.content import (
+    DEFAULT_MAX_DECOMPRESSED_BYTES,
+    MAX_BODY_BYTES_ENVIRON_KEY,
+    MAX_DEPTH_ENVIRON_KEY,
+    NDJSON_RECORDS_KEY,
+    Codec,
+    MessagePackCodec,
+    CBORCodec,
+    check_json_depth,
+    decode_json,
+    decode_ndjson,
+    default_body_decoders,
+    find_codec,
+    negotiate_codec,
+    parse_accept,
+    parse_media_type,
+    read_body,
+    )
+from apitree.exc import (
+    DecodingError,
+    MissingDependencyError,
+    PayloadShapeError,
+    PayloadTooLargeError,
+    )
+
+class TestParseMediaType(unittest.TestCase):
+    def test_parameters_removed(self):
+        result = parse_media_type('Application/MsgPack; charset=utf-8')
+        assert result == 'application/msgpack'
+    
+    def test_empty(self):
+        assert parse_media_type('') == ''
+
+class TestParseAccept(unittest.TestCase):
+    def test_client_order_kept(self):
+        result = parse_accept('application/cbor, application/msgpack')
+        assert result == ['application/cbor', 'application/msgpack']
+    
+    def test_quality_order(self):
+        result = parse_accept('application/cbor;q=0.5, application/msgpack')
+        assert result == ['application/msgpack', 'application/cbor']
+    
+    def test_zero_quality_excluded(self):
+        result = parse_accept('application/cbor;q=0, application/msgpack')
+        assert result == ['application/msgpack']
+
+class UnavailableCodec(Codec):
+    media_types = ('application/x-unavailable', )
+    dependency_name = 'unavailable'
+
+class CodecTest(object):
+    """ Confirm that each codec can round-trip a dictionary of keyword
+        arguments. """
+    
+    def setUp(self):
+        pytest.importorskip(self.codec_class.dependency_name)
+        self.codec = self.codec_class()
+    
+    def test_round_trip(self):
+        value = {'a': 1, 'b': ['x', 2.5], 'c': {'d': None}}
+        assert self.codec.decode(self.codec.encode(value)) == value
+    
+    def test_invalid_body_raises(self):
+        with pytest.raises(DecodingError):
+            self.codec.decode(b'\xc1')
+    
+    def test_not_mapping_raises(self):
+        with pytest.raises(DecodingError):
+            self.codec.decode(self.codec.encode([1, 2]))
+
+class TestMessagePackCodec(CodecTest, unittest.TestCase):
+    codec_class = MessagePackCodec
+
+class TestCBORCodec(CodecTest, unittest.TestCase):
+    codec_class = CBORCodec
+
+class TestCodecSelection(unittest.TestCase):
+    def test_find_codec(self):
+        pytest.importorskip('msgpack')
+        codec = MessagePackCodec()
+        assert find_codec([codec], 'application/x-msgpack') is codec
+    
+    def test_find_codec_missing(self):
+        assert find_codec([MessagePackCodec()], 'application/json') is None
+    
+    def test_unavailable_codec_skipped(self):
+        codec = UnavailableCodec()
+        assert find_codec([codec], 'application/x-unavailable') is None
+    
+    def test_unavailable_codec_raises(self):
+        with pytest.raises(MissingDependencyError):
+            UnavailableCodec().encode({})
+    
+    def test_negotiate_codec(self):
+        msgpack_codec = MessagePackCodec()
+        cbor_codec = CBORCodec()
+        if not cbor_codec.is_available():
+            pytest.skip('cbor2 is not installed.')
+        
+        result = negotiate_codec(
+            [msgpack_codec, cbor_codec],
+            'application/cbor, application/msgpack;q=0.9',
+            )
+        assert result is cbor_codec
+    
+    def test_negotiate_wildcard(self):
+        assert negotiate_codec([MessagePackCodec()], '*/*') is None
+    
+    def test_negotiate_preferred_without_codec(self):
+        """ A less preferred media type with a codec is not chosen over a
+            preferred one without a codec. """
+        codecs = [MessagePackCodec(), CBORCodec()]
+        
+        assert negotiate_codec(
+            codecs,
+            'application/json, application/cbor;q=0.1',
+            ) is None
+        assert negotiate_codec(
+            codecs,
+            '*/*;q=0.5, application/msgpack;q=0.1',
+            ) is None
+
+class MockRequest(object):
+    def __init__(self, headers={}, body=b'', json_body=None, POST={}):
+        self.headers = headers
+        self.body = body
+        self.POST = POST
+        if json_body is not None:
+            self.json_body = json_body
+
+class TestBodyDecoders(unittest.TestCase):
+    def decode_test(self, content_type, body, expected, **headers):
+        headers['content-type'] = content_type
+        request = MockRequest(headers=headers, body=body)
+        decoder = default_body_decoders.get(content_type)
+        assert decoder(request) == expected
+    
+    def test_json_with_parameters(self):
+        """ 'Content-Type' parameters do not affect decoder selection. """
+        request = MockRequest(json_body={'a': 1})
+        decoder = default_body_decoders.get('Application/JSON; charset=utf-8')
+        assert decoder(request) == {'a': 1}
+    
+    def test_gzip_json(self):
+        self.decode_test(
+            'application/json',
+            gzip.compress(b'{"a": 1}'),
+            {'a': 1},
+            **{'content-encoding': 'gzip'}
+            )
+    
+    def test_ndjson(self):
+        self.decode_test(
+            'application/x-ndjson',
+            b'{"a": 1}\n\n{"a": 2}\n',
+            {NDJSON_RECORDS_KEY: [{'a': 1}, {'a': 2}]},
+            )
+    
+    def test_gzip_ndjson(self):
+        self.decode_test(
+            'application/x-ndjson',
+            gzip.compress(b'{"a": 1}\n'),
+            {NDJSON_RECORDS_KEY: [{'a': 1}]},
+            **{'content-encoding': 'gzip'}
+            )
+    
+    def test_form_default(self):
+        """ Unregistered media types fall back to form parsing. """
+        expected = {'a': '1'}
+        request = MockRequest(POST=expected)
+        decoder = default_body_decoders.get('xxx')
+        assert decoder(request) is expected
+    
+    def test_gzip_form(self):
+        request = MockRequest(
+            headers={
+                'content-type': 'application/x-www-form-urlencoded',
+                'content-encoding': 'gzip',
+                },
+            body=gzip.compress(b'a=1&b=x+y'),
+            POST={'\x1f\x8b': ''},
+            )
+        decoder = default_body_decoders.get('application/x-www-form-urlencoded')
+        assert dict(decoder(request)) == {'a': '1', 'b': 'x y'}
+    
+    def test_invalid_gzip_raises(self):
+        request = MockRequest(
+            headers={'content-encoding': 'gzip'},
+            body=b'not gzip',
+            )
+        with pytest.raises(DecodingError):
+            read_body(request)
+    
+    def test_decompression_limit(self):
+        request = MockRequest(
+            headers={'content-encoding': 'gzip'},
+            body=gzip.compress(b'x' * 1000),
+            )
+        request.environ = {MAX_BODY_BYTES_ENVIRON_KEY: 999}
+        
+        with pytest.raises(PayloadTooLargeError):
+            read_body(request)
+    
+    def test_default_decompression_limit(self):
+        """ Without 'max_body_bytes', decompression is still limited. """
+        request = MockRequest(
+            headers={'content-encoding': 'gzip'},
+            body=gzip.compress(b'x' * (DEFAULT_MAX_DECOMPRESSED_BYTES + 1)),
+            )
+        
+        with pytest.raises(PayloadTooLargeError):
+            read_body(request)
+    
+    def test_truncated_gzip_raises(self):
+        request = MockRequest(
+            headers={'content-encoding': 'gzip'},
+            body=gzip.compress(b'x' * 1000)[:-10],
+            )
+        with pytest.raises(DecodingError):
+            read_body(request)
+    
+    def test_unsupported_encoding_raises(self):
+        request = MockRequest(headers={'content-encoding': 'br'})
+        with pytest.raises(DecodingError):
+            read_body(request)
+    
+    def test_json_not_mapping_raises(self):
+        request = MockRequest(json_body=[1, 2])
+        with pytest.raises(DecodingError):
+            decode_json(request)
+
+class TestJSONDepth(unittest.TestCase):
+    def make_request(self, body, max_depth, **headers):
+        request = MockRequest(headers=headers, body=body)
+        request.environ = {MAX_DEPTH_ENVIRON_KEY: max_depth}
+        return request
+    
+    def test_check_json_depth(self):
+        check_json_depth(b'{"a": [1, {"b": 2}]}', 3)
+        with pytest.raises(PayloadShapeError):
+            check_json_depth(b'{"a": [1, {"b": 2}]}', 2)
+    
+    def test_brackets_in_strings(self):
+        check_json_depth(b'{"a": "[[[{{{", "b": "\\"[[["}', 1)
+    
+    def test_checked_before_parsing(self):
+        """ Deeply nested bodies are rejected without exhausting the stack. """
+        body = b'[' * 200000 + b']' * 200000
+        
+        with pytest.raises(PayloadShapeError):
+            decode_json(self.make_request(body, 1))
+        with pytest.raises(PayloadShapeError):
+            decode_ndjson(self.make_request(body, 3))
+    
+    def test_recursion_error(self):
+        """ Without a depth limit, a body too deep to parse is invalid. """
+        body = gzip.compress(b'[' * 200000 + b']' * 200000)
+        request = MockRequest(
+            headers={'content-encoding': 'gzip'},
+            body=body,
+            )
+        
+        with pytest.raises(DecodingError):
+            decode_json(request)
+    
+    def test_ndjson_records(self):
+        request = self.make_request(b'{"a": [1]}\n{"b": 2}\n', 4)
+        assert decode_ndjson(request) == {
+            NDJSON_RECORDS_KEY: [{'a': [1]}, {'b': 2}],
+            }
+        
+        with pytest.raises(PayloadShapeError):
+            decode_ndjson(self.make_request(b'{"a": [1]}\n', 3))
+
+class TestBodyDecoderRegistry(unittest.TestCase):
+    def test_register(self):
+        def decoder(request):
+            pass
+        
+        registry = default_body_decoders.copy()
+        registry.register('Application/X-Custom', decoder)
+        
+        assert registry.get('application/x-custom; a=b') is decoder
+    
+    def test_copy_does_not_mutate(self):
+        registry = default_body_decoders.copy()
+        registry.register('application/x-custom', None)
+        
+        assert 'application/x-custom' not in default_body_decoders.decoders
@@ -0,0 +1,108 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import asyncio
+import threading
+import time
+import unittest
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from apitree.deadline import (
+    Deadline,
+    parse_timeout,
+    run_with_deadline,
+    )
+from apitree.exc import DeadlineExceededError
+
+class TestParseTimeout(unittest.TestCase):
+    def test_valid(self):
+        assert parse_timeout('1.5') == 1.5
+    
+    def test_missing(self):
+        assert parse_timeout(None) is None
+    
+    def test_invalid(self):
+        for value in ['xxx', '-1', 'nan', 'inf']:
+            assert parse_timeout(value) is None
+
+class TestDeadline(unittest.TestCase):
+    def test_expired(self):
+        deadline = Deadline(0)
+        assert deadline.expired()
+        assert deadline.remaining() == 0
+        with pytest.raises(DeadlineExceededError):
+            deadline.check()
+    
+    def test_not_expired(self):
+        deadline = Deadline(60)
+        assert not deadline.expired()
+        assert 0 < deadline.remaining() <= 60
+
+class TestRunWithDeadline(unittest.TestCase):
+    def test_no_deadline(self):
+        def func(a):
+            return a
+        
+        assert run_with_deadline(func, {'a': 1}) == 1
+    
+    def test_expired_not_called(self):
+        def func():
+            raise AssertionError('Called after deadline.')
+        
+        with pytest.raises(DeadlineExceededError):
+            run_with_deadline(func, {}, Deadline(0))
+    
+    def test_late_result_without_executor(self):
+        def func():
+            time.sleep(0.1)
+        
+        with pytest.raises(DeadlineExceededError):
+            run_with_deadline(func, {}, Deadline(0.01))
+    
+    def test_executor_abandoned(self):
+        release = threading.Event()
+        
+        def func():
+            release.wait(5)
+        
+        executor = ThreadPoolExecutor(1)
+        try:
+            with pytest.raises(DeadlineExceededError):
+                run_with_deadline(func, {}, Deadline(0.05), executor)
+        finally:
+            release.set()
+            executor.shutdown()
+    
+    def test_executor_result(self):
+        def func(a):
+            return a
+        
+        executor = ThreadPoolExecutor(1)
+        try:
+            result = run_with_deadline(func, {'a': 1}, Deadline(5), executor)
+        finally:
+            executor.shutdown()
+        
+        assert result == 1
+    
+    def test_coroutine_result(self):
+        async def func(a):
+            return a
+        
+        assert run_with_deadline(func, {'a': 1}) == 1
+        assert run_with_deadline(func, {'a': 1}, Deadline(5)) == 1
+    
+    def test_coroutine_cancelled(self):
+        cancelled = []
+        
+        async def func():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        
+        with pytest.raises(DeadlineExceededError):
+            run_with_deadline(func, {}, Deadline(0.05))
+        
+        assert cancelled
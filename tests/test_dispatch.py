@@ -0,0 +1,151 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import unittest
+import pytest
+from pyramid.config import Configurator
+from pyramid.exceptions import PredicateMismatch
+from webob import Request
+
+from apitree import (
+    add_catchall,
+    scan_api_tree,
+    simple_view,
+    GET,
+    POST,
+    )
+from apitree.dispatch import (
+    MethodDispatcher,
+    make_catchall_predicate,
+    get_dispatchers,
+    )
+from apitree.exc import APITreeError
+
+class MockRequest(object):
+    def __init__(self, method='GET'):
+        self.method = method
+        self.environ = {}
+
+def make_view(name):
+    return lambda request: name
+
+class TestMethodDispatcher(unittest.TestCase):
+    def test_request_method(self):
+        dispatcher = MethodDispatcher('/items')
+        dispatcher.add_view({'view': make_view('get'), 'request_method': 'get'})
+        dispatcher.add_view(
+            {'view': make_view('post'), 'request_method': 'POST'}
+            )
+        
+        assert dispatcher(MockRequest('GET')) == 'get'
+        assert dispatcher(MockRequest('POST')) == 'post'
+        with pytest.raises(PredicateMismatch):
+            dispatcher(MockRequest('DELETE'))
+    
+    def test_head(self):
+        """ 'GET' views also handle 'HEAD' requests. """
+        dispatcher = MethodDispatcher('/items')
+        dispatcher.add_view({'view': make_view('get'), 'request_method': 'GET'})
+        
+        assert dispatcher(MockRequest('HEAD')) == 'get'
+    
+    def test_any_request_method(self):
+        """ Views with a request method take priority over views without. """
+        dispatcher = MethodDispatcher('/items')
+        dispatcher.add_view({'view': make_view('any')})
+        dispatcher.add_view({'view': make_view('get'), 'request_method': 'GET'})
+        
+        assert dispatcher(MockRequest('GET')) == 'get'
+        assert dispatcher(MockRequest('DELETE')) == 'any'
+    
+    def test_table(self):
+        """ Entries end with the first view which has no predicates to call.
+            Predicates of 'make_catchall_predicate' are not called. """
+        dispatcher = MethodDispatcher('/items')
+        dispatcher.add_view({'view': make_view('get'), 'request_method': 'GET'})
+        dispatcher.add_view({
+            'view': make_view('catchall'),
+            'request_method': ('GET', ),
+            'custom_predicates': (make_catchall_predicate(), ),
+            })
+        
+        assert dispatcher.table['GET'] == (
+            ((), dispatcher.candidates[0][2]),
+            )
+        assert dispatcher(MockRequest('GET')) == 'catchall'
+    
+    def test_custom_predicates(self):
+        calls = []
+        
+        def predicate(context, request):
+            calls.append(request)
+            return request.environ.get('x')
+        
+        dispatcher = MethodDispatcher('/items')
+        dispatcher.add_view({'view': make_view('get'), 'request_method': 'GET'})
+        dispatcher.add_view({
+            'view': make_view('custom'),
+            'custom_predicates': (predicate, ),
+            })
+        
+        assert dispatcher(MockRequest('GET')) == 'get'
+        
+        request = MockRequest('GET')
+        request.environ['x'] = True
+        assert dispatcher(request) == 'custom'
+        assert len(calls) == 2
+    
+    def test_unsupported_view_kwarg(self):
+        dispatcher = MethodDispatcher('/items')
+        with pytest.raises(APITreeError):
+            dispatcher.add_view({'view': None, 'permission': 'x'})
+
+class TestScanAPITreeDispatch(unittest.TestCase):
+    def setUp(self):
+        @simple_view(renderer='string')
+        def get_items(request):
+            return 'get'
+        
+        @simple_view(renderer='string')
+        def create_item(request):
+            return 'post'
+        
+        self.api_tree = {
+            '/items': {
+                GET: get_items,
+                POST: create_item,
+                },
+            }
+        self.config = Configurator()
+        scan_api_tree(self.config, self.api_tree, dispatch=True)
+    
+    def get_response(self, method):
+        app = self.config.make_wsgi_app()
+        return Request.blank('/items', method=method).get_response(app)
+    
+    def test_dispatch(self):
+        assert list(get_dispatchers(self.config)) == ['/items']
+        assert self.get_response('GET').text == 'get'
+        assert self.get_response('POST').text == 'post'
+        assert self.get_response('PUT').status_int == 404
+    
+    def test_head(self):
+        response = self.get_response('HEAD')
+        assert response.status_int == 200
+        assert response.body == b''
+    
+    def test_catchall(self):
+        @simple_view(renderer='string')
+        def catchall(request):
+            return 'catchall'
+        
+        add_catchall(
+            self.config,
+            self.api_tree,
+            catchall,
+            target_request_method='POST',
+            )
+        
+        dispatcher = get_dispatchers(self.config)['/items']
+        assert len(dispatcher.candidates) == 3
+        assert self.get_response('GET').text == 'get'
+        assert self.get_response('POST').text == 'catchall'
@@ -0,0 +1,128 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import threading
+import time
+import unittest
+from pyramid.config import Configurator
+from webob import Request
+
+from apitree import (
+    api_view,
+    simple_view,
+    scan_api_tree,
+    APIDocumentationMaker,
+    LazySubtree,
+    GET,
+    )
+from apitree.router import mount_api_tree
+from apitree.util import get_route_pattern
+
+@api_view(required={'id': str}, renderer='json')
+def get_report(id):
+    return {'id': id}
+
+@simple_view(renderer='json')
+def get_reports(request):
+    return {
+        'pattern': get_route_pattern(request),
+        'matchdict': request.matchdict,
+        }
+
+LAZY_TREE = {
+    GET: get_reports,
+    '/{id}': {GET: get_report},
+    }
+
+class TestLazySubtree(unittest.TestCase):
+    def setUp(self):
+        self.loads = 0
+    
+    def load(self):
+        self.loads += 1
+        return LAZY_TREE
+    
+    def make_app(self, api_tree, mount=scan_api_tree):
+        config = Configurator()
+        mount(config, api_tree)
+        return config.make_wsgi_app()
+    
+    def get_json(self, app, path):
+        response = Request.blank(path).get_response(app)
+        assert response.status_int == 200
+        return response.json
+    
+    def test_loaded_on_first_request(self):
+        lazy = LazySubtree(self.load)
+        app = self.make_app({'/reports': lazy})
+        
+        assert not lazy.loaded
+        assert self.loads == 0
+        
+        assert self.get_json(app, '/reports/5') == {'id': '5'}
+        assert self.get_json(app, '/reports/6') == {'id': '6'}
+        assert self.loads == 1
+    
+    def test_prefix(self):
+        """ The prefix itself and the patterns below it are routed. """
+        lazy = LazySubtree(self.load)
+        app = self.make_app({'/tenants/{tenant}/reports': lazy})
+        
+        assert self.get_json(app, '/tenants/a/reports') == {
+            'pattern': '/tenants/{tenant}/reports',
+            'matchdict': {'tenant': 'a'},
+            }
+        assert self.get_json(app, '/tenants/a/reports/') == {
+            'pattern': '/tenants/{tenant}/reports',
+            'matchdict': {'tenant': 'a'},
+            }
+    
+    def test_not_found(self):
+        app = self.make_app({'/reports': LazySubtree(self.load)})
+        
+        response = Request.blank('/reports/5/x').get_response(app)
+        assert response.status_int == 404
+    
+    def test_dotted_name(self):
+        app = self.make_app({
+            '/reports': LazySubtree('tests.test_lazy:LAZY_TREE'),
+            })
+        
+        assert self.get_json(app, '/reports/5') == {'id': '5'}
+    
+    def test_radix_router(self):
+        app = self.make_app(
+            {'/reports': LazySubtree(self.load)},
+            mount=mount_api_tree,
+            )
+        
+        assert self.get_json(app, '/reports/5') == {'id': '5'}
+        assert self.get_json(app, '/reports')['pattern'] == '/reports'
+    
+    def test_one_time_initialization(self):
+        def slow_load():
+            time.sleep(0.05)
+            return self.load()
+        
+        lazy = LazySubtree(slow_load)
+        routers = []
+        threads = [
+            threading.Thread(target=lambda: routers.append(lazy.get_router()))
+            for i in range(8)
+            ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert self.loads == 1
+        assert all(router is routers[0] for router in routers)
+    
+    def test_documentation(self):
+        """ Lazy subtrees are not documented (or loaded). """
+        lazy = LazySubtree(self.load)
+        documentation = APIDocumentationMaker().create_documentation(
+            {'/reports': lazy, '/other': {GET: get_report}}
+            )
+        
+        assert list(documentation) == ['/other']
+        assert not lazy.loaded
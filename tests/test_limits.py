@@ -0,0 +1,109 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import io
+import unittest
+import pytest
+
+from iomanager import IOManager, ListOf
+from apitree.content import (
+    MAX_BODY_BYTES_ENVIRON_KEY,
+    MAX_DEPTH_ENVIRON_KEY,
+    )
+from apitree.exc import (
+    PayloadTooLargeError,
+    PayloadShapeError,
+    )
+from apitree.limits import (
+    PayloadLimits,
+    input_depth,
+    iospec_depth,
+    )
+
+class MockRequest(object):
+    def __init__(self, headers={}, body=b''):
+        self.headers = headers
+        self.body = body
+        self.body_file = io.BytesIO(body)
+        self.environ = {}
+
+class TestIospecDepth(unittest.TestCase):
+    def test_scalar(self):
+        assert iospec_depth(int) == 0
+    
+    def test_listof(self):
+        assert iospec_depth(ListOf(int)) == 1
+    
+    def test_nested(self):
+        assert iospec_depth({'a': [ListOf({'b': str})]}) == 4
+    
+    def test_unknown_type(self):
+        """ Values of non-scalar types may be coerced from containers of any
+            depth. """
+        assert iospec_depth({'a': object}) is None
+    
+    def input_depth_test(self, expected, **input_kwargs):
+        manager = IOManager(input_kwargs=input_kwargs)
+        assert input_depth(manager.input_processor) == expected
+    
+    def test_input_depth(self):
+        self.input_depth_test(2, required={'a': int}, optional={'b': [int]})
+    
+    def test_input_depth_unlimited(self):
+        self.input_depth_test(None, required={'a': int}, unlimited=True)
+
+class TestPayloadLimitsBodySize(unittest.TestCase):
+    def test_content_length(self):
+        """ 'Content-Length' is used without reading the body. """
+        request = MockRequest(headers={'content-length': '11'})
+        with pytest.raises(PayloadTooLargeError):
+            PayloadLimits(max_body_bytes=10).check_body_size(request)
+    
+    def test_body_length(self):
+        """ Without 'Content-Length', no more of the body is read than is
+            needed to tell that it is too large. """
+        request = MockRequest(body=b'x' * 1000)
+        with pytest.raises(PayloadTooLargeError):
+            PayloadLimits(max_body_bytes=10).check_body_size(request)
+        
+        assert request.body_file.tell() == 11
+    
+    def test_passes(self):
+        request = MockRequest(body=b'x' * 10)
+        PayloadLimits(max_body_bytes=10).check_body_size(request)
+        
+        assert request.environ[MAX_BODY_BYTES_ENVIRON_KEY] == 10
+        assert request.body == b'x' * 10
+    
+    def test_prepare_request(self):
+        request = MockRequest(headers={'content-length': '2'})
+        PayloadLimits(max_depth=3).prepare_request(request)
+        
+        assert request.environ[MAX_DEPTH_ENVIRON_KEY] == 3
+
+class TestPayloadLimitsShape(unittest.TestCase):
+    def test_depth_passes(self):
+        PayloadLimits(max_depth=3).check_shape({'a': [{'b': 1}]})
+    
+    def test_depth_raises(self):
+        with pytest.raises(PayloadShapeError):
+            PayloadLimits(max_depth=2).check_shape({'a': [{'b': 1}]})
+    
+    def test_list_length_raises(self):
+        with pytest.raises(PayloadShapeError):
+            PayloadLimits(max_list_length=2).check_shape({'a': [1, 2, 3]})
+    
+    def test_nested_list_length_raises(self):
+        with pytest.raises(PayloadShapeError):
+            PayloadLimits(max_list_length=2).check_shape({'a': [[1, 2, 3]]})
+    
+    def test_strings_not_lists(self):
+        PayloadLimits(max_list_length=2).check_shape({'a': 'xyz'})
+    
+    def test_very_deep(self):
+        """ Deep payloads do not hit the recursion limit. """
+        value = {}
+        for i in range(10000):
+            value = {'a': value}
+        
+        with pytest.raises(PayloadShapeError):
+            PayloadLimits(max_depth=100).check_shape(value)
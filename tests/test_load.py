@@ -0,0 +1,150 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import json
+import random
+import unittest
+import pytest
+from iomanager import ListOf
+from pyramid.config import Configurator
+
+from apitree import (
+    api_view,
+    scan_api_tree,
+    GET,
+    POST,
+    )
+from apitree.load import (
+    LoadGenerator,
+    percentile,
+    )
+from apitree.payloads import PayloadSizes
+
+@api_view(required={'id': str}, renderer='json')
+def get_item(id):
+    return {'id': id}
+
+@api_view(
+    required={'name': str, 'tags': ListOf(str)},
+    optional={'size': {'width': int, 'height': float}},
+    renderer='json',
+    )
+def create_item(name, tags, size=None):
+    return {'name': name}
+
+API_TREE = {
+    '/items': {
+        POST: create_item,
+        '/{id}': {GET: get_item},
+        },
+    }
+
+def make_app():
+    config = Configurator()
+    scan_api_tree(config, API_TREE)
+    return config.make_wsgi_app()
+
+class TestPercentile(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 0.5) == 50
+        assert percentile(values, 0.99) == 99
+        assert percentile([5], 0.99) == 5
+
+class TestLoadTarget(unittest.TestCase):
+    def test_make_request(self):
+        generator = LoadGenerator(make_app(), API_TREE)
+        targets = {target.name: target for target in generator.targets}
+        
+        request = targets['POST /items'].make_request(random.Random(0))
+        body = json.loads(request.body.decode('utf-8'))
+        assert request.method == 'POST'
+        assert request.content_type == 'application/json'
+        assert isinstance(body['name'], str)
+        assert isinstance(body['tags'], list)
+        
+        request = targets['GET /items/{id}'].make_request(random.Random(0))
+        assert request.method == 'GET'
+        assert request.path.startswith('/items/')
+        assert request.body == b''
+
+class TestLoadGenerator(unittest.TestCase):
+    def test_run(self):
+        generator = LoadGenerator(make_app(), API_TREE)
+        
+        report = generator.run(requests=40, concurrency=4).as_dict()
+        
+        assert report['requests'] == 40
+        assert set(report['routes']) == {'POST /items', 'GET /items/{id}'}
+        for route_dict in report['routes'].values():
+            assert route_dict['errors'] == 0
+            assert route_dict['p50'] <= route_dict['p99'] <= route_dict['max']
+    
+    def test_sizes(self):
+        generator = LoadGenerator(make_app(), API_TREE)
+        target = {item.name: item for item in generator.targets}['POST /items']
+        
+        sizes = PayloadSizes(list_length=5, string_length=2)
+        request = target.make_request(random.Random(0), sizes)
+        body = json.loads(request.body.decode('utf-8'))
+        
+        assert len(body['tags']) == 5
+        assert len(body['name']) == 2
+    
+    def test_mix(self):
+        generator = LoadGenerator(
+            make_app(),
+            API_TREE,
+            mix={'GET /items/{id}': 1},
+            )
+        
+        report = generator.run(requests=10, concurrency=2).as_dict()
+        
+        assert list(report['routes']) == ['GET /items/{id}']
+    
+    def test_unhandled_exception(self):
+        """ Exceptions raised by the application count as errors. """
+        def app(environ, start_response):
+            raise ValueError
+        
+        generator = LoadGenerator(app, API_TREE)
+        
+        report = generator.run(requests=4, concurrency=2).as_dict()
+        
+        errors = sum(
+            route_dict['errors'] for route_dict in report['routes'].values()
+            )
+        assert errors == 4
+    
+    def test_unknown_target(self):
+        with pytest.raises(ValueError):
+            LoadGenerator(make_app(), API_TREE, mix={'GET /xxx': 1})
+    
+    def test_skipped(self):
+        """ Endpoints with parameters which cannot be generated are not
+            requested. """
+        class CustomType(object):
+            pass
+        
+        @api_view(required={'value': CustomType}, renderer='json')
+        def custom_view(value):
+            return {}
+        
+        api_tree = dict(API_TREE)
+        api_tree['/custom'] = {POST: custom_view}
+        generator = LoadGenerator(make_app(), api_tree)
+        
+        report = generator.run(requests=4, concurrency=2)
+        
+        assert list(report.skipped) == ['POST /custom']
+        assert 'POST /custom' not in report.as_dict()['routes']
+        assert report.as_dict()['requests'] == 4
+        assert 'Skipped POST /custom' in report.format_table()
+    
+    def test_format_table(self):
+        generator = LoadGenerator(make_app(), API_TREE)
+        
+        table = generator.run(requests=10, concurrency=1).format_table()
+        
+        lines = table.splitlines()
+        assert lines[0].split()[:2] == ['route', 'requests']
+        assert lines[-1].startswith('10 requests')
@@ -0,0 +1,96 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import tracemalloc
+import unittest
+
+from apitree import api_view
+from apitree.memory import MemoryProfiler
+from .helpers import (
+    MockConfigurator,
+    MockRequest,
+    )
+
+SIZE = 1000000
+
+class TestMemoryProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = MemoryProfiler(sample_rate=1)
+        self.kept = []
+        
+        @api_view(memory_profiler=self.profiler)
+        def view_callable():
+            # One allocation which is kept, and one which is freed.
+            self.kept.append(bytearray(SIZE))
+            bytearray(SIZE)
+        
+        self.view_callable = view_callable
+    
+    def tearDown(self):
+        self.profiler.stop()
+    
+    def get_stats(self):
+        return {
+            item['phase']: item for item in self.profiler.get_stats()
+            if item['route'] == '/items'
+            }
+    
+    def test_handler(self):
+        self.view_callable(MockRequest())
+        
+        stats = self.get_stats()
+        handler = stats['handler']
+        assert handler['calls'] == 1
+        assert SIZE <= handler['allocated_bytes'] < 2 * SIZE
+        assert handler['peak_bytes'] >= 2 * SIZE
+    
+    def test_nested_peak(self):
+        """ The peak of a phase includes the peaks of nested phases. """
+        self.view_callable(MockRequest())
+        
+        stats = self.get_stats()
+        assert stats['request']['peak_bytes'] >= 2 * SIZE
+        assert stats['request']['allocated_bytes'] >= SIZE
+    
+    def test_aggregated(self):
+        for i in range(2):
+            self.view_callable(MockRequest())
+        
+        handler = self.get_stats()['handler']
+        assert handler['calls'] == 2
+        assert handler['allocated_bytes'] >= 2 * SIZE
+    
+    def test_phases(self):
+        self.view_callable(MockRequest())
+        
+        assert set(self.get_stats()) >= {
+            'bind',
+            'coerce_input',
+            'handler',
+            'coerce_output',
+            }
+    
+    def test_not_sampled(self):
+        profiler = MemoryProfiler(sample_rate=0)
+        assert profiler.start(MockRequest()) is None
+    
+    def test_one_at_a_time(self):
+        recording = self.profiler.start(MockRequest())
+        assert self.profiler.start(MockRequest()) is None
+        recording.finish()
+        assert self.profiler.start(MockRequest()) is not None
+    
+    def test_stop(self):
+        self.view_callable(MockRequest())
+        self.profiler.stop()
+        assert not tracemalloc.is_tracing()
+    
+    def test_add_views(self):
+        config = MockConfigurator()
+        self.view_callable(MockRequest())
+        
+        self.profiler.add_views(config, '/memory')
+        
+        view = config.views['/memory']['GET']
+        assert view['renderer'] == 'json'
+        result = view['view_callable'](MockRequest())
+        assert result == {'memory': self.profiler.get_stats()}
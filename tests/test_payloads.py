@@ -0,0 +1,101 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import datetime
+import json
+import uuid
+import unittest
+import pytest
+from iomanager import (
+    AnyType,
+    IOManager,
+    ListOf,
+    )
+from iomanager.web_tools import WebIOManager
+
+from apitree import api_view
+from apitree.exc import PayloadShapeError
+from apitree.limits import PayloadLimits
+from apitree.payloads import (
+    PayloadSizes,
+    generate_payload,
+    )
+
+class TestGeneratePayload(unittest.TestCase):
+    def test_view_callable(self):
+        @api_view(
+            required={'a': int, 'b': ListOf({'c': str})},
+            optional={'d': [bool, float]},
+            )
+        def view_callable(**kwargs):
+            pass
+        
+        for seed in range(10):
+            kwargs = generate_payload(view_callable, seed)
+            view_callable.manager.verify_input(
+                view_callable.manager.coerce_input(kwargs)
+                )
+    
+    def test_optional_rate(self):
+        manager = IOManager(input_kwargs={'optional': {'a': int}})
+        
+        assert generate_payload(
+            manager,
+            sizes=PayloadSizes(optional_rate=0),
+            ) == {}
+        assert 'a' in generate_payload(
+            manager,
+            sizes=PayloadSizes(optional_rate=1),
+            )
+    
+    def test_deterministic(self):
+        iospec = ListOf({'a': str, 'b': float})
+        
+        assert generate_payload(iospec, 1) == generate_payload(iospec, 1)
+        assert generate_payload(iospec, 1) != generate_payload(iospec, 2)
+    
+    def test_list_length(self):
+        sizes = PayloadSizes(list_length=(2, 4))
+        for seed in range(10):
+            value = generate_payload(ListOf(int), seed, sizes)
+            assert 2 <= len(value) <= 4
+    
+    def test_string_length(self):
+        value = generate_payload(str, sizes=PayloadSizes(string_length=100))
+        assert len(value) == 100
+    
+    def test_any_depth(self):
+        sizes = PayloadSizes(any_depth=3, list_length=2)
+        value = generate_payload({'a': AnyType}, sizes=sizes)
+        
+        # The payload itself, then three levels of containers.
+        PayloadLimits(max_depth=4).check_shape(value)
+        with pytest.raises(PayloadShapeError):
+            PayloadLimits(max_depth=3).check_shape(value)
+    
+    def test_json_compatible(self):
+        iospec = {'a': uuid.UUID, 'b': datetime.datetime}
+        manager = WebIOManager(input_kwargs={'required': iospec})
+        
+        kwargs = generate_payload(manager)
+        json.dumps(kwargs)
+        manager.verify_input(manager.coerce_input(kwargs))
+    
+    def test_native(self):
+        value = generate_payload(uuid.UUID, json_compatible=False)
+        assert isinstance(value, uuid.UUID)
+    
+    def test_builtin_containers(self):
+        iospecs = {'a': list, 'b': dict, 'c': ListOf(dict)}
+        value = generate_payload(iospecs, sizes=PayloadSizes(list_length=2))
+        
+        assert isinstance(value['a'], list) and len(value['a']) == 2
+        assert isinstance(value['b'], dict) and len(value['b']) == 2
+        assert all(isinstance(item, dict) for item in value['c'])
+        json.dumps(value)
+    
+    def test_unknown_type(self):
+        class CustomType(object):
+            pass
+        
+        with pytest.raises(TypeError):
+            generate_payload({'a': CustomType})
@@ -0,0 +1,88 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import gc
+import unittest
+import weakref
+from pyramid.config import Configurator
+
+from apitree import (
+    function_view,
+    scan_api_tree,
+    preload,
+    LazySubtree,
+    GET,
+    )
+from apitree.router import mount_api_tree
+from apitree.snapshot import LazyView
+
+@function_view(renderer='json')
+def get_item():
+    return {}
+
+SUBTREE = {'/{id}': {GET: get_item}}
+
+class TestPreload(unittest.TestCase):
+    def test_lazy_subtrees(self):
+        scanned = LazySubtree('tests.test_preload:SUBTREE')
+        mounted = LazySubtree('tests.test_preload:SUBTREE')
+        
+        config = Configurator()
+        scan_api_tree(config, {'/a': scanned})
+        mount_api_tree(config, {'/b': mounted}, route_name='b')
+        app = config.make_wsgi_app()
+        
+        preload(app, freeze=False)
+        
+        assert scanned.loaded
+        assert mounted.loaded
+    
+    def test_lazy_views(self):
+        """ Views in a lazy subtree are preloaded too, with or without
+            dispatch. """
+        lazy_view = LazyView('tests.test_preload:get_item')
+        subtree_view = LazyView('tests.test_preload:get_item')
+        api_tree = {
+            '/a': {GET: lazy_view},
+            '/b': LazySubtree(lambda: {GET: subtree_view}),
+            }
+        
+        for dispatch in [False, True]:
+            lazy_view.view = subtree_view.view = None
+            config = Configurator()
+            scan_api_tree(config, api_tree, dispatch=dispatch)
+            preload(config.make_wsgi_app(), freeze=False)
+            
+            assert lazy_view.view is get_item
+            assert subtree_view.view is get_item
+    
+    def test_freeze(self):
+        config = Configurator()
+        scan_api_tree(config, {'/a': {GET: get_item}})
+        app = config.make_wsgi_app()
+        
+        self.addCleanup(gc.unfreeze)
+        preload(app)
+        
+        assert gc.get_freeze_count() > 0
+    
+    def test_collect_before_freeze(self):
+        """ Garbage is collected rather than frozen. """
+        class Node(object):
+            pass
+        
+        config = Configurator()
+        scan_api_tree(config, {'/a': {GET: get_item}})
+        app = config.make_wsgi_app()
+        
+        gc.disable()
+        self.addCleanup(gc.enable)
+        self.addCleanup(gc.unfreeze)
+        
+        node = Node()
+        node.cycle = node
+        reference = weakref.ref(node)
+        del node
+        
+        preload(app)
+        
+        assert reference() is None
@@ -0,0 +1,140 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import cProfile
+import unittest
+from unittest import mock
+import pytest
+from pyramid.httpexceptions import HTTPBadRequest
+
+from apitree import function_view
+from apitree.profiling import (
+    RouteProfiler,
+    StackCollector,
+    )
+from .helpers import (
+    MockConfigurator,
+    MockRequest,
+    )
+
+def inner():
+    return sum(range(10))
+
+def outer():
+    return inner()
+
+class TestStackCollector(unittest.TestCase):
+    def test_collapsed(self):
+        collector = StackCollector()
+        collector.enable()
+        try:
+            outer()
+        finally:
+            collector.disable()
+        
+        lines = collector.collapsed().splitlines()
+        stacks = [line.rsplit(' ', 1)[0] for line in lines]
+        assert any(
+            'outer (' in item and ';inner (' in item and
+            item.endswith('builtins.sum')
+            for item in stacks
+            )
+        for line in lines:
+            assert int(line.rsplit(' ', 1)[1]) >= 0
+
+class TestRouteProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = RouteProfiler()
+        
+        @function_view(route_profiler=self.profiler)
+        def view_callable():
+            return outer()
+        
+        self.view_callable = view_callable
+    
+    def test_not_armed(self):
+        self.view_callable(MockRequest())
+        assert self.profiler.get_output() == ''
+    
+    def test_pstats(self):
+        self.profiler.arm('/items', calls=2)
+        
+        for i in range(3):
+            self.view_callable(MockRequest())
+        
+        status = self.profiler.get_status()
+        assert status['remaining'] == 0
+        assert status['profiled'] == 2
+        output = self.profiler.get_output()
+        assert 'function calls' in output
+        assert 'outer' in output
+    
+    def test_other_route(self):
+        self.profiler.arm('/other')
+        self.view_callable(MockRequest())
+        
+        assert self.profiler.get_status()['remaining'] == 1
+        assert self.profiler.get_output() == ''
+    
+    def test_collapsed(self):
+        self.profiler.arm('/items', calls=2, output_format='collapsed')
+        
+        for i in range(2):
+            self.view_callable(MockRequest())
+        
+        lines = self.profiler.get_output().splitlines()
+        assert any(';outer (' in line for line in lines)
+    
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            self.profiler.arm('/items', output_format='xxx')
+    
+    def test_invalid_calls(self):
+        with pytest.raises(ValueError):
+            self.profiler.arm('/items', calls=0)
+    
+    def test_other_profiler_active(self):
+        """ A call is not profiled if another profiler is active, and the
+            next one is. """
+        class ActiveProfile(cProfile.Profile):
+            def enable(self):
+                raise ValueError('Another profiling tool is already active')
+        
+        self.profiler.arm('/items')
+        with mock.patch.object(cProfile, 'Profile', ActiveProfile):
+            self.view_callable(MockRequest())
+        assert self.profiler.get_status()['remaining'] == 1
+        
+        self.view_callable(MockRequest())
+        status = self.profiler.get_status()
+        assert status['remaining'] == 0
+        assert status['profiled'] == 1
+    
+    def test_add_views(self):
+        config = MockConfigurator()
+        self.profiler.add_views(config, '/profile')
+        views = config.views['/profile']
+        
+        arm_view = views['POST']['view_callable']
+        result = arm_view(MockRequest(params={'route': '/items'}))
+        assert result['route'] == '/items'
+        assert result['remaining'] == 1
+        
+        self.view_callable(MockRequest())
+        
+        output_view = views['GET']['view_callable']
+        response = output_view(MockRequest())
+        assert response.content_type == 'text/plain'
+        assert 'outer' in response.text
+    
+    def test_arm_view_invalid(self):
+        config = MockConfigurator()
+        self.profiler.add_views(config, '/profile')
+        arm_view = config.views['/profile']['POST']['view_callable']
+        
+        for params in [
+            {},
+            {'route': '/items', 'calls': 'xxx'},
+            {'route': '/items', 'calls': '0'},
+            ]:
+            with pytest.raises(HTTPBadRequest):
+                arm_view(MockRequest(params=params))
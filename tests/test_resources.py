@@ -0,0 +1,256 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from pyramid.httpexceptions import (
+    HTTPGatewayTimeout,
+    HTTPServiceUnavailable,
+    )
+
+from apitree import (
+    function_view,
+    api_view,
+    GET,
+    )
+from apitree.api_documentation import APIDocumentationMaker
+from apitree.exc import (
+    ResourceError,
+    ResourceUnavailableError,
+    )
+from apitree.resources import (
+    PoolProvider,
+    ResourceRegistry,
+    ResourceScope,
+    SingletonProvider,
+    get_resource,
+    )
+
+class MockRequest(object):
+    """ A request without 'add_finished_callback'. """
+    def __init__(self):
+        self.headers = {}
+        self.GET = {}
+        self.POST = {}
+        self.matchdict = {}
+
+class MockPyramidRequest(MockRequest):
+    def __init__(self):
+        super().__init__()
+        self.environ = {}
+        self.finished_callbacks = []
+    
+    def add_finished_callback(self, callback):
+        self.finished_callbacks.append(callback)
+    
+    def finish(self):
+        for callback in self.finished_callbacks:
+            callback(self)
+
+class Counter(object):
+    def __init__(self):
+        self.created = 0
+        self.closed = []
+    
+    def create(self):
+        self.created += 1
+        return self.created
+    
+    def close(self, value):
+        self.closed.append(value)
+
+class TestProviders(unittest.TestCase):
+    def test_singleton(self):
+        counter = Counter()
+        provider = SingletonProvider(counter.create, counter.close)
+        
+        assert provider.acquire() == provider.acquire() == 1
+        
+        provider.close()
+        assert counter.closed == [1]
+    
+    def test_singleton_after_fork(self):
+        """ Values inherited from a parent process are not reused. """
+        counter = Counter()
+        provider = SingletonProvider(counter.create)
+        provider.acquire()
+        provider.pid = -1
+        
+        assert provider.acquire() == 2
+    
+    def test_pool_reuse(self):
+        counter = Counter()
+        provider = PoolProvider(counter.create, max_size=2)
+        
+        value = provider.acquire()
+        provider.release(value)
+        
+        assert provider.acquire() == value
+        assert counter.created == 1
+    
+    def test_pool_exhausted(self):
+        counter = Counter()
+        provider = PoolProvider(counter.create, max_size=1, timeout=0.01)
+        provider.acquire()
+        
+        with pytest.raises(ResourceUnavailableError):
+            provider.acquire()
+    
+    def test_pool_close(self):
+        counter = Counter()
+        provider = PoolProvider(counter.create, max_size=2, close=counter.close)
+        provider.release(provider.acquire())
+        provider.close()
+        
+        assert counter.closed == [1]
+        assert provider.size == 0
+
+class TestResourceScope(unittest.TestCase):
+    def test_acquired_once(self):
+        counter = Counter()
+        registry = ResourceRegistry()
+        registry.add_per_request('a', counter.create, counter.close)
+        
+        scope = ResourceScope()
+        assert scope.get(registry, 'a') == scope.get(registry, 'a')
+        
+        scope.close()
+        assert counter.created == 1
+        assert counter.closed == [1]
+    
+    def test_unknown_resource(self):
+        with pytest.raises(ResourceError):
+            ResourceScope().get(ResourceRegistry(), 'a')
+
+class TestViewCallableResources(unittest.TestCase):
+    def setUp(self):
+        self.counter = Counter()
+        self.registry = ResourceRegistry()
+        self.registry.add_pool(
+            'db',
+            self.counter.create,
+            max_size=1,
+            timeout=0.01,
+            )
+        self.provider = self.registry.get_provider('db')
+    
+    def make_view_callable(self, view_decorator=function_view, **kwargs):
+        @view_decorator(resource_registry=self.registry, **kwargs)
+        def view_callable(db, a=None):
+            return db
+        
+        return view_callable
+    
+    def test_injected(self):
+        view_callable = self.make_view_callable(resources=['db'])
+        assert view_callable(MockRequest()) == 1
+    
+    def test_renamed(self):
+        @function_view(resource_registry=self.registry, resources={'x': 'db'})
+        def view_callable(x):
+            return x
+        
+        assert view_callable(MockRequest()) == 1
+    
+    def test_released_after_call(self):
+        """ Without 'add_finished_callback', resources are released when the
+            view callable returns. """
+        view_callable = self.make_view_callable(resources=['db'])
+        view_callable(MockRequest())
+        
+        assert self.provider.idle.qsize() == 1
+    
+    def test_shared_with_catchall_predicate(self):
+        """ A resource is acquired once per request, and released when the
+            request finishes. """
+        view_callable = self.make_view_callable(resources=['db'])
+        request = MockPyramidRequest()
+        
+        value = get_resource(request, 'db', self.registry)
+        
+        assert view_callable(request) == value
+        assert self.provider.idle.qsize() == 0
+        
+        request.finish()
+        assert self.provider.idle.qsize() == 1
+    
+    def test_pool_exhausted(self):
+        view_callable = self.make_view_callable(resources=['db'])
+        self.provider.acquire()
+        
+        with pytest.raises(HTTPServiceUnavailable):
+            view_callable(MockRequest())
+    
+    def test_concurrent_requests(self):
+        """ A request releases only its own resources, while another request
+            to the same view callable still holds its resources. """
+        registry = ResourceRegistry()
+        registry.add_pool('db', self.counter.create, max_size=2)
+        provider = registry.get_provider('db')
+        a_started = threading.Event()
+        b_done = threading.Event()
+        idle_during_a = []
+        
+        @function_view(resource_registry=registry, resources=['db'])
+        def view_callable(db, name):
+            if name == 'a':
+                a_started.set()
+                b_done.wait(5)
+                idle_during_a.append(provider.idle.qsize())
+            return db
+        
+        def call(name):
+            request = MockRequest()
+            request.GET = {'name': name}
+            return view_callable(request)
+        
+        a = threading.Thread(target=call, args=['a'])
+        a.start()
+        a_started.wait(5)
+        call('b')
+        b_done.set()
+        a.join()
+        
+        assert idle_during_a == [1]
+        assert provider.idle.qsize() == 2
+    
+    def test_abandoned_call(self):
+        """ Resources used by a call abandoned at its deadline are released
+            when the call finishes, not when the request does. """
+        executor = ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        release = threading.Event()
+        
+        @function_view(
+            resource_registry=self.registry,
+            resources=['db'],
+            executor=executor,
+            )
+        def view_callable(db):
+            release.wait(5)
+            return db
+        
+        request = MockRequest()
+        request.headers = {'X-Request-Timeout': '0.05'}
+        with pytest.raises(HTTPGatewayTimeout):
+            view_callable(request)
+        
+        assert self.provider.idle.qsize() == 0
+        with pytest.raises(HTTPServiceUnavailable):
+            self.make_view_callable(resources=['db'])(MockRequest())
+        
+        release.set()
+        executor.shutdown()
+        assert self.provider.idle.qsize() == 1
+    
+    def test_api_view_documentation(self):
+        """ Resources are not documented as parameters. """
+        view_callable = self.make_view_callable(api_view, resources=['db'])
+        
+        documentation = APIDocumentationMaker().create_documentation(
+            {'/': {GET: view_callable}}
+            )
+        
+        assert 'required' not in documentation['/']['GET']
+        assert view_callable(MockRequest()) == 1
@@ -0,0 +1,137 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import os
+import random
+import tempfile
+import unittest
+
+from apitree import (
+    function_view,
+    scan_api_tree,
+    GET,
+    )
+from apitree.route_order import (
+    RouteHitCounter,
+    get_route_shape,
+    load_route_hits,
+    order_routes,
+    shapes_may_overlap,
+    )
+from .helpers import (
+    MockConfigurator,
+    MockRequest,
+    )
+
+class TestRouteHitCounter(unittest.TestCase):
+    def setUp(self):
+        self.counter = RouteHitCounter()
+        
+        @function_view(route_hits=self.counter)
+        def view_callable():
+            return {}
+        
+        self.view_callable = view_callable
+    
+    def test_count(self):
+        for i in range(3):
+            self.view_callable(MockRequest('/a'))
+        self.view_callable(MockRequest('/b'))
+        
+        assert self.counter.get_profile() == {'/a': 3, '/b': 1}
+    
+    def test_merge(self):
+        self.view_callable(MockRequest('/a'))
+        self.counter.merge({'/a': 2, '/c': 5})
+        
+        assert self.counter.get_profile() == {'/a': 3, '/c': 5}
+    
+    def test_save_load(self):
+        self.view_callable(MockRequest('/a'))
+        
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'route_hits.json')
+        self.counter.save(path)
+        
+        assert load_route_hits(path) == {'/a': 1}
+        assert RouteHitCounter(load_route_hits(path)).get_profile() == {
+            '/a': 1
+            }
+    
+    def test_add_views(self):
+        config = MockConfigurator()
+        self.counter.add_views(config, '/hits')
+        self.view_callable(MockRequest('/a'))
+        
+        view = config.views['/hits']['GET']
+        assert view['renderer'] == 'json'
+        result = view['view_callable'](MockRequest('/hits'))
+        assert result == {'routes': {'/a': 1}}
+
+class TestOrderRoutes(unittest.TestCase):
+    def test_hits(self):
+        routes = ['/a', '/b', '/c']
+        
+        assert order_routes(routes, {'/c': 10, '/b': 5}) == ['/c', '/b', '/a']
+        assert order_routes(routes, {}) == routes
+    
+    def test_overlapping(self):
+        """ '/items/new' must stay before '/items/{id}', which is moved ahead
+            of '/other/x' together with it. """
+        routes = ['/other/x', '/items/new', '/items/{id}']
+        
+        assert order_routes(routes, {'/items/{id}': 10}) == [
+            '/items/new',
+            '/items/{id}',
+            '/other/x',
+            ]
+    
+    def test_remainder(self):
+        routes = ['/items/new', '/items/*rest', '/other']
+        
+        assert order_routes(routes, {'/items/*rest': 10, '/other': 5}) == [
+            '/items/new',
+            '/items/*rest',
+            '/other',
+            ]
+        assert order_routes(routes, {'/other': 5}) == [
+            '/other',
+            '/items/new',
+            '/items/*rest',
+            ]
+    
+    def test_many_routes(self):
+        """ Routes which may overlap keep their relative order, and the others
+            are ordered by hits. """
+        rng = random.Random(0)
+        segments = ['a', 'b', '{id}', '*rest']
+        routes = sorted({
+            '/' + '/'.join(
+                rng.choice(segments[:3]) for i in range(rng.randint(0, 3))
+                ) + rng.choice(['', '/*rest'])
+            for i in range(200)
+            })
+        route_hits = {item: rng.randint(0, 100) for item in routes}
+        
+        result = order_routes(routes, route_hits)
+        
+        assert sorted(result) == routes
+        positions = {item: index for index, item in enumerate(result)}
+        shapes = [get_route_shape(item) for item in routes]
+        for index_b, route_b in enumerate(routes):
+            for index_a, route_a in enumerate(routes[:index_b]):
+                if shapes_may_overlap(shapes[index_a], shapes[index_b]):
+                    assert positions[route_a] < positions[route_b]
+    
+    def test_scan_api_tree(self):
+        @function_view
+        def view_callable():
+            return {}
+        
+        api_tree = {
+            '/a': {GET: view_callable},
+            '/b': {GET: view_callable},
+            }
+        config = MockConfigurator()
+        scan_api_tree(config, api_tree, route_hits={'/b': 1})
+        
+        assert config.routes == ['/b', '/a']
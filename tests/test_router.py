@@ -0,0 +1,188 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import unittest
+import pytest
+from pyramid.config import Configurator
+from pyramid.exceptions import PredicateMismatch
+from pyramid.httpexceptions import HTTPNotFound
+from webob import Request
+
+from apitree import (
+    api_view,
+    simple_view,
+    GET,
+    POST,
+    )
+from apitree.exc import APITreeError
+from apitree.router import (
+    RadixRouter,
+    RouterView,
+    mount_api_tree,
+    )
+from apitree.util import get_route_pattern
+
+def make_router(*patterns):
+    router = RadixRouter()
+    for pattern in patterns:
+        router.add_views(pattern, [{'view': pattern}])
+    return router
+
+def match_pattern(router, path):
+    result = router.match(path)
+    if result is None:
+        return None
+    node, matchdict = result
+    return node.dispatcher.route, matchdict
+
+class MockRequest(object):
+    def __init__(self, path_info, method='GET'):
+        self.path_info = path_info
+        self.method = method
+        self.environ = {}
+
+class TestRadixRouterMatch(unittest.TestCase):
+    def test_static(self):
+        router = make_router('/', '/items', '/items/new')
+        
+        assert match_pattern(router, '/') == ('/', {})
+        assert match_pattern(router, '/items') == ('/items', {})
+        assert match_pattern(router, '/items/new') == ('/items/new', {})
+        assert match_pattern(router, '/other') is None
+    
+    def test_placeholder(self):
+        router = make_router('/items/{id}', '/items/{id}/tags/{tag}')
+        
+        assert match_pattern(router, '/items/5') == (
+            '/items/{id}', {'id': '5'}
+            )
+        assert match_pattern(router, '/items/5/tags/x') == (
+            '/items/{id}/tags/{tag}', {'id': '5', 'tag': 'x'}
+            )
+        assert match_pattern(router, '/items/') is None
+    
+    def test_regex_placeholder(self):
+        router = make_router(r'/items/{id:\d+}', '/files/{name}.{ext}')
+        
+        assert match_pattern(router, '/items/5') == (
+            r'/items/{id:\d+}', {'id': '5'}
+            )
+        assert match_pattern(router, '/items/x') is None
+        assert match_pattern(router, '/files/a.txt') == (
+            '/files/{name}.{ext}', {'name': 'a', 'ext': 'txt'}
+            )
+    
+    def test_static_priority(self):
+        """ Static segments win regardless of the order of routes. """
+        router = make_router('/items/{id}', '/items/new')
+        
+        assert match_pattern(router, '/items/new') == ('/items/new', {})
+    
+    def test_backtracking(self):
+        """ A dead end in a static branch falls back to a placeholder. """
+        router = make_router('/items/new/x', '/items/{id}/y')
+        
+        assert match_pattern(router, '/items/new/y') == (
+            '/items/{id}/y', {'id': 'new'}
+            )
+    
+    def test_remainder(self):
+        router = make_router('/items/{id}', '/items/*rest')
+        
+        assert match_pattern(router, '/items/5') == (
+            '/items/{id}', {'id': '5'}
+            )
+        assert match_pattern(router, '/items/5/a') == (
+            '/items/*rest', {'rest': ('5', 'a')}
+            )
+        assert match_pattern(router, '/items') == (
+            '/items/*rest', {'rest': ()}
+            )
+    
+    def test_remainder_not_last(self):
+        with pytest.raises(APITreeError):
+            make_router('/*rest/items')
+    
+    def test_unsupported_view_kwarg(self):
+        router = RadixRouter()
+        with pytest.raises(APITreeError):
+            router.add_views('/items', [{'view': None, 'permission': 'x'}])
+
+class TestRouterView(unittest.TestCase):
+    def make_router_view(self):
+        router = RadixRouter()
+        router.add_views('/items', [
+            {'view': lambda request: 'get', 'request_method': ('GET',)},
+            {'view': lambda request: 'post', 'request_method': ('POST',)},
+            {
+                'view': lambda request: 'header',
+                'request_method': ('GET',),
+                'custom_predicates': [
+                    lambda context, request: request.environ.get('x'),
+                    ],
+                },
+            ])
+        return RouterView(router)
+    
+    def test_request_method(self):
+        router_view = self.make_router_view()
+        
+        assert router_view(MockRequest('/items')) == 'get'
+        assert router_view(MockRequest('/items', 'POST')) == 'post'
+        with pytest.raises(PredicateMismatch):
+            router_view(MockRequest('/items', 'DELETE'))
+    
+    def test_custom_predicates(self):
+        """ Views with custom predicates are tried first. """
+        router_view = self.make_router_view()
+        request = MockRequest('/items')
+        request.environ['x'] = True
+        
+        assert router_view(request) == 'header'
+    
+    def test_not_found(self):
+        router_view = self.make_router_view()
+        
+        with pytest.raises(HTTPNotFound):
+            router_view(MockRequest('/other'))
+    
+    def test_route_pattern(self):
+        router = RadixRouter()
+        router.add_views('/items/{id}', [{'view': get_route_pattern}])
+        
+        assert RouterView(router)(MockRequest('/items/5')) == '/items/{id}'
+
+class TestMountAPITree(unittest.TestCase):
+    def make_app(self):
+        @api_view(required={'id': str}, renderer='json')
+        def get_item(id):
+            return {'id': id}
+        
+        @simple_view(renderer='string')
+        def create_item(request):
+            return get_route_pattern(request)
+        
+        api_tree = {
+            '/items': {
+                POST: create_item,
+                '/{id}': {GET: get_item},
+                },
+            }
+        
+        config = Configurator()
+        mount_api_tree(config, api_tree, root_path='/api')
+        return config.make_wsgi_app()
+    
+    def test_dispatch(self):
+        app = self.make_app()
+        
+        response = Request.blank('/api/items/5').get_response(app)
+        assert response.json == {'id': '5'}
+        
+        request = Request.blank('/api/items', method='POST')
+        assert request.get_response(app).text == '/api/items'
+    
+    def test_not_found(self):
+        app = self.make_app()
+        
+        for path in ['/api/other', '/other']:
+            assert Request.blank(path).get_response(app).status_int == 404
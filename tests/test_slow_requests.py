@@ -0,0 +1,187 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import threading
+import unittest
+import pytest
+
+from apitree import (
+    function_view,
+    api_view,
+    )
+from apitree.slow_requests import (
+    PhaseTimer,
+    SlowRequestLog,
+    )
+from apitree.tracing import (
+    InMemoryExporter,
+    RecordingTracer,
+    )
+from .helpers import (
+    MockConfigurator,
+    MockRequest,
+    )
+
+class TestPhaseTimer(unittest.TestCase):
+    def test_accumulated(self):
+        timer = PhaseTimer()
+        for i in range(2):
+            with timer.phase('xxx'):
+                pass
+        
+        assert list(timer.phases) == ['xxx']
+        assert timer.phases['xxx'] >= 0
+    
+    def test_exception(self):
+        timer = PhaseTimer()
+        with pytest.raises(ValueError):
+            with timer.phase('xxx'):
+                raise ValueError
+        
+        assert 'xxx' in timer.phases
+
+class TestSlowRequestLog(unittest.TestCase):
+    def make_view_callable(self, log, **kwargs):
+        @api_view(slow_request_log=log, required={'a': int}, **kwargs)
+        def view_callable(a):
+            return None
+        
+        return view_callable
+    
+    def test_slow(self):
+        log = SlowRequestLog(threshold=0)
+        view_callable = self.make_view_callable(log)
+        
+        request = MockRequest('/items/{id}', {'content-length': '7'})
+        request.matchdict['a'] = 1
+        view_callable(request)
+        
+        (entry,) = log.get_entries()
+        assert entry['route'] == '/items/{id}'
+        assert entry['method'] == 'GET'
+        assert entry['payload_bytes'] == 7
+        assert entry['duration'] >= entry['phases']['request']
+        assert entry['profile'] is None
+        for name in ['bind', 'coerce_input', 'handler', 'coerce_output']:
+            assert name in entry['phases']
+    
+    def test_fast(self):
+        log = SlowRequestLog(threshold=60)
+        view_callable = self.make_view_callable(log)
+        
+        request = MockRequest('/items/{id}')
+        request.matchdict['a'] = 1
+        view_callable(request)
+        
+        assert log.get_entries() == []
+    
+    def test_view_threshold(self):
+        log = SlowRequestLog(threshold=60)
+        view_callable = self.make_view_callable(
+            log,
+            slow_request_threshold=0,
+            )
+        
+        request = MockRequest('/items/{id}')
+        request.matchdict['a'] = 1
+        view_callable(request)
+        
+        assert len(log.get_entries()) == 1
+    
+    def test_concurrent_requests(self):
+        """ Phases are recorded for their own request, even when another
+            request to the same view callable finishes first. """
+        log = SlowRequestLog(threshold=0)
+        a_started = threading.Event()
+        b_done = threading.Event()
+        
+        @api_view(slow_request_log=log, required={'name': str})
+        def view_callable(name):
+            if name == 'a':
+                a_started.set()
+                b_done.wait(5)
+            return None
+        
+        def call(name):
+            request = MockRequest('/items/{id}')
+            request.matchdict['name'] = name
+            request.path = '/items/' + name
+            view_callable(request)
+        
+        a = threading.Thread(target=call, args=['a'])
+        a.start()
+        a_started.wait(5)
+        call('b')
+        b_done.set()
+        a.join()
+        
+        entries = log.get_entries()
+        assert len(entries) == 2
+        for entry in entries:
+            for name in ['bind', 'handler', 'coerce_output']:
+                assert name in entry['phases']
+    
+    def test_failed_request(self):
+        """ Requests which raise an exception are recorded. """
+        log = SlowRequestLog(threshold=0)
+        
+        @function_view(slow_request_log=log)
+        def view_callable():
+            raise ValueError
+        
+        with pytest.raises(ValueError):
+            view_callable(MockRequest('/items/{id}'))
+        
+        assert len(log.get_entries()) == 1
+    
+    def test_ring_buffer(self):
+        log = SlowRequestLog(threshold=0, max_entries=2)
+        
+        @function_view(slow_request_log=log)
+        def view_callable():
+            return {}
+        
+        for i in range(3):
+            view_callable(MockRequest('/items/{id}'))
+        
+        assert len(log.get_entries()) == 2
+    
+    def test_profile(self):
+        log = SlowRequestLog(threshold=0, profile_rate=1)
+        
+        @function_view(slow_request_log=log)
+        def view_callable():
+            return {}
+        
+        view_callable(MockRequest('/items/{id}'))
+        
+        (entry,) = log.get_entries()
+        assert 'function calls' in entry['profile']
+    
+    def test_with_tracer(self):
+        exporter = InMemoryExporter()
+        log = SlowRequestLog(threshold=0)
+        
+        @function_view(slow_request_log=log, tracer=RecordingTracer(exporter))
+        def view_callable():
+            return {}
+        
+        view_callable(MockRequest('/items/{id}'))
+        
+        (entry,) = log.get_entries()
+        assert sorted(entry['phases']) == sorted(
+            span.name.replace('apitree.', '') for span in exporter.spans
+            )
+    
+    def test_add_views(self):
+        log = SlowRequestLog(threshold=0)
+        config = MockConfigurator()
+        path = '/slow'
+        
+        log.add_views(config, path)
+        
+        assert config.routes == [path]
+        view = config.views[path]['GET']
+        assert view['renderer'] == 'json'
+        assert view['request_method'] == 'GET'
+        result = view['view_callable'](MockRequest('/items/{id}'))
+        assert result == {'slow_requests': []}
@@ -0,0 +1,202 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pyramid.config import Configurator
+from webob import Request
+
+from apitree import (
+    function_view,
+    GET,
+    )
+from apitree.exc import APITreeError
+from apitree.lazy import LazySubtree
+from apitree.snapshot import (
+    LazyView,
+    load_snapshot,
+    save_snapshot,
+    scan_snapshot,
+    )
+
+MODULE_SOURCE = '''
+from apitree import api_view, simple_view, GET, POST
+
+@simple_view(renderer='json')
+def get_items(request):
+    return {'items': []}
+
+@api_view(required={'id': str}, renderer='json')
+def get_item(id):
+    return {'id': id}
+
+api_tree = {
+    '/items': {
+        GET: get_items,
+        '/{id}': {(GET, POST): get_item},
+        },
+    }
+'''
+
+@function_view(renderer='json')
+def local_view():
+    return {}
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.module_name = 'snapshot_tree_{}'.format(id(self))
+        self.module_path = os.path.join(
+            self.directory,
+            self.module_name + '.py',
+            )
+        with open(self.module_path, 'w') as file:
+            file.write(MODULE_SOURCE)
+        sys.path.insert(0, self.directory)
+        
+        self.api_tree_name = self.module_name + ':api_tree'
+        self.path = os.path.join(self.directory, 'snapshot.json')
+    
+    def tearDown(self):
+        sys.path.remove(self.directory)
+        sys.modules.pop(self.module_name, None)
+        shutil.rmtree(self.directory)
+    
+    def unload_module(self):
+        del sys.modules[self.module_name]
+    
+    def make_app(self, dispatch=False):
+        config = Configurator()
+        used = scan_snapshot(
+            config,
+            self.path,
+            self.api_tree_name,
+            dispatch=dispatch,
+            )
+        return used, config.make_wsgi_app()
+    
+    def test_save_load(self):
+        save_snapshot(self.path, self.api_tree_name)
+        self.unload_module()
+        
+        endpoints = load_snapshot(self.path, self.api_tree_name)
+        
+        assert self.module_name not in sys.modules
+        assert [
+            (route, endpoint['request_method'], endpoint['renderer'])
+            for route, endpoint in endpoints
+            ] == [
+            ('/items', ('GET',), 'json'),
+            ('/items/{id}', ('GET', 'POST'), 'json'),
+            ]
+        view = endpoints[0][1].view
+        assert isinstance(view, LazyView)
+        assert view.import_path == self.module_name + ':get_items'
+    
+    def test_scan_snapshot(self):
+        used, app = self.make_app()
+        assert not used
+        self.unload_module()
+        
+        for dispatch in [False, True]:
+            used, app = self.make_app(dispatch)
+            assert used
+            assert self.module_name not in sys.modules
+            
+            response = Request.blank('/items/5').get_response(app)
+            assert response.json == {'id': '5'}
+            assert self.module_name in sys.modules
+            self.unload_module()
+    
+    def test_stale_subtree(self):
+        """ The snapshot is stale when a subtree imported from another module
+            changes. """
+        subtree_name = 'snapshot_subtree_{}'.format(id(self))
+        tree_name = 'snapshot_main_{}'.format(id(self))
+        subtree_path = os.path.join(self.directory, subtree_name + '.py')
+        
+        with open(subtree_path, 'w') as file:
+            file.write(
+                'from apitree import GET\n'
+                'from {} import get_items\n'
+                'subtree = {{"/all": {{GET: get_items}}}}\n'
+                .format(self.module_name)
+                )
+        with open(os.path.join(self.directory, tree_name + '.py'), 'w') as file:
+            file.write(
+                'from {} import subtree\n'
+                'api_tree = {{"/v1": subtree}}\n'
+                .format(subtree_name)
+                )
+        
+        api_tree_name = tree_name + ':api_tree'
+        try:
+            save_snapshot(self.path, api_tree_name)
+            assert load_snapshot(self.path, api_tree_name) is not None
+            
+            with open(subtree_path, 'a') as file:
+                file.write('subtree["/new"] = subtree["/all"]\n')
+            
+            assert load_snapshot(self.path, api_tree_name) is None
+        finally:
+            sys.modules.pop(subtree_name, None)
+            sys.modules.pop(tree_name, None)
+    
+    def test_stale(self):
+        save_snapshot(self.path, self.api_tree_name)
+        
+        with open(self.module_path, 'a') as file:
+            file.write('\n# Changed.\n')
+        
+        assert load_snapshot(self.path, self.api_tree_name) is None
+        assert load_snapshot(self.path, self.api_tree_name, '/v1') is None
+        
+        with open(self.path) as file:
+            snapshot = json.load(file)
+        assert snapshot['modules'] == [self.module_name]
+    
+    def test_missing(self):
+        assert load_snapshot(self.path, self.api_tree_name) is None
+    
+    def test_lazy_subtree(self):
+        """ Lazy subtrees are saved by their dotted name. """
+        sys.modules['tests.test_snapshot'].SNAPSHOT_TREE = {
+            '/local': {GET: local_view},
+            '/lazy': LazySubtree(self.api_tree_name),
+            }
+        save_snapshot(self.path, 'tests.test_snapshot:SNAPSHOT_TREE')
+        
+        endpoints = dict(load_snapshot(
+            self.path,
+            'tests.test_snapshot:SNAPSHOT_TREE',
+            ))
+        assert endpoints['/lazy']['view'].loader == self.api_tree_name
+        assert endpoints['/local']['view'].import_path == (
+            'tests.test_snapshot:local_view'
+            )
+    
+    def test_save_failure(self):
+        """ A snapshot which cannot be saved does not prevent the scan. """
+        self.path = os.path.join(self.directory, 'missing', 'snapshot.json')
+        
+        with self.assertLogs('apitree.snapshot', 'ERROR'):
+            used, app = self.make_app()
+        
+        assert not used
+        response = Request.blank('/items/5').get_response(app)
+        assert response.json == {'id': '5'}
+    
+    def test_unsaveable(self):
+        @function_view
+        def nested_view():
+            return {}
+        
+        sys.modules['tests.test_snapshot'].SNAPSHOT_TREE = {
+            '/nested': {GET: nested_view},
+            }
+        
+        with self.assertRaises(APITreeError):
+            save_snapshot(self.path, 'tests.test_snapshot:SNAPSHOT_TREE')
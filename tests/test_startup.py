@@ -0,0 +1,150 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from pyramid.config import Configurator
+
+from apitree import (
+    api_view,
+    function_view,
+    scan_api_tree,
+    add_catchall,
+    StartupProfiler,
+    GET,
+    POST,
+    )
+from apitree.startup import (
+    ADD_ROUTE,
+    ADD_VIEW,
+    DECORATE,
+    INTROSPECT,
+    SUBTREE,
+    get_route_prefixes,
+    )
+
+class TestStartupProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = StartupProfiler()
+    
+    def get_names(self, kind):
+        return {
+            entry['name']: entry
+            for entry in self.profiler.get_report(kind)
+            }
+    
+    def make_api_tree(self):
+        with self.profiler:
+            @api_view(required={'id': int})
+            def get_item(id):
+                return {}
+            
+            @function_view
+            def add_item():
+                return {}
+        
+        return {
+            '/items': {
+                POST: add_item,
+                '/{id}': {GET: get_item},
+                },
+            }
+    
+    def test_decoration(self):
+        self.make_api_tree()
+        
+        decorated = self.get_names(DECORATE)
+        introspected = self.get_names(INTROSPECT)
+        
+        name = (
+            'tests.test_startup:TestStartupProfiler.make_api_tree.'
+            '<locals>.get_item'
+            )
+        assert set(introspected) == {name}
+        assert len(decorated) == 2
+        assert decorated[name]['calls'] == 1
+        assert decorated[name]['seconds'] >= (
+            introspected[name]['seconds']
+            )
+    
+    def test_scan_api_tree(self):
+        api_tree = self.make_api_tree()
+        
+        @function_view
+        def catchall():
+            return {}
+        
+        config = Configurator()
+        scan_api_tree(config, api_tree, startup_profiler=self.profiler)
+        add_catchall(
+            config,
+            api_tree,
+            catchall,
+            startup_profiler=self.profiler,
+            )
+        
+        assert set(self.get_names(ADD_ROUTE)) == {'/items', '/items/{id}'}
+        assert len(self.get_names(ADD_VIEW)) == 4
+        
+        subtrees = self.get_names(SUBTREE)
+        assert subtrees['/items']['calls'] == 6
+        assert subtrees['/items/{id}']['calls'] == 3
+        assert subtrees['/items']['seconds'] >= (
+            subtrees['/items/{id}']['seconds']
+            )
+    
+    def test_report(self):
+        config = Configurator()
+        scan_api_tree(
+            config,
+            self.make_api_tree(),
+            startup_profiler=self.profiler,
+            )
+        
+        report = self.profiler.get_report()
+        seconds = [entry['seconds'] for entry in report]
+        assert seconds == sorted(seconds, reverse=True)
+        
+        lines = self.profiler.format_table(limit=3).splitlines()
+        assert lines[0].split() == ['kind', 'name', 'calls', 'ms', 'KiB']
+        assert len(lines) == 4
+        
+        path = os.path.join(tempfile.mkdtemp(), 'startup.json')
+        self.profiler.save(path)
+        with open(path) as file:
+            assert json.load(file) == {'startup': report}
+    
+    def test_inactive(self):
+        """ Nothing is measured outside of the profiler. """
+        self.make_api_tree()
+        self.profiler.clear()
+        
+        scan_api_tree(Configurator(), self.make_api_tree())
+        
+        assert self.get_names(ADD_VIEW) == {}
+    
+    def test_inactive_labels(self):
+        """ Names are not built outside of the profiler. """
+        api_tree = self.make_api_tree()
+        
+        with mock.patch(
+            'apitree.tree_scan.get_view_label',
+            side_effect=AssertionError,
+            ):
+            with mock.patch(
+                'apitree.view_callable.get_callable_name',
+                side_effect=AssertionError,
+                ):
+                @api_view(required={'id': int})
+                def catchall(id):
+                    return {}
+                
+                config = Configurator()
+                scan_api_tree(config, api_tree)
+                add_catchall(config, api_tree, catchall)
+    
+    def test_route_prefixes(self):
+        assert get_route_prefixes('/a/{id}/b') == ['/a', '/a/{id}', '/a/{id}/b']
+        assert get_route_prefixes('/') == ['/']
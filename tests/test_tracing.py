@@ -0,0 +1,146 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import json
+import os
+import tempfile
+import unittest
+
+from apitree import (
+    function_view,
+    api_view,
+    )
+from apitree.tracing import (
+    FileExporter,
+    InMemoryExporter,
+    RecordingTracer,
+    ROUTING_SPAN_ENVIRON_KEY,
+    tracing_tween_factory,
+    )
+from .helpers import MockRequest
+
+class MockRegistry(object):
+    def __init__(self, settings):
+        self.settings = settings
+
+class TestRecordingTracer(unittest.TestCase):
+    def setUp(self):
+        self.exporter = InMemoryExporter()
+        self.tracer = RecordingTracer(self.exporter)
+    
+    def test_parent(self):
+        with self.tracer.start_span('outer', {}) as outer:
+            with self.tracer.start_span('inner', {}) as inner:
+                pass
+        
+        assert self.exporter.spans == [inner, outer]
+        assert inner.parent_id == outer.span_id
+        assert inner.trace_id == outer.trace_id
+        assert outer.parent_id is None
+        assert outer.duration >= inner.duration
+    
+    def test_separate_traces(self):
+        with self.tracer.start_span('first', {}) as first:
+            pass
+        with self.tracer.start_span('second', {}) as second:
+            pass
+        
+        assert first.trace_id != second.trace_id
+    
+    def test_file_exporter(self):
+        file_obj, path = tempfile.mkstemp()
+        os.close(file_obj)
+        try:
+            tracer = RecordingTracer(FileExporter(path))
+            with tracer.start_span('xxx', {'a': 1}):
+                pass
+            
+            with open(path) as file_obj:
+                lines = file_obj.readlines()
+        finally:
+            os.remove(path)
+        
+        assert len(lines) == 1
+        record = json.loads(lines[0])
+        assert record['name'] == 'xxx'
+        assert record['attributes'] == {'a': 1}
+
+class TestViewCallableTracing(unittest.TestCase):
+    def setUp(self):
+        self.exporter = InMemoryExporter()
+        self.tracer = RecordingTracer(self.exporter)
+    
+    def get_span_names(self):
+        return [span.name for span in self.exporter.spans]
+    
+    def test_function_view(self):
+        @function_view(tracer=self.tracer)
+        def view_callable():
+            return {}
+        
+        view_callable(MockRequest('/items/{id}'))
+        
+        assert self.get_span_names() == [
+            'apitree.authenticate',
+            'apitree.bind',
+            'apitree.handler',
+            'apitree.encode',
+            'apitree.request',
+            ]
+    
+    def test_api_view(self):
+        @api_view(tracer=self.tracer)
+        def view_callable():
+            return None
+        
+        view_callable(MockRequest('/items/{id}'))
+        
+        assert self.get_span_names() == [
+            'apitree.authenticate',
+            'apitree.bind',
+            'apitree.coerce_input',
+            'apitree.verify_input',
+            'apitree.handler',
+            'apitree.verify_output',
+            'apitree.coerce_output',
+            'apitree.encode',
+            'apitree.request',
+            ]
+    
+    def test_attributes(self):
+        @function_view(tracer=self.tracer)
+        def view_callable():
+            return {}
+        
+        view_callable(MockRequest('/items/{id}'))
+        
+        request_span = self.exporter.spans[-1]
+        assert request_span.attributes == {
+            'apitree.route': '/items/{id}',
+            'http.method': 'GET',
+            }
+        for span in self.exporter.spans[:-1]:
+            assert span.parent_id == request_span.span_id
+    
+    def test_routing_span(self):
+        """ The tween's routing span ends when the view callable is called. """
+        @function_view(tracer=self.tracer)
+        def view_callable():
+            return {}
+        
+        registry = MockRegistry({'apitree.tracer': self.tracer})
+        tween = tracing_tween_factory(view_callable, registry)
+        request = MockRequest('/items/{id}')
+        
+        tween(request)
+        
+        names = self.get_span_names()
+        assert names[0] == 'apitree.routing'
+        assert names[-1] == 'apitree.request'
+        assert self.exporter.spans[-1].parent_id is None
+        assert ROUTING_SPAN_ENVIRON_KEY not in request.environ
+    
+    def test_tween_without_tracer(self):
+        def handler(request):
+            pass
+        
+        assert tracing_tween_factory(handler, MockRegistry({})) is handler
@@ -355,6 +355,153 @@ class TestComplexBranch(ScanTest):
             }
         self.endpoint_test('/resource/component')
 
+class TestIterEndpoints(unittest.TestCase):
+    def setUp(self):
+        def dummy(*pargs, **kwargs):
+            """ A dummy view callable. """
+        self.dummy = dummy
+    
+    def test_order(self):
+        """ Pairs are yielded depth-first in the order of the API tree. """
+        api_tree = [
+            ('/a', {GET: self.dummy, '/b': self.dummy}),
+            ((GET, POST), self.dummy),
+            (('/c', '/d'), [self.dummy, self.dummy]),
+            ]
+        
+        result = [
+            (route, view_dict.get('request_method'))
+            for route, view_dict in apitree.tree_scan.iter_endpoints(api_tree)
+            ]
+        assert result == [
+            ('/a', ('GET', )),
+            ('/a/b', None),
+            ('', ('GET', 'POST')),
+            ('/c', None),
+            ('/c', None),
+            ('/d', None),
+            ('/d', None),
+            ]
+    
+    def test_get_endpoints(self):
+        api_tree = {'/a': {GET: self.dummy, '/b': self.dummy, '': self.dummy}}
+        
+        endpoints = apitree.tree_scan.get_endpoints(api_tree, '/root')
+        assert list(endpoints) == ['/root/a', '/root/a/b']
+        assert len(endpoints['/root/a']) == 2
+        
+        # Mutable dictionaries.
+        view_dict = endpoints['/root/a'][0]
+        assert type(view_dict) is dict
+        view_dict['renderer'] = 'json'
+        assert view_dict['view'] is self.dummy
+    
+    def test_deep_tree(self):
+        """ The depth of the API tree is not limited by the recursion
+            limit. """
+        api_tree = self.dummy
+        for i in range(5000):
+            api_tree = {'/x': api_tree}
+        
+        ((route, view_dict), ) = apitree.tree_scan.iter_endpoints(api_tree)
+        assert route == '/x' * 5000
+    
+    def test_shared_subtree(self):
+        """ A subtree object mounted under several prefixes is walked once,
+            and all of the prefixes share its 'Endpoint' records. """
+        walks = []
+        
+        class CountingDict(dict):
+            def items(self):
+                walks.append(self)
+                return super().items()
+        
+        subtree = CountingDict({GET: self.dummy, '/{id}': self.dummy})
+        api_tree = {
+            '/tenant-{}'.format(index): subtree for index in range(10)
+            }
+        
+        endpoints = list(apitree.tree_scan.iter_endpoints(api_tree, '/v1'))
+        
+        assert len(walks) == 1
+        assert [route for route, endpoint in endpoints[:4]] == [
+            '/v1/tenant-0',
+            '/v1/tenant-0/{id}',
+            '/v1/tenant-1',
+            '/v1/tenant-1/{id}',
+            ]
+        assert len(endpoints) == 20
+        assert endpoints[0][1] is endpoints[2][1] is endpoints[-2][1]
+        assert endpoints[2][1]['request_method'] == ('GET', )
+    
+    def test_shared_subtree_locations(self):
+        """ A subtree under a tuple of paths, or nested in a shared subtree,
+            is walked once. """
+        walks = []
+        
+        class CountingDict(dict):
+            def items(self):
+                walks.append(self)
+                return super().items()
+        
+        inner = CountingDict({GET: self.dummy})
+        outer = CountingDict({'/inner': inner, '/other': self.dummy})
+        api_tree = [
+            (('/a', '/b'), outer),
+            ('/c', [outer, self.dummy]),
+            ]
+        
+        routes = [
+            route for route, endpoint in
+            apitree.tree_scan.iter_endpoints(api_tree)
+            ]
+        
+        assert walks == [outer, inner]
+        assert routes == [
+            '/a/inner', '/a/other',
+            '/b/inner', '/b/other',
+            '/c/inner', '/c/other', '/c',
+            ]
+
+class TestEndpoint(unittest.TestCase):
+    def setUp(self):
+        def dummy(*pargs, **kwargs):
+            """ A dummy view callable. """
+        dummy.view_kwargs = {'renderer': 'json', 'request_method': 'POST'}
+        self.dummy = dummy
+    
+    def test_mapping(self):
+        endpoint = apitree.tree_scan.Endpoint(self.dummy)
+        
+        assert endpoint == {
+            'renderer': 'json',
+            'request_method': 'POST',
+            'view': self.dummy,
+            }
+        assert endpoint.as_dict() == dict(endpoint)
+        assert len(endpoint) == 3
+    
+    def test_request_method_override(self):
+        endpoint = apitree.tree_scan.Endpoint(self.dummy, ('GET', ))
+        
+        assert endpoint['request_method'] == ('GET', )
+        assert len(endpoint) == len(list(endpoint)) == 3
+    
+    def test_compact(self):
+        """ Endpoints are immutable, have no '__dict__', share the view
+            callable's 'view_kwargs', and intern request method tuples. """
+        endpoint_a = apitree.tree_scan.Endpoint(self.dummy, ('GET', 'PUT'))
+        endpoint_b = apitree.tree_scan.Endpoint(
+            self.dummy,
+            tuple(['GET', 'PUT']),
+            )
+        
+        assert not hasattr(endpoint_a, '__dict__')
+        with pytest.raises(AttributeError):
+            endpoint_a.view = None
+        assert endpoint_a.view_kwargs is self.dummy.view_kwargs
+        assert endpoint_a.request_method is endpoint_b.request_method
+
 class TestViewKwargs(ScanTest):
     def test_view_kwargs(self):
         self.target.view_kwargs = {'predicate': 'predicate value'}
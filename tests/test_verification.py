@@ -0,0 +1,130 @@
+""" Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
+
+import unittest
+import pytest
+import iomanager
+
+from apitree import (
+    api_view,
+    function_view,
+    set_view_options,
+    GET,
+    )
+from apitree.verification import VerificationPolicy
+
+class MockRoute(object):
+    pattern = '/items'
+
+class MockRequest(object):
+    def __init__(self, matchdict={}):
+        self.headers = {}
+        self.GET = {}
+        self.POST = {}
+        self.matchdict = matchdict.copy()
+        self.matched_route = MockRoute()
+
+class TestVerificationPolicy(unittest.TestCase):
+    def make_view_callable(self, policy, return_value=1):
+        """ By default, the view callable returns an invalid value. """
+        kwargs = {}
+        if policy is not None:
+            kwargs['verification'] = policy
+        
+        @api_view(required={'a': str}, returns=str, **kwargs)
+        def view_callable(a):
+            return return_value
+        
+        return view_callable
+    
+    def test_default(self):
+        view_callable = self.make_view_callable(None)
+        
+        with pytest.raises(iomanager.VerificationFailureError):
+            view_callable(MockRequest({'a': 'xxx'}))
+    
+    def test_always(self):
+        policy = VerificationPolicy()
+        view_callable = self.make_view_callable(policy)
+        
+        with pytest.raises(iomanager.VerificationFailureError):
+            view_callable(MockRequest({'a': 'xxx'}))
+        
+        stats = policy.get_stats()
+        assert stats['input'] == {'verified': 1, 'skipped': 0, 'violations': 0}
+        assert stats['output'] == {'verified': 1, 'skipped': 0, 'violations': 1}
+        assert stats['routes'] == [
+            {'route': '/items', 'direction': 'output', 'violations': 1},
+            ]
+    
+    def test_never(self):
+        policy = VerificationPolicy(rate=0)
+        view_callable = self.make_view_callable(policy)
+        
+        assert view_callable(MockRequest({'a': 'xxx'})) == 1
+        
+        stats = policy.get_stats()
+        assert stats['input']['skipped'] == 1
+        assert stats['output']['skipped'] == 1
+    
+    def test_output_rate(self):
+        """ Input is always verified; output never. """
+        policy = VerificationPolicy(output_rate=0)
+        view_callable = self.make_view_callable(policy)
+        
+        assert view_callable(MockRequest({'a': 'xxx'})) == 1
+        with pytest.raises(iomanager.VerificationFailureError):
+            view_callable(MockRequest({'b': 'xxx'}))
+    
+    def test_sampled(self):
+        policy = VerificationPolicy(rate=0.5)
+        view_callable = self.make_view_callable(policy, 'xxx')
+        
+        for i in range(200):
+            view_callable(MockRequest({'a': 'xxx'}))
+        
+        counts = policy.get_stats()['output']
+        assert counts['verified'] + counts['skipped'] == 200
+        assert 0 < counts['verified'] < 200
+    
+    def test_not_enforced(self):
+        policy = VerificationPolicy(enforce=False)
+        view_callable = self.make_view_callable(policy)
+        
+        assert view_callable(MockRequest({'a': 'xxx'})) == 1
+        assert policy.get_stats()['output']['violations'] == 1
+    
+    def test_clear(self):
+        policy = VerificationPolicy(enforce=False)
+        view_callable = self.make_view_callable(policy)
+        view_callable(MockRequest({'a': 'xxx'}))
+        
+        policy.clear()
+        
+        assert policy.get_stats()['output']['verified'] == 0
+        assert policy.get_stats()['routes'] == []
+    
+    def test_subtree(self):
+        policy = VerificationPolicy(rate=0)
+        view_callable = self.make_view_callable(None)
+        
+        set_view_options({'/': {GET: view_callable}}, verification=policy)
+        
+        assert view_callable.verification is policy
+        assert view_callable(MockRequest({'a': 'xxx'})) == 1
+    
+    def test_subtree_mixed(self):
+        """ View callables without the option are skipped. """
+        policy = VerificationPolicy(rate=0)
+        api_view_callable = self.make_view_callable(None)
+        
+        @function_view
+        def function_view_callable():
+            pass
+        
+        set_view_options(
+            {'/a': api_view_callable, '/b': function_view_callable},
+            verification=policy,
+            )
+        
+        assert api_view_callable.verification is policy
+        assert 'verification' not in vars(function_view_callable)
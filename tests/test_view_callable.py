@@ -1,8 +1,20 @@
 """ Copyright (c) 2013 Josh Matthias <python.apitree@gmail.com> """
 
+import json
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 import iomanager
+from iomanager import ListOf
+from pyramid.httpexceptions import (
+    HTTPBadRequest,
+    HTTPGatewayTimeout,
+    HTTPRequestEntityTooLarge,
+    )
+from pyramid.request import Request
+from pyramid.response import Response
 
 from apitree import (
     simple_view,
@@ -15,6 +27,9 @@ from apitree.view_callable import (
     FunctionViewCallable,
     APIViewCallable,
     )
+from apitree.admission import ConcurrencyLimiter
+from apitree.content import Codec
+from apitree.deadline import Deadline
 
 class Error(Exception):
     """ Base class for errors. """
@@ -240,7 +255,8 @@ class MockPyramidRequest(object):
         GET={},
         POST={},
         matchdict={},
-        json_body={}
+        json_body={},
+        body=b''
         ):
         self.headers = headers.copy()
         self.headers.setdefault('content-type', 'xxx')
@@ -253,6 +269,8 @@ class MockPyramidRequest(object):
             self.json_body = json_body.copy()
         else:
             self.json_body = json_body
+        
+        self.body = body
 
 class TestFunctionViewCallableBasicBehavior(
     unittest.TestCase,
@@ -416,6 +434,312 @@ class TestFunctionViewCallableKwargsSourcesPrecedence(unittest.TestCase):
     def test_special_kwargs_overrides_all_with_POST(self):
         self.special_kwargs_overrides_all_others_test('POST')
 
+class UnreadableBodyRequest(MockPyramidRequest):
+    """ Fails if the request body is accessed in any way. """
+    @property
+    def POST(self):
+        raise AssertionError('Request body was accessed.')
+    
+    @POST.setter
+    def POST(self, value):
+        pass
+    
+    @property
+    def json_body(self):
+        raise AssertionError('Request body was accessed.')
+    
+    @json_body.setter
+    def json_body(self, value):
+        pass
+
+class TestFunctionViewCallableLazyBody(unittest.TestCase):
+    """ The request body is only decoded when the wrapped callable accepts a
+        keyword argument that is not provided by the URL, the query string or
+        'special_kwargs'. """
+    
+    def lazy_test(self, view_decorator, matchdict={}):
+        @view_decorator
+        def view_callable(a=None):
+            raise WrappedCallableSuccessError
+        
+        request = UnreadableBodyRequest(
+            headers={'content-type': 'application/json'},
+            matchdict=matchdict,
+            )
+        
+        with pytest.raises(WrappedCallableSuccessError):
+            view_callable(request)
+    
+    def test_no_parameters(self):
+        @function_view
+        def view_callable():
+            raise WrappedCallableSuccessError
+        
+        with pytest.raises(WrappedCallableSuccessError):
+            view_callable(UnreadableBodyRequest())
+    
+    def test_url_only_function_view(self):
+        self.lazy_test(function_view, matchdict={'a': 1})
+    
+    def test_url_only_api_view(self):
+        self.lazy_test(api_view, matchdict={'a': 1})
+    
+    def test_missing_parameter_decoded(self):
+        with pytest.raises(AssertionError):
+            self.lazy_test(function_view)
+    
+    def test_unlimited_api_view_decoded(self):
+        @api_view(unlimited=True)
+        def view_callable(**kwargs):
+            pass
+        
+        with pytest.raises(AssertionError):
+            view_callable(UnreadableBodyRequest())
+
+class TestAPIViewCallablePayloadLimits(unittest.TestCase):
+    """ Payload limits are checked while the body is decoded, before any
+        iospec coercion or verification. """
+    
+    def make_request(self, json_body, **headers):
+        headers['content-type'] = 'application/json'
+        return MockPyramidRequest(headers=headers, json_body=json_body)
+    
+    def test_limit_kwargs_collected(self):
+        @api_view(max_body_bytes=1, max_list_length=2, max_depth=3)
+        def view_callable():
+            pass
+        
+        limits = view_callable.payload_limits
+        
+        assert view_callable.view_kwargs == {}
+        assert (
+            (limits.max_body_bytes, limits.max_list_length, limits.max_depth) ==
+            (1, 2, 3)
+            )
+    
+    def test_body_too_large(self):
+        @api_view(max_body_bytes=10)
+        def view_callable(a):
+            pass
+        
+        request = self.make_request({'a': 1}, **{'content-length': '11'})
+        
+        with pytest.raises(HTTPRequestEntityTooLarge):
+            view_callable(request)
+    
+    def test_list_too_long(self):
+        @api_view(max_list_length=2)
+        def view_callable(a):
+            pass
+        
+        request = self.make_request({'a': [1, 2, 3]})
+        
+        with pytest.raises(HTTPBadRequest):
+            view_callable(request)
+    
+    def test_derived_depth(self):
+        """ 'max_depth' is derived from iospecs made of JSON scalar types. """
+        @api_view(required={'a': ListOf(int)})
+        def view_callable(a):
+            pass
+        
+        assert view_callable.payload_limits.max_depth == 2
+        
+        request = self.make_request({'a': [[1]]})
+        
+        with pytest.raises(HTTPBadRequest):
+            view_callable(request)
+    
+    def test_deep_body(self):
+        """ The derived depth is checked before the body is parsed, so a body
+            too deep to parse is a bad request. """
+        @api_view(required={'a': int})
+        def view_callable(a):
+            return a
+        
+        def make_request(body):
+            request = Request.blank(
+                '/',
+                method='POST',
+                body=body,
+                content_type='application/json',
+                )
+            request.matchdict = {}
+            return request
+        
+        assert view_callable(make_request(b'{"a": 3}')) == 3
+        
+        with pytest.raises(HTTPBadRequest):
+            view_callable(make_request(b'[' * 200000 + b']' * 200000))
+    
+    def test_no_limits(self):
+        @api_view
+        def view_callable(a):
+            pass
+        
+        assert view_callable.payload_limits is None
+
+class TestFunctionViewCallableDeadline(unittest.TestCase):
+    """ A request deadline comes from the 'timeout' view option and the
+        'X-Request-Timeout' request header, whichever is sooner. """
+    
+    def test_timeout_option_collected(self):
+        @function_view(timeout=5, predicate='xxx')
+        def view_callable():
+            pass
+        
+        assert view_callable.timeout == 5
+        assert view_callable.view_kwargs == {'predicate': 'xxx'}
+    
+    def test_expired_header(self):
+        @function_view
+        def view_callable():
+            raise AssertionError('Called after deadline.')
+        
+        request = MockPyramidRequest(headers={'X-Request-Timeout': '0'})
+        
+        with pytest.raises(HTTPGatewayTimeout):
+            view_callable(request)
+    
+    def deadline_kwarg_test(self, view_decorator, headers):
+        @view_decorator(timeout=60)
+        def view_callable(deadline):
+            return deadline
+        
+        result = view_callable(MockPyramidRequest(headers=headers))
+        
+        assert isinstance(result, Deadline)
+        return result
+    
+    def test_deadline_kwarg(self):
+        self.deadline_kwarg_test(function_view, {})
+    
+    def test_deadline_kwarg_api_view(self):
+        self.deadline_kwarg_test(api_view, {})
+    
+    def test_header_shortens_deadline(self):
+        result = self.deadline_kwarg_test(
+            function_view,
+            {'X-Request-Timeout': '10'},
+            )
+        assert result.remaining() <= 10
+    
+    def test_no_deadline_kwarg(self):
+        """ The deadline is only passed when the wrapped callable names the
+            parameter. """
+        @function_view(timeout=60)
+        def view_callable(**kwargs):
+            return kwargs
+        
+        assert view_callable(MockPyramidRequest()) == {}
+    
+    def test_async_view(self):
+        @api_view(timeout=60)
+        async def view_callable(a=1):
+            return a
+        
+        assert view_callable(MockPyramidRequest()) == 1
+    
+    def test_concurrent_requests(self):
+        """ Each request keeps its own deadline while another request to the
+            same view callable runs. Request 'a' is bound only after request
+            'b' has started. """
+        b_started = threading.Event()
+        executor = ThreadPoolExecutor(2)
+        self.addCleanup(executor.shutdown)
+        
+        class WaitingRequest(MockPyramidRequest):
+            @property
+            def matchdict(self):
+                b_started.wait(5)
+                return {}
+            
+            @matchdict.setter
+            def matchdict(self, value):
+                pass
+        
+        @function_view(executor=executor)
+        def view_callable(name):
+            if name == 'a':
+                time.sleep(0.3)
+            else:
+                b_started.set()
+            return 'done'
+        
+        results = {}
+        
+        def call(name, request_class, headers):
+            request = request_class(headers=headers, GET={'name': name})
+            try:
+                results[name] = view_callable(request)
+            except HTTPGatewayTimeout:
+                results[name] = 'timeout'
+        
+        threads = [
+            threading.Thread(
+                target=call,
+                args=['a', WaitingRequest, {'X-Request-Timeout': '0.1'}],
+                ),
+            threading.Thread(target=call, args=['b', MockPyramidRequest, {}]),
+            ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert results == {'a': 'timeout', 'b': 'done'}
+    
+    def test_deadline_bounds_admission(self):
+        """ A request waiting for a limiter slot is rejected with 504 when
+            its deadline expires. """
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        
+        @function_view(limiter=ConcurrencyLimiter(1, max_queue=5))
+        def view_callable(name):
+            calls.append(name)
+            if name == 'a':
+                started.set()
+                release.wait(5)
+        
+        thread = threading.Thread(
+            target=view_callable,
+            args=[MockPyramidRequest(GET={'name': 'a'})],
+            )
+        thread.start()
+        try:
+            started.wait(5)
+            request = MockPyramidRequest(
+                headers={'X-Request-Timeout': '0.1'},
+                GET={'name': 'b'},
+                )
+            with pytest.raises(HTTPGatewayTimeout):
+                view_callable(request)
+        finally:
+            release.set()
+            thread.join(5)
+        
+        assert calls == ['a']
+    
+    def test_late_result_without_executor(self):
+        """ Without an executor the call is not interrupted, but a result
+            returned after the deadline is discarded. """
+        @function_view(timeout=0.05)
+        def view_callable():
+            time.sleep(0.2)
+            return 'late'
+        
+        with pytest.raises(HTTPGatewayTimeout):
+            view_callable(MockPyramidRequest())
+    
+    def test_direct_call_has_no_deadline(self):
+        @function_view(timeout=60)
+        def view_callable(deadline=None):
+            return deadline
+        
+        assert view_callable._call() is None
+
 class TestFunctionViewCallableDirectCall(unittest.TestCase):
     """ FunctionViewCallable provides a '_call' method to call the wrapped
         callable directly. This is mostly used for testing. """
@@ -453,6 +777,113 @@ class TestFunctionViewCallableDirectCall(unittest.TestCase):
         with pytest.raises(TypeError):
             view_callable._call(1)
 
+class JSONBytesCodec(Codec):
+    """ A codec without third-party dependencies, for testing. """
+    media_types = ('application/x-test', )
+    
+    def loads(self, body):
+        return json.loads(body.decode('utf-8'))
+    
+    def dumps(self, value):
+        return json.dumps(value).encode('utf-8')
+
+class CodecFunctionViewCallable(FunctionViewCallable):
+    codecs = (JSONBytesCodec(), )
+
+class TestFunctionViewCallableCodecs(unittest.TestCase):
+    """ Request bodies are decoded, and results encoded, by the codecs listed in
+        the 'codecs' class attribute. """
+    
+    def make_request(self, headers, body=b''):
+        return MockPyramidRequest(headers=headers, body=body)
+    
+    def test_body_decoded(self):
+        @CodecFunctionViewCallable
+        def view_callable(**kwargs):
+            assert kwargs == {'a': 1}
+            raise WrappedCallableSuccessError
+        
+        request = self.make_request(
+            {'content-type': 'application/x-test; charset=utf-8'},
+            b'{"a": 1}',
+            )
+        
+        with pytest.raises(WrappedCallableSuccessError):
+            view_callable(request)
+    
+    def test_invalid_body_rejected(self):
+        @CodecFunctionViewCallable
+        def view_callable(**kwargs):
+            pass
+        
+        request = self.make_request(
+            {'content-type': 'application/x-test'},
+            b'{"a": ',
+            )
+        
+        with pytest.raises(HTTPBadRequest):
+            view_callable(request)
+    
+    def test_result_encoded(self):
+        @CodecFunctionViewCallable
+        def view_callable():
+            return {'b': 2}
+        
+        request = self.make_request({'accept': 'application/x-test'})
+        
+        result = view_callable(request)
+        
+        assert isinstance(result, Response)
+        assert result.content_type == 'application/x-test'
+        assert json.loads(result.body.decode('utf-8')) == {'b': 2}
+    
+    def test_result_not_encoded_without_accept(self):
+        """ Without an explicit 'Accept' match, the result is left for the
+            view's renderer. """
+        expected = {'b': 2}
+        
+        @CodecFunctionViewCallable
+        def view_callable():
+            return expected
+        
+        request = self.make_request({'accept': '*/*'})
+        
+        assert view_callable(request) is expected
+    
+    def test_api_view_coerced_before_encoding(self):
+        """ 'APIViewCallable' output coercion happens before encoding. """
+        class CodecAPIViewCallable(APIViewCallable):
+            codecs = (JSONBytesCodec(), )
+        
+        @CodecAPIViewCallable(required={'a': int}, returns=int)
+        def view_callable(a):
+            return a + 1
+        
+        request = self.make_request(
+            {
+                'content-type': 'application/x-test',
+                'accept': 'application/x-test',
+                },
+            b'{"a": 1}',
+            )
+        
+        result = view_callable(request)
+        
+        assert result.body == b'2'
+    
+    def test_view_option(self):
+        """ 'codecs' can be given to the decorator. """
+        @FunctionViewCallable(codecs=[JSONBytesCodec()], renderer='json')
+        def view_callable():
+            return {'b': 2}
+        
+        assert 'codecs' not in view_callable.view_kwargs
+        
+        request = self.make_request({'accept': 'application/x-test'})
+        result = view_callable(request)
+        
+        assert result.content_type == 'application/x-test'
+
 class TestAPIViewCallableBasicBehavior(
     unittest.TestCase,
     BasicBehaviorTest,
@@ -885,7 +1316,7 @@ class CustomCoercionIOManager(iomanager.IOManager):
 
 class TestAPIViewCallableCoercion(unittest.TestCase):
     """ Input and output values go through coercion. """
-        
+    
     class CustomAPIViewCallable(APIViewCallable):
         """ A view callable that coerces input and output value types. """
         iomanager_class = CustomCoercionIOManager